@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the init phase: time to import index.py in a fresh interpreter
+
+Usage:
+    python benchmarks/cold_start.py                      # current tree
+    python benchmarks/cold_start.py --baseline HEAD~1    # compare with a git revision
+    python benchmarks/cold_start.py --runs 20 --top 15
+
+Each run starts a new `python -X importtime` process that imports index,
+which is what a Lambda cold start pays before the first request. Reports
+the median wall time of the import, the summed import time from
+-X importtime, and the slowest imports made by index.py.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Dict, List, Tuple
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    'import time; start = time.perf_counter(); import index; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def run_import(directory: str) -> Tuple[float, Dict[str, int], int]:
+    """
+    Import index once in a fresh process
+    Returns: (wall_seconds, cumulative_us per module imported by index, total self us)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', IMPORT_SNIPPET],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    top_level: Dict[str, int] = {}
+    total_self = 0
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_self += int(self_us)
+        # Nesting is two spaces per level after one space of padding;
+        # level 1 are the modules index.py itself imports
+        level = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if level == 1:
+            top_level[name.strip()] = int(cumulative_us)
+    # The import's own output is on stdout; index.py may print other lines first
+    wall = float(result.stdout.strip().splitlines()[-1])
+    return wall, top_level, total_self
+
+
+def measure(directory: str, runs: int) -> Tuple[List[float], List[int], Dict[str, int]]:
+    walls, totals = [], []
+    top_level: Dict[str, int] = {}
+    for _ in range(runs):
+        wall, modules, total_self = run_import(directory)
+        walls.append(wall)
+        totals.append(total_self)
+        top_level = modules
+    return walls, totals, top_level
+
+
+def checkout(revision: str, target: str) -> None:
+    """Extract index.py and statement_processor/ of a git revision into target"""
+    repo_root = subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel'], cwd=LAMBDA_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    prefix = os.path.relpath(LAMBDA_DIR, repo_root).replace(os.sep, '/')
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', revision, f'{prefix}/'],
+        cwd=repo_root, capture_output=True, check=True,
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        members = [
+            m for m in tar.getmembers()
+            if m.name == f'{prefix}/index.py' or m.name.startswith(f'{prefix}/statement_processor/')
+        ]
+        for member in members:
+            member.name = member.name[len(prefix) + 1:]
+        tar.extractall(target, members=members)
+
+
+def report(label: str, walls: List[float], totals: List[int], top_level: Dict[str, int], top: int) -> float:
+    median_wall = statistics.median(walls) * 1000
+    print(f'\n{label}')
+    print(f'  import index (wall): median {median_wall:.1f} ms, min {min(walls) * 1000:.1f} ms over {len(walls)} runs')
+    print(f'  -X importtime total: median {statistics.median(totals) / 1000:.1f} ms')
+    print('  slowest imports from index.py:')
+    for name, cumulative_us in sorted(top_level.items(), key=lambda item: -item[1])[:top]:
+        print(f'    {cumulative_us / 1000:8.1f} ms  {name}')
+    return median_wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per tree')
+    parser.add_argument('--top', type=int, default=10, help='Imports to list')
+    parser.add_argument('--baseline', help='Git revision to compare against (e.g. HEAD~1)')
+    args = parser.parse_args()
+
+    current = report('current tree', *measure(LAMBDA_DIR, args.runs), args.top)
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            baseline = report(f'baseline {args.baseline}', *measure(directory, args.runs), args.top)
+        print(f'\ninit-phase import: {baseline:.1f} ms -> {current:.1f} ms ({current - baseline:+.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
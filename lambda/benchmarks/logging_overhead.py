@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark the handler's logging cost on a large base64 payload
+
+Usage:
+    python benchmarks/logging_overhead.py                      # current tree, every LOG_LEVEL
+    python benchmarks/logging_overhead.py --baseline HEAD~1    # also the tree before the logging layer
+    python benchmarks/logging_overhead.py --payload-mb 20 --transactions 500 --runs 5
+
+Each configuration runs in a fresh process that calls lambda_handler with
+a ~20 MB base64 body (random bytes). Extraction is stubbed with canned
+transactions that go through normalize_transactions, so no PDF work or
+OpenAI call is measured: only decoding, logging and the response. The
+process's stdout (what CloudWatch would ingest) goes to a temp file.
+Reports the median handler CPU time (time.process_time) and log bytes
+per request.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from cold_start import LAMBDA_DIR, checkout
+
+HANDLER_SNIPPET = '''
+import base64, json, os, sys, time
+import index
+
+runs = int(os.environ['BENCH_RUNS'])
+raw = os.urandom(int(float(os.environ['BENCH_PAYLOAD_MB']) * 1024 * 1024 * 3 / 4))
+canned = [
+    {'date': f'2024-11-{i % 28 + 1:02d}', 'amount': f'{i * 1.5:.2f}',
+     'description': f'COMPRA COMERCIO {i}', 'category': 'Comida'}
+    for i in range(int(os.environ['BENCH_TRANSACTIONS']))
+]
+
+def extract_transactions(file_buffer, file_type, card_name, billing_period, *args, **kwargs):
+    return index.normalize_transactions(canned, billing_period)
+
+index.extract_transactions = extract_transactions
+event = {
+    'headers': {'x-forwarded-for': '10.0.0.1', 'content-type': 'application/json'},
+    'body': json.dumps({
+        'fileBase64': base64.b64encode(raw).decode('ascii'),
+        'fileType': 'pdf',
+        'creditCardName': 'Bench',
+        'billingPeriod': {'start': '2024-11-01', 'end': '2024-11-30'},
+    }),
+}
+cpu_ms = []
+for _ in range(runs):
+    sys.stdout.flush()
+    start = time.process_time()
+    response = index.lambda_handler(event, None)
+    sys.stdout.flush()
+    cpu_ms.append((time.process_time() - start) * 1000)
+    assert response['statusCode'] == 200, response['body'][:200]
+with open(os.environ['BENCH_RESULT'], 'w') as f:
+    json.dump({'cpuMs': cpu_ms}, f)
+'''
+
+CONFIGURATIONS = [
+    ('debug', {'LOG_LEVEL': 'debug'}),
+    ('info', {'LOG_LEVEL': 'info'}),
+    ('info, 10% debug sampling', {'LOG_LEVEL': 'info', 'LOG_SAMPLE_RATE': '0.1'}),
+    ('warning', {'LOG_LEVEL': 'warning'}),
+    ('quiet', {'LOG_LEVEL': 'quiet'}),
+]
+
+
+def run_handler(directory: str, env_overrides: Dict[str, str], args: argparse.Namespace) -> Tuple[List[float], int]:
+    """
+    Call lambda_handler args.runs times in a fresh process
+    Returns: (cpu ms per call, log bytes written)
+    """
+    with tempfile.TemporaryDirectory() as work:
+        log_path = os.path.join(work, 'stdout.log')
+        result_path = os.path.join(work, 'result.json')
+        env = {key: value for key, value in os.environ.items() if not key.startswith('LOG_')}
+        env.update({
+            'REQUIRE_AUTH': 'false',
+            'MAX_REQUESTS_PER_MINUTE': '1000000',
+            'RESULT_CACHE_BACKEND': 'none',
+            'BENCH_RUNS': str(args.runs),
+            'BENCH_PAYLOAD_MB': str(args.payload_mb),
+            'BENCH_TRANSACTIONS': str(args.transactions),
+            'BENCH_RESULT': result_path,
+            **env_overrides,
+        })
+        with open(log_path, 'w') as log_file:
+            subprocess.run([sys.executable, '-c', HANDLER_SNIPPET], cwd=directory, env=env, stdout=log_file, check=True)
+        with open(result_path) as f:
+            result = json.load(f)
+        return result['cpuMs'], os.path.getsize(log_path)
+
+
+def report(label: str, cpu_ms: List[float], log_bytes: int, runs: int) -> float:
+    median_ms = statistics.median(cpu_ms)
+    print(f'  {label:<36} cpu median {median_ms:8.1f} ms   min {min(cpu_ms):8.1f} ms   '
+          f'log {log_bytes / runs / 1024:10.1f} KB/request')
+    return median_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payload-mb', type=float, default=20, help='Size of the base64 body')
+    parser.add_argument('--transactions', type=int, default=500, help='Canned transactions per request')
+    parser.add_argument('--runs', type=int, default=5, help='Handler calls per configuration')
+    parser.add_argument('--baseline', help='Git revision without the logging layer (e.g. HEAD~1)')
+    args = parser.parse_args()
+
+    print(f'body ~{args.payload_mb:g} MB, {args.transactions} transactions, {args.runs} runs\n')
+    baseline: Optional[float] = None
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            cpu_ms, log_bytes = run_handler(directory, {}, args)
+        baseline = report(f'baseline {args.baseline}', cpu_ms, log_bytes, args.runs)
+
+    for label, env_overrides in CONFIGURATIONS:
+        cpu_ms, log_bytes = run_handler(LAMBDA_DIR, env_overrides, args)
+        median_ms = report(f'LOG_LEVEL={label}', cpu_ms, log_bytes, args.runs)
+        if baseline is not None:
+            print(f'  {"":<36} {median_ms - baseline:+.1f} ms vs baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Offline stand-in for the OpenAI client used by benchmarks
+
+StubOpenAI answers chat.completions.create like the real client (choices,
+message.content, usage) after a configurable delay, with canned JSON, so
+the whole handler runs without network or API key. Install it with
+`index.openai_client = StubOpenAI(...)`.
+
+Token usage is estimated (about 4 characters per text token, a fixed cost
+per image); bytes sent are the JSON size of the request messages, as the
+HTTP client would upload them.
+"""
+
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from synthetic import MERCHANTS
+
+# Rough per-image prompt tokens by detail level (one 512px tile + base for high)
+IMAGE_TOKENS = {'low': 85, 'high': 765, 'auto': 765}
+
+
+def canned_transactions(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Transactions dated inside November 2024, as the model would return them"""
+    rng = random.Random(seed)
+    return [
+        {
+            'date': f'2024-11-{rng.randint(1, 28):02d}',
+            'amount': round(rng.uniform(20, 4000), 2),
+            'description': rng.choice(MERCHANTS),
+            'category': 'Otros',
+        }
+        for _ in range(count)
+    ]
+
+
+class StubAPIError(Exception):
+    """Injected failure with an HTTP status, like openai.APIStatusError"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f'stub model error {status_code}')
+        self.status_code = status_code
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content: str):
+        self.message = _Message(content)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = prompt_tokens + completion_tokens
+
+
+class _Completion:
+    def __init__(self, content: str, usage: _Usage):
+        self.choices = [_Choice(content)]
+        self.usage = usage
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    tokens = 0
+    for message in messages:
+        content = message.get('content')
+        parts = content if isinstance(content, list) else [{'type': 'text', 'text': content or ''}]
+        for part in parts:
+            if part.get('type') == 'image_url':
+                tokens += IMAGE_TOKENS.get(part['image_url'].get('detail', 'auto'), 765)
+            else:
+                tokens += len(part.get('text', '')) // 4
+    return tokens
+
+
+class _Completions:
+    def __init__(self, owner: 'StubOpenAI'):
+        self._owner = owner
+
+    def create(self, **kwargs: Any) -> _Completion:
+        return self._owner.complete(kwargs)
+
+
+class _Chat:
+    def __init__(self, owner: 'StubOpenAI'):
+        self.completions = _Completions(owner)
+
+
+class StubOpenAI:
+    """
+    Fake OpenAI client with latency and canned answers
+
+    latency: seconds per call; jitter: extra uniform delay in [0, jitter]
+    response: JSON object returned as the message content (default: a
+              {"transactions": [...]} with transactions_per_call entries)
+    error_rate: fraction of calls that fail (429 or 500) after their delay
+    encoder: writes the canned transactions as the answer (default: the
+             {"transactions": [...]} JSON), e.g. prompts.encode_transactions
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        response: Optional[Dict[str, Any]] = None,
+        transactions_per_call: int = 30,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        encoder: Optional[Callable[[List[Dict[str, Any]]], str]] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.response = response
+        self.transactions_per_call = transactions_per_call
+        self.error_rate = error_rate
+        self.encoder = encoder
+        self.chat = _Chat(self)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.errors = 0
+
+    def complete(self, request: Dict[str, Any]) -> _Completion:
+        request_bytes = len(json.dumps(request.get('messages', [])))
+        with self._lock:
+            self.calls += 1
+            self.bytes_sent += request_bytes
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            call_number = self.calls
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if fail:
+            raise StubAPIError(429 if call_number % 2 else 500)
+
+        if self.response is not None:
+            content = json.dumps(self.response)
+        else:
+            transactions = canned_transactions(self.transactions_per_call, seed=call_number)
+            content = self.encoder(transactions) if self.encoder else json.dumps({'transactions': transactions})
+        usage = _Usage(estimate_prompt_tokens(request.get('messages', [])), len(content) // 4)
+        return _Completion(content, usage)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark normalize_transactions per row for each date style the model returns
+
+Usage:
+    python benchmarks/normalization.py                      # current tree
+    python benchmarks/normalization.py --baseline HEAD~1    # compare with a git revision
+    python benchmarks/normalization.py --rows 800 --runs 20
+
+Each tree runs in a fresh process (LOG_LEVEL=warning, no merchant
+dictionary) that normalizes the same canned rows: ISO dates, dd/mm/yyyy,
+ISO with a time, and a mix with some unparseable dates. Reports the
+median microseconds per row over the runs.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+from cold_start import LAMBDA_DIR, checkout
+
+NORMALIZE_SNIPPET = '''
+import json, os, random, statistics, sys, time
+import index
+
+rows = int(os.environ['BENCH_ROWS'])
+runs = int(os.environ['BENCH_RUNS'])
+rng = random.Random(0)
+period = {'start': '2024-11-01', 'end': '2024-11-30'}
+
+def canned(date_of):
+    return [
+        {'date': date_of(rng.randint(1, 30)), 'amount': f'{rng.uniform(20, 4000):.2f}',
+         'description': f'  COMPRA  COMERCIO {i}  ', 'category': rng.choice(['Comida', 'food', 'Transporte', 'x'])}
+        for i in range(rows)
+    ]
+
+styles = {
+    'iso': canned(lambda day: f'2024-11-{day:02d}'),
+    'dd/mm/yyyy': canned(lambda day: f'{day:02d}/11/2024'),
+    'iso datetime': canned(lambda day: f'2024-11-{day:02d} 12:30:00'),
+    'mixed, 10% bad': canned(lambda day: 'n/a' if day % 10 == 0 else f'2024-11-{day:02d}'),
+}
+result = {}
+for style, transactions in styles.items():
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        index.normalize_transactions(transactions, period)
+        timings.append((time.perf_counter() - start) / rows * 1e6)
+    result[style] = statistics.median(timings)
+with open(os.environ['BENCH_RESULT'], 'w') as f:
+    json.dump(result, f)
+'''
+
+
+def run_tree(directory: str, args: argparse.Namespace) -> Dict[str, float]:
+    """Median microseconds per row per date style, in a fresh process"""
+    with tempfile.TemporaryDirectory() as work:
+        result_path = os.path.join(work, 'result.json')
+        env = dict(os.environ)
+        env.update({
+            'LOG_LEVEL': 'warning',
+            'MERCHANTS_ENABLED': 'false',
+            'BENCH_ROWS': str(args.rows),
+            'BENCH_RUNS': str(args.runs),
+            'BENCH_RESULT': result_path,
+        })
+        subprocess.run([sys.executable, '-c', NORMALIZE_SNIPPET], cwd=directory, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def report(label: str, result: Dict[str, float]) -> None:
+    print(f'\n{label}')
+    for style, micros in result.items():
+        print(f'  {style:<16} {micros:8.2f} us/row')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500, help='Transactions per statement')
+    parser.add_argument('--runs', type=int, default=10, help='Normalizations per date style')
+    parser.add_argument('--baseline', help='Git revision to compare against (e.g. HEAD~1)')
+    args = parser.parse_args()
+
+    print(f'{args.rows} rows, {args.runs} runs per date style')
+    report('current tree', run_tree(LAMBDA_DIR, args))
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            report(f'baseline {args.baseline}', run_tree(directory, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Prompt and answer tokens per prompt version, offline
+
+Usage:
+    python benchmarks/prompt_tokens.py                      # current tree, every PROMPT_FORMAT
+    python benchmarks/prompt_tokens.py --baseline HEAD~1    # also a git revision (its default prompts)
+    python benchmarks/prompt_tokens.py --pages 6 --rows 40
+
+Each configuration runs in a fresh process: two synthetic text-layer
+statements (different card and billing period) go through lambda_handler
+with mock_model.StubOpenAI, which records every request and answers with
+canned transactions in the tree's output format. Reports, per version:
+- system prompt tokens, how many distinct system prompts were sent (1
+  means the prefix is shared by every request) and whether that prefix is
+  long enough for OpenAI's prompt caching (1024 tokens)
+- user message tokens per request (page text included)
+- answer tokens per transaction
+Tokens are estimated as in mock_model (about 4 characters per token).
+The current tree also prints prompts.prompt_token_counts().
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict
+
+from cold_start import LAMBDA_DIR, checkout
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shortest prefix OpenAI caches (prompts.PROMPT_CACHE_MIN_TOKENS; old trees lack it)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+STATEMENTS = [
+    ('BBVA Azul', {'start': '2024-11-01', 'end': '2024-11-30'}),
+    ('Banorte Oro', {'startMonth': 'noviembre', 'endMonth': 'diciembre', 'startYear': 2024, 'endYear': 2024}),
+]
+
+
+def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    """Send both statements through the tree on sys.path and measure what the stub saw"""
+    import index
+    from mock_model import StubOpenAI, estimate_prompt_tokens
+    from synthetic import make_statement_pdf
+
+    output_format = getattr(index, 'PROMPT_FORMAT', 'json')
+    try:
+        from statement_processor.prompts import encode_transactions
+        encoder = lambda transactions: encode_transactions(transactions, output_format)
+    except ImportError:
+        encoder = None
+
+    requests = []
+    answers = []
+
+    class RecordingStub(StubOpenAI):
+        def complete(self, request):
+            completion = super().complete(request)
+            requests.append(request['messages'])
+            answers.append(completion.choices[0].message.content)
+            return completion
+
+    index.openai_client = RecordingStub(latency=0, transactions_per_call=args.rows, encoder=encoder)
+    pdf = make_statement_pdf(pages=args.pages, rows_per_page=args.rows)
+    for card_name, billing_period in STATEMENTS:
+        event = {
+            'headers': {'x-forwarded-for': '10.0.0.1'},
+            'body': json.dumps({
+                'fileBase64': base64.b64encode(pdf).decode('ascii'),
+                'fileType': 'pdf',
+                'creditCardName': card_name,
+                'billingPeriod': billing_period,
+            }),
+        }
+        response = index.lambda_handler(event, None)
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"Handler answered {response['statusCode']}: {response['body'][:300]}")
+
+    systems = [messages[0]['content'] for messages in requests]
+    result = {
+        'version': getattr(index, 'PROMPT_VERSION', '?'),
+        'requests': len(requests),
+        'systemTokens': estimate_prompt_tokens([requests[0][0]]),
+        'distinctSystemPrompts': len(set(systems)),
+        'userTokensPerRequest': sum(estimate_prompt_tokens(messages[1:]) for messages in requests) / len(requests),
+        'answerTokensPerTransaction': sum(len(answer) // 4 for answer in answers) / (len(answers) * args.rows),
+    }
+    try:
+        from statement_processor.prompts import prompt_token_counts
+        from mock_model import canned_transactions
+        result['promptTokenCounts'] = prompt_token_counts(canned_transactions(args.rows))
+    except ImportError:
+        pass
+    return result
+
+
+def run_tree(directory: str, env_overrides: Dict[str, str], args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as work:
+        result_path = os.path.join(work, 'result.json')
+        env = dict(os.environ)
+        env.update({
+            'PYTHONPATH': os.pathsep.join([directory, BENCHMARKS_DIR]),
+            'REQUIRE_AUTH': 'false',
+            'MAX_REQUESTS_PER_MINUTE': '1000000',
+            'RESULT_CACHE_BACKEND': 'none',
+            'PAGE_CACHE_BACKEND': 'none',
+            'PAGE_BATCHING_ENABLED': 'false',
+            'OPENAI_API_KEY': 'offline-benchmark',
+            'LOG_LEVEL': 'warning',
+            **env_overrides,
+        })
+        command = [sys.executable, os.path.abspath(__file__), '--worker', result_path,
+                   '--pages', str(args.pages), '--rows', str(args.rows)]
+        subprocess.run(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, check=True)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def report(label: str, result: Dict[str, Any]) -> None:
+    # Only a prefix shared by every request, and long enough, is cached
+    cacheable = result['distinctSystemPrompts'] == 1 and result['systemTokens'] >= PROMPT_CACHE_MIN_TOKENS
+    print(f"  {label:<24} {result['version']:<12} {result['systemTokens']:>7} {result['distinctSystemPrompts']:>9} "
+          f"{'yes' if cacheable else 'no':>10} {result['userTokensPerRequest']:>9.0f} "
+          f"{result['answerTokensPerTransaction']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=4, help='Pages per synthetic statement')
+    parser.add_argument('--rows', type=int, default=30, help='Transactions per page (and per canned answer)')
+    parser.add_argument('--baseline', help='Git revision to compare against (e.g. HEAD~1)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args)
+        with open(args.worker, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    print(f'2 statements x {args.pages} pages x {args.rows} rows, one page per request\n')
+    print(f"  {'tree':<24} {'version':<12} {'system':>7} {'distinct':>9} {'cacheable':>10} "
+          f"{'user/req':>9} {'answer/txn':>10}")
+    current = None
+    for output_format in ('json', 'compact'):
+        current = run_tree(LAMBDA_DIR, {'PROMPT_FORMAT': output_format}, args)
+        report(f'current, {output_format}', current)
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            report(f'baseline {args.baseline}', run_tree(directory, {}, args))
+
+    if current and 'promptTokenCounts' in current:
+        print('\nprompts.prompt_token_counts():')
+        for version, counts in current['promptTokenCounts'].items():
+            print(f'  {version}: {counts}')
+
+
+if __name__ == '__main__':
+    main()
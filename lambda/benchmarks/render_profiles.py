@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark render profiles: bytes per page and latency for each profile
+
+Usage:
+    python benchmarks/render_profiles.py                      # synthetic scanned statement
+    python benchmarks/render_profiles.py statement.pdf        # real PDF
+    python benchmarks/render_profiles.py --with-model         # also time the OpenAI call (needs OPENAI_API_KEY)
+
+Latency is render + encode + base64 per page; with --with-model it also
+includes one chat.completions.create call per page (end-to-end).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from statement_processor.rendering import RENDER_PROFILES, render_page
+from synthetic import make_statement_pdf
+
+
+def call_model(client, model, payload):
+    start = time.perf_counter()
+    client.chat.completions.create(
+        model=model,
+        messages=[{
+            'role': 'user',
+            'content': [
+                {'type': 'text', 'text': 'Extract all transactions as JSON {"transactions": [...]}'},
+                {'type': 'image_url', 'image_url': {
+                    'url': f"data:{payload['mime_type']};base64,{payload['base64']}",
+                    'detail': payload['detail'],
+                }},
+            ],
+        }],
+        temperature=0.1,
+        response_format={'type': 'json_object'},
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help='PDF to render (default: synthetic scanned statement)')
+    parser.add_argument('--pages', type=int, default=4, help='Pages in the synthetic statement')
+    parser.add_argument('--with-model', action='store_true', help='Include one OpenAI call per page')
+    parser.add_argument('--model', default=os.environ.get('VISION_MODEL', 'gpt-4o'))
+    args = parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, 'rb') as f:
+            pdf_bytes = f.read()
+        source = args.pdf
+    else:
+        pdf_bytes = make_statement_pdf(pages=args.pages, scanned=True)
+        source = f'synthetic scanned statement ({args.pages} pages)'
+
+    client = None
+    if args.with_model:
+        from openai import OpenAI
+        client = OpenAI()
+
+    document = fitz.open(stream=pdf_bytes, filetype='pdf')
+    print(f'Source: {source}, {len(document)} pages')
+    header = f"{'profile':<10} {'size (px)':>12} {'bytes/page':>12} {'base64/page':>12} {'render ms':>10}"
+    if client:
+        header += f" {'e2e ms':>10}"
+    print(header)
+    print('-' * len(header))
+
+    for profile_name in ['legacy', *[p for p in RENDER_PROFILES if p != 'legacy'], 'auto']:
+        sizes, encoded, render_times, e2e_times, dims = [], [], [], [], set()
+        for page in document:
+            start = time.perf_counter()
+            payload = render_page(page, profile_name)
+            render_time = time.perf_counter() - start
+            render_times.append(render_time)
+            sizes.append(payload['bytes'])
+            encoded.append(len(payload['base64']))
+            dims.add(f"{payload['width']}x{payload['height']}")
+            if client:
+                e2e_times.append(render_time + call_model(client, args.model, payload))
+        line = (
+            f"{profile_name:<10} {(dims.pop() if len(dims) == 1 else 'mixed'):>12} "
+            f"{statistics.mean(sizes):>12,.0f} {statistics.mean(encoded):>12,.0f} "
+            f"{statistics.mean(render_times) * 1000:>10.1f}"
+        )
+        if client:
+            line += f" {statistics.mean(e2e_times) * 1000:>10.1f}"
+        print(line)
+
+    document.close()
+
+
+if __name__ == '__main__':
+    main()
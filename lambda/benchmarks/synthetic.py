@@ -0,0 +1,94 @@
+"""
+Synthetic credit card statements for benchmarks
+
+Generates PDFs with PyMuPDF that look like a typical Mexican statement:
+a header, a table of dated purchases and a page footer. The 'scanned'
+variant rasterizes every page into an image-only PDF (no text layer).
+"""
+
+import random
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+MERCHANTS = [
+    'OXXO CENTRO', 'WALMART SUPERCENTER', 'AMAZON MX MARKETPLACE', 'UBER TRIP',
+    'NETFLIX.COM', 'FARMACIAS GUADALAJARA', 'LIVERPOOL PERISUR', 'PEMEX GAS 1234',
+    'STARBUCKS REFORMA', 'CINEPOLIS', 'SORIANA HIPER', 'SPOTIFY', 'CFE SUMINISTRO',
+    'TELCEL RECARGA', 'HOME DEPOT MEXICO', 'RAPPI RESTAURANTES',
+]
+
+MONTHS = ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']
+
+
+def make_rows(count: int, seed: int = 0, month: int = 11, year: int = 2024) -> List[Tuple[str, str, float]]:
+    """Random (date, description, amount) rows inside one month"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        day = rng.randint(1, 28)
+        rows.append((
+            f'{day:02d}-{MONTHS[month - 1]}-{year}',
+            rng.choice(MERCHANTS),
+            round(rng.uniform(20, 4000), 2),
+        ))
+    rows.sort()
+    return rows
+
+
+def make_statement_pdf(
+    pages: int = 3,
+    rows_per_page: int = 30,
+    scanned: bool = False,
+    issuer: str = 'BANCO DEMO',
+    seed: int = 0,
+    scan_dpi: int = 150,
+    print_total: bool = False,
+    scanned_footer: bool = False
+) -> bytes:
+    """
+    Build a statement PDF; with scanned=True pages are images without text
+    print_total adds the period's total of charges under the first page header
+    scanned_footer keeps a native 'Pagina N de M' text footer on scanned pages
+    (as some scanners or PDF tools stamp), so their text layer is a few words
+    """
+    document = fitz.open()
+    rows = make_rows(pages * rows_per_page, seed=seed)
+    for page_idx in range(pages):
+        page = document.new_page(width=612, height=792)  # Letter
+        page.insert_text((50, 50), f'{issuer}  ESTADO DE CUENTA  TARJETA DE CREDITO', fontsize=12)
+        page.insert_text((50, 68), f'Periodo: 01-nov-2024 al 30-nov-2024    Pagina {page_idx + 1} de {pages}', fontsize=9)
+        if print_total and page_idx == 0:
+            total = sum(amount for _, _, amount in rows)
+            page.insert_text((50, 84), f'TOTAL DE CARGOS DEL PERIODO  ${total:,.2f}', fontsize=9)
+        page.insert_text((50, 100), 'FECHA', fontsize=9)
+        page.insert_text((140, 100), 'DESCRIPCION', fontsize=9)
+        page.insert_text((480, 100), 'IMPORTE', fontsize=9)
+        y = 118
+        for date, description, amount in rows[page_idx * rows_per_page:(page_idx + 1) * rows_per_page]:
+            page.insert_text((50, y), date, fontsize=8)
+            page.insert_text((140, y), description, fontsize=8)
+            page.insert_text((480, y), f'${amount:,.2f}', fontsize=8)
+            y += 20
+            if y > 740:
+                break
+        page.insert_text((50, 770), 'Este documento es una representacion impresa de un CFDI', fontsize=7)
+    data = document.tobytes(deflate=True, garbage=3)
+    document.close()
+
+    if not scanned:
+        return data
+
+    source = fitz.open(stream=data, filetype='pdf')
+    output = fitz.open()
+    zoom = scan_dpi / 72
+    for page in source:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+        new_page = output.new_page(width=page.rect.width, height=page.rect.height)
+        new_page.insert_image(new_page.rect, stream=pix.tobytes('png'))
+        if scanned_footer:
+            new_page.insert_text((500, 785), f'Pagina {page.number + 1} de {pages}', fontsize=7)
+    data = output.tobytes(deflate=True, garbage=3)
+    source.close()
+    output.close()
+    return data
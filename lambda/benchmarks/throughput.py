@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+End-to-end offline benchmark of lambda_handler with a stub model
+
+Usage:
+    python benchmarks/throughput.py                           # 10-page text and scanned statements
+    python benchmarks/throughput.py --pages 20 --requests 10 --latency 1.5 --jitter 0.5
+    python benchmarks/throughput.py --baseline HEAD~1         # same run against a git revision
+    VISION_MAX_CONCURRENCY=8 python benchmarks/throughput.py  # any index.py setting via env
+    python benchmarks/throughput.py --error-rate 0.2          # stub answers 429/500 on 20% of calls
+
+Each variant (synthetic statement with a text layer, and the same
+statement scanned into images) runs in a fresh process: the handler is
+called with a base64 body, the OpenAI client is replaced by
+mock_model.StubOpenAI (fixed latency plus jitter, canned JSON) and the
+result/page caches are off, so every request does the full pipeline.
+A warm-up request (cold start included) is not counted.
+
+Reports per variant: p50/p95 request latency, pages/sec, bytes sent to
+the model per page (request JSON, images included), model calls
+(retries and hedges included), pages that still failed and the process's
+peak RSS.
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from cold_start import LAMBDA_DIR, checkout
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VARIANTS = ['text', 'scanned']
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_worker(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark one variant inside this process (the tree to test is already on sys.path)"""
+    import index
+    from mock_model import StubOpenAI
+    from synthetic import make_statement_pdf
+
+    pdf = make_statement_pdf(pages=args.pages, rows_per_page=args.rows, scanned=args.variant == 'scanned')
+    stub = StubOpenAI(latency=args.latency, jitter=args.jitter, transactions_per_call=args.rows, error_rate=args.error_rate)
+    if args.canned:
+        with open(args.canned, 'r', encoding='utf-8') as f:
+            stub.response = json.load(f)
+    index.openai_client = stub
+
+    event = {
+        'headers': {'x-forwarded-for': '10.0.0.1'},
+        'body': json.dumps({
+            'fileBase64': base64.b64encode(pdf).decode('ascii'),
+            'fileType': 'pdf',
+            'creditCardName': 'Bench',
+            'billingPeriod': {'start': '2024-11-01', 'end': '2024-11-30'},
+        }),
+    }
+
+    latencies = []
+    transactions = 0
+    failed_pages = 0
+    for request_num in range(args.warmup + args.requests):
+        if request_num == args.warmup:
+            calls_before, bytes_before = stub.calls, stub.bytes_sent
+        start = time.perf_counter()
+        response = index.lambda_handler(event, None)
+        elapsed = time.perf_counter() - start
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"Handler answered {response['statusCode']}: {response['body'][:300]}")
+        if request_num >= args.warmup:
+            latencies.append(elapsed)
+            body = json.loads(response['body'])
+            transactions += len(body['transactions'])
+            failed_pages += len(body['metadata'].get('failedPages', []))
+
+    pages = args.pages * args.requests
+    return {
+        'variant': args.variant,
+        'pdfBytes': len(pdf),
+        'latencies': latencies,
+        'pagesPerSec': pages / sum(latencies),
+        'bytesPerPage': (stub.bytes_sent - bytes_before) / pages,
+        'callsPerRequest': (stub.calls - calls_before) / args.requests,
+        'transactionsPerRequest': transactions / args.requests,
+        'failedPagesPerRequest': failed_pages / args.requests,
+        'modelErrors': stub.errors,
+        'maxInFlight': stub.max_in_flight,
+        # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+        'peakRssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    }
+
+
+def run_variant(directory: str, variant: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one variant in a fresh process against the tree in directory"""
+    with tempfile.TemporaryDirectory() as work:
+        result_path = os.path.join(work, 'result.json')
+        env = dict(os.environ)
+        env.update({
+            'PYTHONPATH': os.pathsep.join([directory, BENCHMARKS_DIR]),
+            'REQUIRE_AUTH': 'false',
+            'MAX_REQUESTS_PER_MINUTE': '1000000',
+            'RESULT_CACHE_BACKEND': 'none',
+            'PAGE_CACHE_BACKEND': 'none',
+            'OPENAI_API_KEY': 'offline-benchmark',
+        })
+        env.setdefault('LOG_LEVEL', 'warning')
+        command = [
+            sys.executable, os.path.abspath(__file__), '--worker', result_path,
+            '--variant', variant,
+            '--pages', str(args.pages), '--rows', str(args.rows),
+            '--requests', str(args.requests), '--warmup', str(args.warmup),
+            '--latency', str(args.latency), '--jitter', str(args.jitter),
+            '--error-rate', str(args.error_rate),
+        ]
+        if args.canned:
+            command += ['--canned', os.path.abspath(args.canned)]
+        subprocess.run(command, cwd=directory, env=env, stdout=subprocess.DEVNULL, check=True)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def report(label: str, results: List[Dict[str, Any]]) -> None:
+    print(f'\n{label}')
+    print(f"  {'variant':<9} {'p50 s':>8} {'p95 s':>8} {'pages/s':>8} {'KB/page':>9} {'calls':>6} {'txns':>6} {'failed':>7} {'RSS MB':>8}")
+    for result in results:
+        print(
+            f"  {result['variant']:<9} {percentile(result['latencies'], 0.5):8.2f} "
+            f"{percentile(result['latencies'], 0.95):8.2f} {result['pagesPerSec']:8.2f} "
+            f"{result['bytesPerPage'] / 1024:9.1f} {result['callsPerRequest']:6.1f} "
+            f"{result['transactionsPerRequest']:6.0f} {result.get('failedPagesPerRequest', 0):7.1f} "
+            f"{result['peakRssMb']:8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=10, help='Pages per synthetic statement')
+    parser.add_argument('--rows', type=int, default=30, help='Transactions per page (and per canned answer)')
+    parser.add_argument('--requests', type=int, default=5, help='Measured requests per variant')
+    parser.add_argument('--warmup', type=int, default=1, help='Requests run before measuring')
+    parser.add_argument('--latency', type=float, default=0.5, help='Stub model seconds per call')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Extra random stub latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub calls answering 429/500')
+    parser.add_argument('--canned', help='JSON file the stub returns as every answer')
+    parser.add_argument('--variant', choices=VARIANTS, help='Only this variant')
+    parser.add_argument('--baseline', help='Git revision to compare against (e.g. HEAD~1)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args)
+        with open(args.worker, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    variants = [args.variant] if args.variant else VARIANTS
+    print(f'{args.pages} pages x {args.rows} rows, {args.requests} requests per variant, '
+          f'stub latency {args.latency}s + up to {args.jitter}s')
+    report('current tree', [run_variant(LAMBDA_DIR, variant, args) for variant in variants])
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            report(f'baseline {args.baseline}', [run_variant(directory, variant, args) for variant in variants])
+
+
+if __name__ == '__main__':
+    main()
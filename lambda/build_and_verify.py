@@ -53,6 +53,8 @@ def build_package():
     # Copiar index.py
     print("\n📄 Copying index.py...")
     shutil.copy('index.py', 'package/index.py')
+    shutil.copytree('statement_processor', 'package/statement_processor', dirs_exist_ok=True)
+    shutil.copy('streaming_app.py', 'package/streaming_app.py')
     print("✓ index.py copied")
     
     # Verificar que openai esté presente
@@ -148,6 +150,12 @@ def build_package():
             else:
                 print("❌ index.py NOT in root of zip!")
                 return False
+            
+            if 'statement_processor/__init__.py' in files:
+                print("✓ statement_processor/ is in root of zip")
+            else:
+                print("❌ statement_processor/ NOT in root of zip!")
+                return False
         else:
             print("❌ No openai files found in zip!")
             return False
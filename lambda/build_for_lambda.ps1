@@ -50,6 +50,8 @@ Write-Host "✓ Dependencies installed"
 # Copiar index.py
 Write-Host "`n📄 Copying index.py..."
 Copy-Item index.py package/index.py
+Copy-Item statement_processor package/statement_processor -Recurse -Force
+Copy-Item streaming_app.py package/streaming_app.py
 Write-Host "✓ index.py copied"
 
 # Verificar pydantic_core
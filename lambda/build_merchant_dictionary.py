@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Build the merchant dictionary (merchants.tsv.gz) from past extraction results
+
+Usage:
+    python build_merchant_dictionary.py /tmp/statement-cache/results
+    python build_merchant_dictionary.py results/*.json --output merchants.tsv.gz --min-count 3
+
+Inputs are JSON files or directories of them: disk result cache entries
+(a list of transactions), {"transactions": [...]} objects or saved handler
+responses. The output goes next to index.py (MERCHANT_DICTIONARY_PATH) in
+the deployment package.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from statement_processor.merchants import iter_result_transactions, learn_merchants
+
+
+def iter_json_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.json'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='JSON result files or directories')
+    parser.add_argument('--output', default='merchants.tsv.gz', help='Dictionary file to write')
+    parser.add_argument('--min-count', type=int, default=2, help='Times a merchant must be seen')
+    parser.add_argument('--min-share', type=float, default=0.6, help='Share of its most frequent category')
+    args = parser.parse_args()
+
+    transactions = []
+    for path in iter_json_files(args.inputs):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                transactions.extend(iter_result_transactions(json.load(f)))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'Skipping {path}: {e}', file=sys.stderr)
+
+    dictionary = learn_merchants(transactions, args.min_count, args.min_share)
+    dictionary.save(args.output)
+    print(f'{len(dictionary)} merchants from {len(transactions)} transactions -> '
+          f'{args.output} ({os.path.getsize(args.output)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
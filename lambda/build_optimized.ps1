@@ -42,6 +42,8 @@ if ($LASTEXITCODE -ne 0) {
 Write-Host ""
 Write-Host "📄 Copying index.py..."
 Copy-Item index.py package/index.py
+Copy-Item statement_processor package/statement_processor -Recurse -Force
+Copy-Item streaming_app.py package/streaming_app.py
 
 # Limpieza agresiva
 Write-Host ""
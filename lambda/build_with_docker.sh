@@ -31,6 +31,8 @@ fi
 echo ""
 echo "📄 Copying index.py..."
 cp index.py package/
+cp -r statement_processor package/
+cp streaming_app.py package/
 
 # Verificar pydantic_core
 echo ""
@@ -0,0 +1,3 @@
+# test_lambda.py is a manual script against a deployed function URL (run it
+# with python test_lambda.py), not part of the offline pytest suite
+collect_ignore = ['test_lambda.py']
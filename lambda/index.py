@@ -1,152 +1,160 @@
 import json
 import base64
+import contextvars
 import os
 import io
+import queue
 import hmac
+import threading
 import time
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator, Union
 from collections import defaultdict
 
-try:
-    import boto3
-    from botocore.exceptions import ClientError
-except ImportError:
-    boto3 = None
+from statement_processor import log
+from statement_processor.batching import pack_pages, split_by_page
+from statement_processor.cache import create_cache, make_cache_key
+from statement_processor.dates import DateParser
+from statement_processor.duplicates import check_duplicates
+from statement_processor.jobs import JobProgress, JobStore, create_job_store, job_view, new_job
+from statement_processor.merchants import dictionary_version, get_merchant_dictionary
+from statement_processor.normalize import normalize_batch
+from statement_processor.parsers import find_parser
+from statement_processor.prompts import PROMPT_VERSIONS, SYSTEM_PROMPTS, build_context, decode_transactions
+from statement_processor.ratelimit import create_rate_limiter
+from statement_processor.reconcile import reconcile_pages, to_cents
+from statement_processor.retry import CallPolicy
+from statement_processor.routing import TierStats, validate_page
+from statement_processor.rendering import RENDER_PROFILES, analyze_page, render_page
+from statement_processor.text_layer import extract_page_text, get_page_words, words_to_text
+from statement_processor.tracing import count, current_trace, record_model_call, stage, start_trace
+from statement_processor.triage import classify_page_text, count_transaction_rows
+
+# Heavy dependencies (boto3, openai, PyMuPDF) are imported on first use and
+# clients are created on first need, so the init phase only pays for what a
+# request actually touches (a getJob poll never loads PyMuPDF or openai).
+# DEBUG_IMPORTS=true prints where pydantic_core/openai were found, which
+# helps when a deployment package is missing compiled modules.
+DEBUG_IMPORTS = os.environ.get('DEBUG_IMPORTS', 'false').lower() == 'true'
+
+_client_lock = threading.Lock()
+
+# Created by the getters below; tests may assign them directly
+s3_client = None
+lambda_client = None
+openai_client = None
+openai_error = None
+fitz = None
 
-# Try to import OpenAI with better error handling
-OpenAI = None
-import_error = None
 
-try:
-    # First, try to import pydantic_core to see if that's the issue
+def log_import_diagnostics() -> None:
+    """Print where pydantic_core and its compiled module are (or are not) on sys.path"""
+    import sys
+    log.info('Python version: %s', sys.version)
+    log.info('Python executable: %s', sys.executable)
+    log.info('Current working directory: %s', os.getcwd())
+    log.info('sys.path: %s', sys.path)
     try:
         import pydantic_core
-        print(f"✓ pydantic_core imported successfully")
-        print(f"  pydantic_core location: {pydantic_core.__file__}")
-        
-        # Try to access the _pydantic_core module specifically
-        try:
-            from pydantic_core import _pydantic_core
-            print(f"✓ pydantic_core._pydantic_core imported successfully")
-        except ImportError as inner_e:
-            print(f"✗ Failed to import pydantic_core._pydantic_core: {str(inner_e)}")
-            # Try to find the .so file
-            try:
-                import sys
-                import os
-                pydantic_core_dir = os.path.dirname(pydantic_core.__file__)
-                print(f"  Looking for .so files in: {pydantic_core_dir}")
-                for file in os.listdir(pydantic_core_dir):
-                    if file.endswith('.so'):
-                        so_path = os.path.join(pydantic_core_dir, file)
-                        print(f"  Found .so file: {so_path}")
-                        print(f"  File exists: {os.path.exists(so_path)}")
-                        print(f"  File size: {os.path.getsize(so_path)} bytes")
-            except Exception as debug_e:
-                print(f"  Debug error: {debug_e}")
+        log.info('✓ pydantic_core imported successfully from %s', pydantic_core.__file__)
+        from pydantic_core import _pydantic_core
+        log.info('✓ pydantic_core._pydantic_core imported successfully')
     except ImportError as e:
-        print(f"✗ Failed to import pydantic_core: {str(e)}")
-        # Try to find where it should be
-        try:
-            import sys
-            import os
-            print(f"  Python version: {sys.version}")
-            print(f"  Python executable: {sys.executable}")
-            print(f"  sys.path: {sys.path}")
-            for path in sys.path:
-                pydantic_core_path = os.path.join(path, 'pydantic_core')
-                if os.path.exists(pydantic_core_path):
-                    print(f"  Found pydantic_core at: {pydantic_core_path}")
-                    # List files
-                    files = os.listdir(pydantic_core_path)
-                    print(f"  Files in pydantic_core: {files}")
-                    # Check for .so files
-                    so_files = [f for f in files if f.endswith('.so')]
-                    if so_files:
-                        print(f"  .so files found: {so_files}")
-                    else:
-                        print(f"  ⚠️  No .so files found!")
-        except Exception as debug_e:
-            print(f"  Debug error: {debug_e}")
-    
-    # Now try to import OpenAI
-    from openai import OpenAI
-    print("✓ OpenAI package imported successfully")
-except ImportError as e:
-    import_error = str(e)
-    print(f"✗ Failed to import OpenAI: {import_error}")
-    # Try to get more details about what's missing
-    try:
-        import sys
-        print(f"Python path: {sys.path}")
-        print(f"Current working directory: {os.getcwd()}")
-        # Check for pydantic_core files
-        for path in sys.path:
-            pydantic_path = os.path.join(path, 'pydantic_core')
-            if os.path.exists(pydantic_path):
-                print(f"Found pydantic_core directory at: {pydantic_path}")
-                # Look for .so files
-                for root, dirs, files in os.walk(pydantic_path):
-                    so_files = [f for f in files if f.endswith('.so')]
-                    if so_files:
-                        print(f"  Found .so files in {root}: {so_files[:5]}")
-    except Exception as debug_error:
-        print(f"Debug error: {debug_error}")
-    OpenAI = None
-except Exception as e:
-    import_error = str(e)
-    print(f"✗ Unexpected error importing OpenAI: {import_error}")
-    import traceback
-    traceback.print_exc()
-    OpenAI = None
-
-# Try to import PDF/image processing libraries
-try:
-    import fitz  # PyMuPDF
-    print("✓ PyMuPDF (fitz) imported successfully")
-except ImportError as e:
-    print(f"⚠️  PyMuPDF not available: {e}")
-    fitz = None
-
-try:
-    from PIL import Image
-    print("✓ Pillow (PIL) imported successfully")
-except ImportError as e:
-    print(f"⚠️  Pillow not available: {e}")
-    Image = None
-
-# Initialize clients
-s3_client = boto3.client('s3') if boto3 else None
-
-# Initialize OpenAI client with better error handling
-openai_client = None
-openai_error = None
+        log.error('✗ Failed to import pydantic_core: %s', e)
+    # Look for the package and its .so files on every path entry
+    for path in sys.path:
+        pydantic_core_path = os.path.join(path, 'pydantic_core')
+        if not os.path.isdir(pydantic_core_path):
+            continue
+        log.info('  Found pydantic_core at: %s', pydantic_core_path)
+        so_files = [f for f in os.listdir(pydantic_core_path) if f.endswith('.so')]
+        if so_files:
+            log.info('  .so files found: %s', so_files)
+        else:
+            log.warning('  ⚠️  No .so files found!')
 
-print(f"OpenAI class available: {OpenAI is not None}")
 
-if OpenAI is None:
-    error_detail = f"Import error: {import_error}" if import_error else "Unknown import error"
-    openai_error = f"OpenAI package not installed. Make sure 'openai' is in requirements.txt and included in deployment package. {error_detail}"
-    print(f"ERROR: {openai_error}")
-else:
-    openai_api_key = os.environ.get('OPENAI_API_KEY')
-    print(f"OPENAI_API_KEY present: {bool(openai_api_key)}")
-    print(f"OPENAI_API_KEY length: {len(openai_api_key) if openai_api_key else 0}")
+def get_openai_client() -> Any:
+    """
+    OpenAI client, created on first use
+    Raises: ValueError explaining why the client is not available
+    """
+    global openai_client, openai_error
+    if openai_client is None and openai_error is None:
+        with _client_lock:
+            if openai_client is None and openai_error is None:
+                openai_client, openai_error = create_openai_client()
+    if openai_client is None:
+        log.error('%s', openai_error)
+        raise ValueError(openai_error)
+    return openai_client
+
+
+def create_openai_client() -> Tuple[Any, Optional[str]]:
+    """Returns: (client, None) or (None, error message)"""
+    if DEBUG_IMPORTS:
+        log_import_diagnostics()
+    try:
+        from openai import OpenAI
+    except Exception as e:
+        log.error('✗ Failed to import OpenAI: %s', e)
+        if not DEBUG_IMPORTS:
+            log_import_diagnostics()
+        return None, (
+            "OpenAI package not installed. Make sure 'openai' is in requirements.txt and "
+            f"included in deployment package. Import error: {str(e)}"
+        )
     
+    openai_api_key = os.environ.get('OPENAI_API_KEY')
     if not openai_api_key:
-        openai_error = "OPENAI_API_KEY environment variable not set. Please configure it in Lambda environment variables."
-        print(f"ERROR: {openai_error}")
-    else:
+        return None, "OPENAI_API_KEY environment variable not set. Please configure it in Lambda environment variables."
+    try:
+        # Retries are done by model_call_policy; the client's own would multiply them
+        client = OpenAI(api_key=openai_api_key, max_retries=0)
+    except Exception as e:
+        log.exception('Failed to initialize OpenAI client: %s', e)
+        return None, f'Failed to initialize OpenAI client: {str(e)}'
+    log.info('✓ OpenAI client initialized')
+    return client, None
+
+
+def get_s3_client() -> Any:
+    """S3 client, created on first use; None without boto3"""
+    global s3_client
+    if s3_client is None:
+        with _client_lock:
+            if s3_client is None:
+                try:
+                    import boto3
+                except ImportError:
+                    return None
+                s3_client = boto3.client('s3')
+    return s3_client
+
+
+def get_lambda_client() -> Any:
+    """Lambda client used to start job workers, created on first use"""
+    global lambda_client
+    if lambda_client is None:
+        with _client_lock:
+            if lambda_client is None:
+                import boto3
+                lambda_client = boto3.client('lambda')
+    return lambda_client
+
+
+def get_fitz() -> Any:
+    """PyMuPDF module, imported on first use; None if it is not installed"""
+    global fitz
+    if fitz is None:
         try:
-            print("Attempting to initialize OpenAI client...")
-            openai_client = OpenAI(api_key=openai_api_key)
-            print("✓ OpenAI client initialized successfully")
-        except Exception as e:
-            openai_error = f"Failed to initialize OpenAI client: {str(e)}"
-            print(f"ERROR: {openai_error}")
-            import traceback
-            traceback.print_exc()
+            import fitz as pymupdf
+        except ImportError as e:
+            log.warning('⚠️  PyMuPDF not available: %s', e)
+            return None
+        fitz = pymupdf
+    return fitz
 
 # Default region
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
@@ -158,13 +166,213 @@ REQUIRE_AUTH = os.environ.get('REQUIRE_AUTH', 'true').lower() == 'true'
 # File size limit (20 MB in bytes)
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20 MB
 
+# Direct S3 uploads (presigned POST via action=createUpload)
+UPLOAD_BUCKET = os.environ.get('UPLOAD_BUCKET', '')
+UPLOAD_PREFIX = os.environ.get('UPLOAD_PREFIX', 'uploads/')
+UPLOAD_URL_EXPIRES = int(os.environ.get('UPLOAD_URL_EXPIRES', '300'))  # seconds
+S3_READ_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
 # Rate limiting configuration
 MAX_REQUESTS_PER_MINUTE = int(os.environ.get('MAX_REQUESTS_PER_MINUTE', '10'))
 RATE_LIMIT_WINDOW = 60  # 60 seconds (1 minute)
 
-# In-memory rate limiter (simple implementation)
-# In production, consider using DynamoDB or ElastiCache for distributed rate limiting
-_rate_limit_store: Dict[str, List[float]] = defaultdict(list)
+# Rate limiter backend: memory (per container, token bucket) or dynamodb
+# (fixed window shared by all instances; table with string partition key 'pk'
+# and TTL on 'expiresAt'). RATE_LIMIT_DYNAMODB_ENDPOINT points it at DynamoDB Local.
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE', '')
+RATE_LIMIT_DYNAMODB_ENDPOINT = os.environ.get('RATE_LIMIT_DYNAMODB_ENDPOINT', '')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+
+
+def get_dynamodb_client() -> Any:
+    """DynamoDB client for the shared rate limiter, created on first check"""
+    import boto3
+    if RATE_LIMIT_DYNAMODB_ENDPOINT:
+        return boto3.client('dynamodb', endpoint_url=RATE_LIMIT_DYNAMODB_ENDPOINT)
+    return boto3.client('dynamodb')
+
+
+rate_limiter = create_rate_limiter(
+    RATE_LIMIT_BACKEND,
+    MAX_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_WINDOW,
+    max_keys=RATE_LIMIT_MAX_KEYS,
+    dynamodb_client=get_dynamodb_client,
+    table=RATE_LIMIT_TABLE,
+)
+
+# Maximum number of page requests sent to OpenAI at the same time
+# (1 = process pages sequentially)
+VISION_MAX_CONCURRENCY = max(1, int(os.environ.get('VISION_MAX_CONCURRENCY', '4')))
+
+# Model used for extraction
+VISION_MODEL = os.environ.get('VISION_MODEL', 'gpt-4o')
+
+# Model call policy: timeout per attempt, retries with exponential backoff
+# and jitter on 429/5xx/timeouts, and optional hedging (a duplicate request
+# once a call is slower than MODEL_HEDGE_AFTER_MS, or than the p95 of recent
+# calls to the same model). Pages that still fail come back empty and are
+# listed in metadata.failedPages instead of failing the whole statement.
+MODEL_TIMEOUT = float(os.environ.get('MODEL_TIMEOUT', '60'))
+MODEL_MAX_ATTEMPTS = int(os.environ.get('MODEL_MAX_ATTEMPTS', '3'))
+MODEL_BACKOFF_BASE = float(os.environ.get('MODEL_BACKOFF_BASE', '0.5'))
+MODEL_BACKOFF_MAX = float(os.environ.get('MODEL_BACKOFF_MAX', '8'))
+MODEL_HEDGE_ENABLED = os.environ.get('MODEL_HEDGE_ENABLED', 'false').lower() == 'true'
+MODEL_HEDGE_AFTER_MS = os.environ.get('MODEL_HEDGE_AFTER_MS')
+MODEL_HEDGE_MIN_SAMPLES = int(os.environ.get('MODEL_HEDGE_MIN_SAMPLES', '20'))
+model_call_policy = CallPolicy(
+    timeout=MODEL_TIMEOUT,
+    max_attempts=MODEL_MAX_ATTEMPTS,
+    backoff_base=MODEL_BACKOFF_BASE,
+    backoff_max=MODEL_BACKOFF_MAX,
+    hedge_enabled=MODEL_HEDGE_ENABLED,
+    hedge_after=float(MODEL_HEDGE_AFTER_MS) / 1000 if MODEL_HEDGE_AFTER_MS else None,
+    hedge_min_samples=MODEL_HEDGE_MIN_SAMPLES,
+    max_workers=2 * VISION_MAX_CONCURRENCY,
+)
+
+# Text-layer fast path: pages of native PDFs with at least TEXT_LAYER_MIN_WORDS
+# words are sent to the model as text instead of a rendered image
+TEXT_LAYER_ENABLED = os.environ.get('TEXT_LAYER_ENABLED', 'true').lower() == 'true'
+TEXT_LAYER_MIN_WORDS = int(os.environ.get('TEXT_LAYER_MIN_WORDS', '30'))
+TEXT_LAYER_MODEL = os.environ.get('TEXT_LAYER_MODEL', VISION_MODEL)
+
+# Render profile for scanned pages: auto (chosen per page by ink density),
+# or a fixed profile from statement_processor.rendering (legacy = 300 DPI PNG)
+RENDER_PROFILE = os.environ.get('RENDER_PROFILE', 'auto')
+if RENDER_PROFILE != 'auto' and RENDER_PROFILE not in RENDER_PROFILES:
+    log.warning('Unknown RENDER_PROFILE "%s", using auto', RENDER_PROFILE)
+    RENDER_PROFILE = 'auto'
+
+# Page triage: skip pages that cannot contain transactions (cover, terms,
+# rewards, payment coupon). Scanned pages can optionally be checked with a
+# low-detail call to a small model.
+TRIAGE_ENABLED = os.environ.get('TRIAGE_ENABLED', 'true').lower() == 'true'
+TRIAGE_MODEL_CHECK = os.environ.get('TRIAGE_MODEL_CHECK', 'false').lower() == 'true'
+TRIAGE_MODEL = os.environ.get('TRIAGE_MODEL', 'gpt-4o-mini')
+
+# Multi-page batching: pack several pages per request under token budgets
+PAGE_BATCHING_ENABLED = os.environ.get('PAGE_BATCHING_ENABLED', 'false').lower() == 'true'
+BATCH_MAX_INPUT_TOKENS = int(os.environ.get('BATCH_MAX_INPUT_TOKENS', '4000'))
+BATCH_MAX_OUTPUT_TOKENS = int(os.environ.get('BATCH_MAX_OUTPUT_TOKENS', '4000'))
+BATCH_MAX_PAGES = int(os.environ.get('BATCH_MAX_PAGES', '4'))
+
+# Rule-based parsers for known issuer layouts, tried before any model call
+RULE_PARSERS_ENABLED = os.environ.get('RULE_PARSERS_ENABLED', 'true').lower() == 'true'
+# Share of each page's date/amount rows the parser must recognize; below it
+# the layout probably changed (an extra column...) and OpenAI is used instead
+RULE_PARSER_MIN_COVERAGE = float(os.environ.get('RULE_PARSER_MIN_COVERAGE', '0.9'))
+
+# Reconciliation: the printed period total (read from the text layer) is
+# compared with the sum of extracted amounts and reported in
+# metadata.reconciliation. Report-only by default: printed totals often
+# include interest or fees. With RECONCILE_MAX_REQUERY_PAGES > 0, a mismatch
+# re-asks VISION_MODEL for up to that many text pages that print more
+# purchase rows than were extracted from them.
+RECONCILE_ENABLED = os.environ.get('RECONCILE_ENABLED', 'true').lower() == 'true'
+RECONCILE_TOLERANCE = float(os.environ.get('RECONCILE_TOLERANCE', '0.01'))
+RECONCILE_MAX_REQUERY_PAGES = int(os.environ.get('RECONCILE_MAX_REQUERY_PAGES', '0'))
+
+# Tiered routing: pages go first to ROUTING_CHEAP_MODEL (text-layer pages,
+# and scanned pages too with ROUTING_CHEAP_IMAGES). Answers that fail the
+# checks in statement_processor.routing are asked again to VISION_MODEL on
+# the page image. Per-tier hit rates go to metadata.routing and the trace.
+ROUTING_ENABLED = os.environ.get('ROUTING_ENABLED', 'false').lower() == 'true'
+ROUTING_CHEAP_MODEL = os.environ.get('ROUTING_CHEAP_MODEL', 'gpt-4o-mini')
+ROUTING_CHEAP_IMAGES = os.environ.get('ROUTING_CHEAP_IMAGES', 'true').lower() == 'true'
+ROUTING_MIN_IN_PERIOD = float(os.environ.get('ROUTING_MIN_IN_PERIOD', '0.8'))
+ROUTING_MIN_ROW_COVERAGE = float(os.environ.get('ROUTING_MIN_ROW_COVERAGE', '0.5'))
+
+# Tracing: one CloudWatch EMF JSON line per statement with stage timings,
+# model latency, tokens and bytes sent; optionally also in metadata.trace
+# (TRACE_IN_RESPONSE, or "trace": true in the request)
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED', 'true').lower() == 'true'
+TRACE_IN_RESPONSE = os.environ.get('TRACE_IN_RESPONSE', 'false').lower() == 'true'
+TRACE_NAMESPACE = os.environ.get('TRACE_NAMESPACE', 'StatementProcessor')
+
+# Merchant dictionary (build_merchant_dictionary.py): known merchants get
+# their canonical name and category locally, for model and rule-parser
+# output alike. Loaded on the first statement; no file means no lookups.
+MERCHANTS_ENABLED = os.environ.get('MERCHANTS_ENABLED', 'true').lower() == 'true'
+MERCHANT_DICTIONARY_PATH = os.environ.get(
+    'MERCHANT_DICTIONARY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'merchants.tsv.gz')
+)
+
+# Model answer format (statement_processor.prompts): 'json' objects with full
+# keys, or 'compact' rows without repeated keys (fewer output tokens).
+# The version (in cache keys) changes with the format and with the prompts.
+PROMPT_FORMAT = os.environ.get('PROMPT_FORMAT', 'json')
+if PROMPT_FORMAT not in PROMPT_VERSIONS:
+    log.warning('Unknown PROMPT_FORMAT "%s", using json', PROMPT_FORMAT)
+    PROMPT_FORMAT = 'json'
+PROMPT_VERSION = PROMPT_VERSIONS[PROMPT_FORMAT]
+
+# Extraction result cache: none, memory, disk or s3
+RESULT_CACHE_BACKEND = os.environ.get('RESULT_CACHE_BACKEND', 'none')
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '128'))
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '/tmp/statement-cache/results')
+RESULT_CACHE_BUCKET = os.environ.get('RESULT_CACHE_BUCKET', '')
+RESULT_CACHE_PREFIX = os.environ.get('RESULT_CACHE_PREFIX', 'statement-cache/results/')
+
+result_cache = create_cache(
+    RESULT_CACHE_BACKEND,
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    directory=RESULT_CACHE_DIR,
+    s3_client=get_s3_client,
+    bucket=RESULT_CACHE_BUCKET,
+    prefix=RESULT_CACHE_PREFIX,
+)
+
+# Per-page model response cache: none, memory, disk or s3
+# Lets a retried statement only call the model for pages that failed before
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'none')
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', '512'))
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', '/tmp/statement-cache/pages')
+PAGE_CACHE_BUCKET = os.environ.get('PAGE_CACHE_BUCKET', RESULT_CACHE_BUCKET)
+PAGE_CACHE_PREFIX = os.environ.get('PAGE_CACHE_PREFIX', 'statement-cache/pages/')
+
+page_cache = create_cache(
+    PAGE_CACHE_BACKEND,
+    max_entries=PAGE_CACHE_MAX_ENTRIES,
+    directory=PAGE_CACHE_DIR,
+    s3_client=get_s3_client,
+    bucket=PAGE_CACHE_BUCKET,
+    prefix=PAGE_CACHE_PREFIX,
+)
+
+# Asynchronous jobs (action=submitJob / getJob): file, sqlite or s3 store
+JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'file')
+JOB_STORE_DIR = os.environ.get('JOB_STORE_DIR', '/tmp/statement-jobs')
+JOB_STORE_SQLITE_PATH = os.environ.get('JOB_STORE_SQLITE_PATH', '/tmp/statement-jobs.sqlite3')
+JOB_STORE_BUCKET = os.environ.get('JOB_STORE_BUCKET', UPLOAD_BUCKET)
+JOB_STORE_PREFIX = os.environ.get('JOB_STORE_PREFIX', 'statement-jobs/')
+
+# How jobs run: 'lambda' invokes this function asynchronously (needs the s3
+# store, the worker may land in another container), 'thread' runs them in a
+# background thread of the same process (local runs and tests)
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'lambda' if os.environ.get('AWS_LAMBDA_FUNCTION_NAME') else 'thread')
+
+job_store = create_job_store(
+    JOB_STORE_BACKEND,
+    directory=JOB_STORE_DIR,
+    sqlite_path=JOB_STORE_SQLITE_PATH,
+    s3_client=get_s3_client,
+    bucket=JOB_STORE_BUCKET,
+    prefix=JOB_STORE_PREFIX,
+)
+
+# Called as each page finishes: (page_num, normalized transactions, total pages)
+PageCallback = Callable[[int, List[Dict[str, Any]], int], None]
+
+
+class FileTooLargeError(ValueError):
+    """Statement file over MAX_FILE_SIZE (answered with 413)"""
+
+    def __init__(self, file_size: int):
+        super().__init__(f'File too large: {file_size} bytes')
+        self.file_size = file_size
 
 
 def verify_api_key(event: Dict[str, Any]) -> bool:
@@ -173,7 +381,7 @@ def verify_api_key(event: Dict[str, Any]) -> bool:
         return True  # Permitir sin auth en desarrollo
     
     if not API_KEY:
-        print('Warning: API_KEY not configured but REQUIRE_AUTH is true')
+        log.warning('API_KEY not configured but REQUIRE_AUTH is true')
         return False  # Si no hay API key configurada, rechazar
     
     # Obtener headers del event
@@ -192,14 +400,14 @@ def verify_api_key(event: Dict[str, Any]) -> bool:
     )
     
     if not auth_header:
-        print('Missing API key in request headers')
+        log.info('Missing API key in request headers')
         return False
     
     # Comparación segura (timing-safe) para prevenir timing attacks
     try:
         return hmac.compare_digest(auth_header, API_KEY)
     except Exception as e:
-        print(f'Error comparing API keys: {e}')
+        log.error('Error comparing API keys: %s', e)
         return False
 
 
@@ -230,26 +438,7 @@ def check_rate_limit(client_id: str) -> Tuple[bool, int]:
     Verificar rate limit para un cliente
     Returns: (is_allowed, remaining_requests)
     """
-    current_time = time.time()
-    
-    # Limpiar requests antiguos (fuera de la ventana de tiempo)
-    window_start = current_time - RATE_LIMIT_WINDOW
-    _rate_limit_store[client_id] = [
-        req_time for req_time in _rate_limit_store[client_id]
-        if req_time > window_start
-    ]
-    
-    # Contar requests en la ventana actual
-    request_count = len(_rate_limit_store[client_id])
-    
-    if request_count >= MAX_REQUESTS_PER_MINUTE:
-        return False, 0
-    
-    # Registrar este request
-    _rate_limit_store[client_id].append(current_time)
-    remaining = MAX_REQUESTS_PER_MINUTE - request_count - 1
-    
-    return True, remaining
+    return rate_limiter.check(client_id)
 
 
 def check_file_size(file_base64: str) -> Tuple[bool, int]:
@@ -276,6 +465,118 @@ def check_file_size(file_base64: str) -> Tuple[bool, int]:
     return True, estimated_size
 
 
+def file_too_large_response(file_size: int, remaining: int) -> Dict[str, Any]:
+    """413 response for files over MAX_FILE_SIZE"""
+    return build_response(413, {
+        'success': False,
+        'error': f'File too large. Maximum file size is {MAX_FILE_SIZE / (1024*1024):.0f} MB. Received file is approximately {file_size / (1024*1024):.2f} MB.',
+    }, remaining)
+
+
+def build_response(status_code: int, payload: Dict[str, Any], remaining: int) -> Dict[str, Any]:
+    """JSON response with CORS and rate limit headers"""
+    cors_headers = get_cors_headers()
+    cors_headers.update({
+        'X-RateLimit-Limit': str(MAX_REQUESTS_PER_MINUTE),
+        'X-RateLimit-Remaining': str(remaining),
+    })
+    return {
+        'statusCode': status_code,
+        'headers': cors_headers,
+        'body': json.dumps(payload),
+    }
+
+
+def get_file_type_from_key(s3_key: str) -> str:
+    """Detect file type from the S3 key extension (PDF by default)"""
+    s3_key_lower = s3_key.lower()
+    if s3_key_lower.endswith('.png'):
+        return 'png'
+    if s3_key_lower.endswith(('.jpg', '.jpeg')):
+        return 'jpeg'
+    return 'pdf'
+
+
+def new_upload_key(file_type: str) -> str:
+    """Unique S3 key under UPLOAD_PREFIX for a statement file"""
+    extension = {'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpg'}.get(file_type.lower(), 'pdf')
+    return f'{UPLOAD_PREFIX}{uuid.uuid4().hex}.{extension}'
+
+
+def create_statement_upload(file_type: str) -> Dict[str, Any]:
+    """
+    Presigned POST so the client uploads the file straight to S3
+    
+    The size limit is enforced by S3 (content-length-range), so large files
+    never pass through the Function URL as base64.
+    """
+    if not get_s3_client() or not UPLOAD_BUCKET:
+        raise ValueError('S3 uploads are not configured (UPLOAD_BUCKET)')
+    
+    s3_key = new_upload_key(file_type)
+    presigned = get_s3_client().generate_presigned_post(
+        Bucket=UPLOAD_BUCKET,
+        Key=s3_key,
+        Conditions=[['content-length-range', 1, MAX_FILE_SIZE]],
+        ExpiresIn=UPLOAD_URL_EXPIRES,
+    )
+    return {
+        'uploadUrl': presigned['url'],
+        'uploadFields': presigned['fields'],
+        's3Bucket': UPLOAD_BUCKET,
+        's3Key': s3_key,
+        'expiresIn': UPLOAD_URL_EXPIRES,
+    }
+
+
+def check_s3_location_allowed(s3_bucket: str, s3_key: str) -> None:
+    """Only read statements from the upload bucket/prefix, never arbitrary objects"""
+    if not get_s3_client():
+        raise ValueError('boto3 not available for S3 access')
+    if not UPLOAD_BUCKET or s3_bucket != UPLOAD_BUCKET or not s3_key.startswith(UPLOAD_PREFIX):
+        raise ValueError('S3 location not allowed. Use the bucket and key returned by createUpload')
+
+
+def get_s3_object_size(s3_bucket: str, s3_key: str) -> int:
+    response = get_s3_client().head_object(Bucket=s3_bucket, Key=s3_key)
+    return int(response['ContentLength'])
+
+
+def read_s3_object(s3_bucket: str, s3_key: str, file_size: int) -> bytearray:
+    """
+    Read an S3 object into a single preallocated buffer
+    
+    Chunks are copied straight into place, so the file exists once in memory
+    (no base64 string, no decoded copy, no join of chunks).
+    """
+    response = get_s3_client().get_object(Bucket=s3_bucket, Key=s3_key)
+    buffer = bytearray(file_size)
+    view = memoryview(buffer)
+    offset = 0
+    for chunk in response['Body'].iter_chunks(chunk_size=S3_READ_CHUNK_SIZE):
+        if offset + len(chunk) > file_size:
+            raise ValueError('S3 object is larger than its reported size')
+        view[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    if offset != file_size:
+        raise ValueError(f'S3 object truncated: read {offset} of {file_size} bytes')
+    return buffer
+
+
+def get_result_cache_key(file_buffer: bytes, file_type: str, body: Dict[str, Any]) -> str:
+    """Cache key for a statement: file content plus everything that changes the extraction"""
+    return make_cache_key(
+        file_buffer,
+        file_type.lower(),
+        body.get('billingPeriod'),
+        body.get('creditCardName', 'Credit Card'),
+        VISION_MODEL,
+        ROUTING_CHEAP_MODEL if ROUTING_ENABLED else None,
+        PROMPT_VERSION,
+        dictionary_version(MERCHANT_DICTIONARY_PATH) if MERCHANTS_ENABLED else None,
+    )
+
+
 def get_cors_headers() -> Dict[str, str]:
     """Get CORS headers for all responses"""
     return {
@@ -299,7 +600,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         "body": "{\"fileBase64\": \"...\", \"creditCardId\": \"...\"}"
     }
     """
-    print(f'Received event: {json.dumps(event, default=str)}')
+    log.begin_request()
+    # Never the raw event: the body can be a multi-megabyte base64 file
+    if log.enabled('info'):
+        log.info('Received event: %s', log.compact(log.summarize_event(event)))
+    
+    # Background job invoked by submitJob (direct invoke, never a Function URL request)
+    if 'jobWorker' in event and 'requestContext' not in event and 'headers' not in event:
+        return run_job(str(event['jobWorker']))
     
     # Handle CORS preflight (OPTIONS) requests
     request_method = event.get('requestContext', {}).get('http', {}).get('method') or \
@@ -373,73 +681,62 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         body = event
     
     try:
-        # Verificar que el body tenga el archivo
-        file_base64_str = body.get('fileBase64') or body.get('pdfBase64')
-        if not file_base64_str:
-            raise ValueError('Either fileBase64/pdfBase64 or s3Bucket+s3Key must be provided')
+        # Acción para obtener una URL firmada y subir el archivo directo a S3
+        if body.get('action') == 'createUpload':
+            return build_response(200, {
+                'success': True,
+                **create_statement_upload(body.get('fileType', 'pdf')),
+            }, remaining)
         
-        # Verificar tamaño del archivo
-        is_valid_size, file_size = check_file_size(file_base64_str)
-        if not is_valid_size:
+        # Trabajos asíncronos: submitJob responde de inmediato con el jobId,
+        # getJob devuelve el estado y las páginas terminadas desde 'cursor'
+        if body.get('action') == 'submitJob':
+            return build_response(202, {'success': True, **submit_job(body, context)}, remaining)
+        
+        if body.get('action') == 'getJob':
+            job_id = str(body.get('jobId', ''))
+            job = require_job_store().get(job_id) if job_id.isalnum() else None
+            if not job:
+                return build_response(404, {'success': False, 'error': 'Job not found'}, remaining)
+            return build_response(200, {
+                'success': True,
+                **job_view(job, int(body.get('cursor') or 0)),
+            }, remaining)
+        
+        # Duplicados contra el historial de la tarjeta, para todo el lote a la vez
+        if body.get('action') == 'checkDuplicates':
+            transactions = body.get('transactions')
+            history = body.get('history')
+            if not isinstance(transactions, list) or not isinstance(history, list):
+                return build_response(400, {'success': False, 'error': 'transactions and history must be lists'}, remaining)
+            return build_response(200, {
+                'success': True,
+                'results': check_duplicates(transactions, history),
+            }, remaining)
+        
+        start_trace('extractStatement')
+        file_buffer, file_type = load_statement_file(body)
+        
+        if body.get('stream'):
+            # NDJSON, one line per page. The Python runtime only returns the body
+            # when the handler ends; streaming_app.py sends each line as it is ready.
             cors_headers = get_cors_headers()
             cors_headers.update({
+                'Content-Type': 'application/x-ndjson',
                 'X-RateLimit-Limit': str(MAX_REQUESTS_PER_MINUTE),
                 'X-RateLimit-Remaining': str(remaining),
             })
             return {
-                'statusCode': 413,
+                'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'File too large. Maximum file size is {MAX_FILE_SIZE / (1024*1024):.0f} MB. Received file is approximately {file_size / (1024*1024):.2f} MB.',
-                }),
+                'body': ''.join(stream_statement(file_buffer, file_type, body)),
             }
         
-        # Extract file content (PDF or image)
-        file_buffer = None
-        file_type = None
-        
-        if 'fileBase64' in body:
-            file_buffer = base64.b64decode(body['fileBase64'])
-            file_type = body.get('fileType', 'pdf')  # pdf, png, jpg, jpeg
-        elif 'pdfBase64' in body:  # Backward compatibility
-            file_buffer = base64.b64decode(body['pdfBase64'])
-            file_type = 'pdf'
-        elif 's3Bucket' in body and 's3Key' in body:
-            # Alternative: fetch from S3
-            if not s3_client:
-                raise ValueError('boto3 not available for S3 access')
-            response = s3_client.get_object(
-                Bucket=body['s3Bucket'],
-                Key=body['s3Key']
-            )
-            file_buffer = response['Body'].read()
-            # Try to detect file type from S3 key
-            s3_key_lower = body['s3Key'].lower()
-            if s3_key_lower.endswith('.png'):
-                file_type = 'png'
-            elif s3_key_lower.endswith(('.jpg', '.jpeg')):
-                file_type = 'jpeg'
-            elif s3_key_lower.endswith('.pdf'):
-                file_type = 'pdf'
-            else:
-                file_type = 'pdf'  # Default
-        else:
-            raise ValueError('Either fileBase64/pdfBase64 or s3Bucket+s3Key must be provided')
-        
-        print(f'File received, type: {file_type}, size: {len(file_buffer)} bytes')
-        
-        # Use OpenAI Vision API to extract transactions directly from file
-        transactions = extract_transactions_with_llm_vision(
-            file_buffer,
-            file_type,
-            body.get('creditCardName', 'Credit Card'),
-            body.get('billingPeriod'),
-            body.get('cutDate')
-        )
+        transactions, extraction_metadata = process_statement(file_buffer, file_type, body)
         
-        print(f'Returning {len(transactions)} transactions to client')
-        print(f'First few transactions: {json.dumps(transactions[:3], indent=2) if transactions else "None"}')
+        log.info('Returning %d transactions to client', len(transactions))
+        if log.enabled('debug'):
+            log.debug('First few transactions: %s', log.compact(transactions[:3]))
         
         cors_headers = get_cors_headers()
         cors_headers.update({
@@ -454,13 +751,15 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'transactions': transactions,
                 'metadata': {
                     'totalExtracted': len(transactions),
+                    **extraction_metadata,
                 },
             }),
         }
+    except FileTooLargeError as error:
+        return file_too_large_response(error.file_size, remaining)
     except Exception as error:
-        print(f'Error processing statement: {str(error)}')
+        log.exception('Error processing statement: %s', error)
         import traceback
-        traceback.print_exc()
         
         cors_headers = get_cors_headers()
         cors_headers.update({
@@ -478,19 +777,383 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
 
 
+def load_statement_file(body: Dict[str, Any]) -> Tuple[Union[bytes, bytearray], str]:
+    """
+    Statement file from the request: base64 in the body or a reference to an uploaded S3 object
+    Returns: (file_buffer, file_type); raises FileTooLargeError over MAX_FILE_SIZE
+    """
+    # Verificar que el body tenga el archivo
+    file_base64_str = body.get('fileBase64') or body.get('pdfBase64')
+    if not file_base64_str and not body.get('s3Key'):
+        raise ValueError('Either fileBase64/pdfBase64 or s3Bucket+s3Key must be provided')
+    
+    if file_base64_str:
+        # Verificar tamaño del archivo
+        is_valid_size, file_size = check_file_size(file_base64_str)
+        if not is_valid_size:
+            raise FileTooLargeError(file_size)
+        
+        if 'fileBase64' in body:
+            file_type = body.get('fileType', 'pdf')  # pdf, png, jpg, jpeg
+        else:  # Backward compatibility (pdfBase64)
+            file_type = 'pdf'
+        with stage('decode'):
+            return base64.b64decode(file_base64_str), file_type
+    
+    # Archivo subido a S3 (p. ej. con createUpload): se lee directo, sin base64
+    s3_bucket = body.get('s3Bucket') or UPLOAD_BUCKET
+    s3_key = body['s3Key']
+    check_s3_location_allowed(s3_bucket, s3_key)
+    
+    file_size = get_s3_object_size(s3_bucket, s3_key)
+    if file_size > MAX_FILE_SIZE:
+        raise FileTooLargeError(file_size)
+    
+    with stage('s3Read'):
+        file_buffer = read_s3_object(s3_bucket, s3_key, file_size)
+    return file_buffer, body.get('fileType') or get_file_type_from_key(s3_key)
+
+
+def process_statement(
+    file_buffer: Union[bytes, bytearray],
+    file_type: str,
+    params: Dict[str, Any],
+    on_page: Optional[PageCallback] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Extract a statement, going through the result cache
+    params: request fields (creditCardName, billingPeriod, cutDate)
+    Returns: (transactions, metadata)
+    """
+    log.info('File received, type: %s, size: %d bytes', file_type, len(file_buffer))
+    trace = current_trace() or start_trace('extractStatement')
+    try:
+        # Same file with the same parameters was already extracted: skip the model
+        with stage('resultCache'):
+            cache_key = get_result_cache_key(file_buffer, file_type, params) if result_cache else None
+            transactions = result_cache.get(cache_key) if result_cache else None
+        
+        extraction_metadata: Dict[str, Any] = {'cacheHit': transactions is not None}
+        if transactions is not None:
+            log.info('Result cache hit (%s): %s', result_cache.name, cache_key)
+        else:
+            transactions = extract_transactions(
+                file_buffer,
+                file_type,
+                params.get('creditCardName', 'Credit Card'),
+                params.get('billingPeriod'),
+                params.get('cutDate'),
+                extraction_metadata,
+                on_page
+            )
+            # Empty or partial results are not cached: a failed page must be retried next time
+            if result_cache and transactions and not extraction_metadata.get('failedPages'):
+                result_cache.set(cache_key, transactions)
+    finally:
+        trace_summary = trace.summary()
+        if TRACE_ENABLED:
+            log.metric(trace.emf_record(TRACE_NAMESPACE, trace_summary))
+    
+    if TRACE_IN_RESPONSE or params.get('trace'):
+        extraction_metadata['trace'] = trace_summary
+    return transactions, extraction_metadata
+
+
+def stream_statement(
+    file_buffer: Union[bytes, bytearray],
+    file_type: str,
+    params: Dict[str, Any]
+) -> Iterator[str]:
+    """
+    Extract a statement as NDJSON lines, each yielded as soon as it is ready
+    
+    {"type": "page", "page", "totalPages", "transactions"} for every page as it
+    finishes (in completion order), then a final {"type": "done",
+    "transactions", "metadata"} with the complete result in page order, or
+    {"type": "error", "error"}. Result cache hits only produce the final line.
+    """
+    messages: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+    
+    def on_page(page_num: int, transactions: List[Dict[str, Any]], total_pages: int) -> None:
+        messages.put({'type': 'page', 'page': page_num, 'totalPages': total_pages, 'transactions': transactions})
+    
+    def run() -> None:
+        try:
+            transactions, metadata = process_statement(file_buffer, file_type, params, on_page)
+            messages.put({
+                'type': 'done',
+                'transactions': transactions,
+                'metadata': {'totalExtracted': len(transactions), **metadata},
+            })
+        except Exception as error:
+            log.exception('Error processing statement: %s', error)
+            messages.put({'type': 'error', 'error': str(error)})
+    
+    # The worker thread keeps this request's trace
+    threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+    while True:
+        message = messages.get()
+        yield json.dumps(message) + '\n'
+        if message['type'] != 'page':
+            return
+
+
+def require_job_store() -> JobStore:
+    if not job_store:
+        raise ValueError('Asynchronous jobs are not configured (JOB_STORE_BACKEND)')
+    return job_store
+
+
+def submit_job(body: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Create a job for the statement in the request and start it in the background
+    
+    With JOB_RUNNER=lambda the file must be in S3 for the worker invocation
+    (async invoke payloads are limited to 256 KB): S3 references are passed
+    through, base64 files are written to UPLOAD_BUCKET first.
+    """
+    store = require_job_store()
+    callback_url = body.get('callbackUrl')
+    if callback_url and not str(callback_url).startswith('https://'):
+        raise ValueError('callbackUrl must be an https URL')
+    
+    request = {
+        'creditCardName': body.get('creditCardName', 'Credit Card'),
+        'billingPeriod': body.get('billingPeriod'),
+        'cutDate': body.get('cutDate'),
+        'callbackUrl': callback_url,
+        'trace': bool(body.get('trace')),
+    }
+    
+    if JOB_RUNNER == 'lambda':
+        if store.name != 's3':
+            raise ValueError('JOB_RUNNER=lambda requires JOB_STORE_BACKEND=s3')
+        if body.get('s3Key'):
+            s3_bucket = body.get('s3Bucket') or UPLOAD_BUCKET
+            s3_key = body['s3Key']
+            check_s3_location_allowed(s3_bucket, s3_key)
+            file_size = get_s3_object_size(s3_bucket, s3_key)
+            if file_size > MAX_FILE_SIZE:
+                raise FileTooLargeError(file_size)
+            file_type = body.get('fileType') or get_file_type_from_key(s3_key)
+        else:
+            if not UPLOAD_BUCKET:
+                raise ValueError('Jobs with fileBase64 need UPLOAD_BUCKET to hand the file to the worker')
+            file_buffer, file_type = load_statement_file(body)
+            s3_bucket, s3_key = UPLOAD_BUCKET, new_upload_key(file_type)
+            get_s3_client().put_object(Bucket=s3_bucket, Key=s3_key, Body=bytes(file_buffer))
+        request.update({'s3Bucket': s3_bucket, 's3Key': s3_key, 'fileType': file_type})
+        
+        job = new_job(request)
+        store.put(job)
+        function_name = getattr(context, 'invoked_function_arn', None) or os.environ['AWS_LAMBDA_FUNCTION_NAME']
+        get_lambda_client().invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=json.dumps({'jobWorker': job['jobId']}).encode('utf-8'),
+        )
+    else:
+        file_buffer, file_type = load_statement_file(body)
+        request['fileType'] = file_type
+        job = new_job(request)
+        store.put(job)
+        threading.Thread(target=run_job, args=(job['jobId'], file_buffer), daemon=True).start()
+    
+    log.info('Submitted job %s (%s runner)', job['jobId'], JOB_RUNNER)
+    return {'jobId': job['jobId'], 'status': job['status']}
+
+
+def run_job(job_id: str, file_buffer: Optional[Union[bytes, bytearray]] = None) -> Dict[str, Any]:
+    """
+    Run a submitted job, saving each page's transactions to the job store as it finishes
+    file_buffer: the file when running in the submitting process; otherwise read from S3
+    """
+    store = require_job_store()
+    job = store.get(job_id)
+    if not job:
+        log.error('Job %s not found', job_id)
+        return {'jobId': job_id, 'status': 'not found'}
+    
+    request = job['request']
+    progress = JobProgress(store, job)
+    progress.start()
+    start_trace('extractStatementJob')
+    try:
+        if file_buffer is None:
+            file_size = get_s3_object_size(request['s3Bucket'], request['s3Key'])
+            with stage('s3Read'):
+                file_buffer = read_s3_object(request['s3Bucket'], request['s3Key'], file_size)
+        transactions, metadata = process_statement(file_buffer, request['fileType'], request, progress.page_done)
+        metadata['totalExtracted'] = len(transactions)
+        progress.succeed(transactions, metadata)
+        log.info('Job %s succeeded with %d transactions', job_id, len(transactions))
+    except Exception as error:
+        log.exception('Job %s failed: %s', job_id, error)
+        progress.fail(str(error))
+    
+    if request.get('callbackUrl'):
+        send_job_callback(request['callbackUrl'], job)
+    return {'jobId': job_id, 'status': job['status']}
+
+
+def send_job_callback(callback_url: str, job: Dict[str, Any]) -> None:
+    """POST the job's final status to the client's callback URL; the client then calls getJob"""
+    payload = {
+        'jobId': job['jobId'],
+        'status': job['status'],
+        'totalExtracted': len(job['transactions'] or []),
+        'error': job['error'],
+    }
+    import urllib.request
+    request = urllib.request.Request(
+        callback_url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            log.info('Job %s callback answered %s', job['jobId'], response.status)
+    except Exception as e:
+        log.warning('Job %s callback to %s failed: %s', job['jobId'], callback_url, e)
+
+
+def extract_transactions(
+    file_buffer: Union[bytes, bytearray],
+    file_type: str,
+    card_name: str,
+    billing_period: Optional[Dict[str, Any]],
+    cut_date: Optional[int],
+    metadata: Optional[Dict[str, Any]] = None,
+    on_page: Optional[PageCallback] = None
+) -> List[Dict[str, Any]]:
+    """
+    Extract transactions from a statement file
+    
+    Known issuer layouts are parsed locally from the PDF text layer; anything
+    else goes to OpenAI. on_page, if given, receives each page's normalized
+    transactions as soon as that page is done.
+    """
+    if RULE_PARSERS_ENABLED and file_type.lower() == 'pdf' and get_fitz():
+        transactions = extract_transactions_with_rule_parser(file_buffer, billing_period, metadata, on_page)
+        if transactions is not None:
+            return transactions
+    
+    # Use OpenAI to extract transactions directly from file
+    return extract_transactions_with_llm_vision(
+        file_buffer,
+        file_type,
+        card_name,
+        billing_period,
+        cut_date,
+        metadata,
+        on_page
+    )
+
+
+def extract_transactions_with_rule_parser(
+    file_buffer: bytes,
+    billing_period: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+    on_page: Optional[PageCallback] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse a PDF with a registered layout parser, without calling the model
+    Returns: None if the layout is unknown or the parser found no rows
+    """
+    with stage('pdfOpen'):
+        pdf_document = get_fitz().open(stream=file_buffer, filetype="pdf")
+    try:
+        with stage('textLayer'):
+            pages_text = [extract_page_text(page, 1) or '' for page in pdf_document]
+    finally:
+        pdf_document.close()
+    
+    parser = find_parser(pages_text)
+    if not parser:
+        log.info('No rule-based parser for this layout, using OpenAI')
+        return None
+    
+    try:
+        with stage('parser'):
+            raw_transactions = parser.parse(pages_text, billing_period)
+    except Exception as e:
+        log.warning('Parser %s failed, using OpenAI: %s', parser.name, e)
+        return None
+    
+    if not raw_transactions:
+        # Layout recognized but no rows matched: the layout probably changed
+        log.warning('Parser %s matched but found no transactions, using OpenAI', parser.name)
+        return None
+    
+    # Rows the parser did not recognize would be lost silently
+    for page_num, page_text in enumerate(pages_text, start=1):
+        printed_rows = count_transaction_rows(page_text)
+        if not printed_rows:
+            continue
+        parsed_rows = min(parser.count_rows(page_text), printed_rows)
+        if parsed_rows / printed_rows < RULE_PARSER_MIN_COVERAGE:
+            log.warning('Parser %s recognized %d of %d date/amount rows on page %d, using OpenAI',
+                        parser.name, parsed_rows, printed_rows, page_num)
+            count('ruleParserLowCoverage')
+            return None
+    
+    log.info('Parsed %d transactions with rule-based parser %s', len(raw_transactions), parser.name)
+    if metadata is not None:
+        metadata['parser'] = parser.name
+        metadata['pdfPageCount'] = len(pages_text)
+    
+    # Every row is known up front: the day/month order comes from all of them
+    date_parser = DateParser(billing_period)
+    date_parser.detect([txn.get('date') for txn in raw_transactions])
+    by_page: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for txn in raw_transactions:
+        by_page[txn.get('page', 1)].append(txn)
+    page_results: Dict[int, List[Dict[str, Any]]] = {}
+    for page_num in sorted(by_page):
+        with stage('normalize'):
+            page_results[page_num] = normalize_transactions(by_page[page_num], billing_period, date_parser)
+        if on_page:
+            on_page(page_num, page_results[page_num], len(pages_text))
+    if metadata is not None and date_parser.summary():
+        metadata['dates'] = date_parser.summary()
+    
+    # Same check against the printed total as the OpenAI path (no re-query here)
+    if RECONCILE_ENABLED:
+        with stage('reconcile'):
+            reconciliation = reconcile_pages(
+                page_results,
+                {page_num: text for page_num, text in enumerate(pages_text, start=1) if text},
+                to_cents(RECONCILE_TOLERANCE)
+            )
+        log.info('Reconciliation: %s', reconciliation)
+        if metadata is not None:
+            metadata['reconciliation'] = reconciliation
+    return [txn for page_num in sorted(page_results) for txn in page_results[page_num]]
+
+
 def extract_transactions_with_llm_vision(
     file_buffer: bytes,
     file_type: str,
     card_name: str,
     billing_period: Optional[Dict[str, Any]],
-    cut_date: Optional[int]
+    cut_date: Optional[int],
+    metadata: Optional[Dict[str, Any]] = None,
+    on_page: Optional[PageCallback] = None
 ) -> List[Dict[str, Any]]:
-    """Extract transactions from PDF/image file using OpenAI Vision API"""
+    """
+    Extract transactions from PDF/image file using OpenAI
+    
+    Pages with a usable text layer are sent as text, scanned pages and images
+    go through the Vision API. If metadata is given, per-run details
+    (page counts by source) are written into it.
     
-    if not openai_client:
-        error_msg = openai_error or 'OpenAI client not available'
-        print(f'ERROR: {error_msg}')
-        raise ValueError(error_msg)
+    Pages are streamed: each one is rendered and submitted as soon as a slot
+    is free, so memory holds at most VISION_MAX_CONCURRENCY requests (single
+    pages, or batches of up to BATCH_MAX_PAGES with PAGE_BATCHING_ENABLED).
+    """
+    
+    get_openai_client()
     
     # Get month names from billing period (no specific dates)
     billing_start_month = billing_period.get('startMonth', 'N/A') if billing_period else 'N/A'
@@ -504,38 +1167,38 @@ def extract_transactions_with_llm_vision(
     else:
         period_description = f"{billing_start_month} a {billing_end_month}"
     
-    # Convert PDF to images if needed (OpenAI Vision API only accepts images)
+    # Each page becomes a payload: compact text when the PDF has a usable text
+    # layer, otherwise a rendered image for the Vision API. PDF pages are
+    # produced lazily so each one is rendered, sent and dropped in turn.
+    page_stats: Dict[str, Any] = {
+        'textLayerPages': 0,
+        'visionPages': 0,
+        'renderProfiles': defaultdict(int),
+        'skippedPages': [],
+        'failedPages': [],
+        # Text layer of every PDF page that has one (skipped pages included),
+        # to find the printed period total
+        'pageTexts': {},
+    }
+    pdf_document = None
+    # Pages are rendered by this thread as workers pull them, and also by
+    # workers when routing escalates a text page: PyMuPDF needs one at a time
+    pdf_lock = threading.Lock()
     if file_type.lower() == 'pdf':
-        if not fitz:
+        if not get_fitz():
             raise ValueError('PyMuPDF (fitz) not available. Cannot convert PDF to images.')
         
-        print(f'Converting PDF to images...')
-        pdf_document = fitz.open(stream=file_buffer, filetype="pdf")
-        print(f'PDF has {len(pdf_document)} pages')
+        log.info('Opening PDF...')
+        with stage('pdfOpen'):
+            pdf_document = fitz.open(stream=file_buffer, filetype="pdf")
+        total_pages = len(pdf_document)
+        log.info('PDF has %d pages', total_pages)
         
-        # Convert all pages to images
-        images = []
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            # Render page as image (300 DPI for good quality)
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-            img_data = pix.tobytes("png")
-            images.append(img_data)
-            print(f'Converted page {page_num + 1} to image ({len(img_data)} bytes)')
-        
-        pdf_document.close()
-        
-        if not images:
+        if total_pages == 0:
+            pdf_document.close()
             raise ValueError('No pages found in PDF')
         
-        # Process all pages - OpenAI Vision API can handle multiple images
-        print(f'Processing all {len(images)} pages of the PDF...')
-        
-        # Convert all images to base64 - store as list for multi-page processing
-        image_base64_list = [base64.b64encode(img).decode('utf-8') for img in images]
-        file_base64 = image_base64_list  # Store as list for multi-page PDFs
-        mime_type = 'image/png'
-        print(f'Converted {len(image_base64_list)} pages to base64 images')
+        page_stream = iter_locked(iter_pdf_pages(pdf_document, page_stats), pdf_lock)
     else:
         # For images, use directly (single image)
         mime_type_map = {
@@ -543,318 +1206,633 @@ def extract_transactions_with_llm_vision(
             'jpg': 'image/jpeg',
             'jpeg': 'image/jpeg',
         }
-        mime_type = mime_type_map.get(file_type.lower(), 'image/png')
-        file_base64 = base64.b64encode(file_buffer).decode('utf-8')  # Single string for single image
-    
-    system_prompt = f"""You are a financial data extraction assistant. Your task is to extract credit card transactions from a statement document.
-
-CRITICAL: You MUST extract ALL transactions visible in the document. Do NOT filter by date - extract EVERYTHING you see.
-
-The billing period for this statement is approximately: {period_description}
-Use this ONLY as context to infer the correct year if dates show only day/month. Do NOT use it to filter transactions.
-
-For each transaction, extract:
-- date: The date when the transaction occurred (YYYY-MM-DD format). If only day/month is shown, infer the year from the billing period context.
-- amount: The transaction amount as a positive number (expenses are positive)
-- description: A clear, concise description of the merchant/store/service. Normalize names (e.g., "WALMART" -> "Walmart")
-- category: One of: Comida, Entretenimiento, Familia, Transporte, Salud, Educación, Ropa, Servicios, Vivienda, Otros
-
-Important rules:
-1. Extract ALL transactions visible in the document, regardless of date
-2. Ignore: payments made to the card, credits, interest charges, fees, and balance transfers
-3. For installment purchases, extract each monthly payment as a separate transaction if shown
-4. Look carefully at tables, lists, and any formatted sections
-5. If dates are ambiguous (only day/month shown), use the billing period ({period_description}) to infer the correct year
-6. Return dates in ISO format (YYYY-MM-DD)
-7. If you cannot find any transactions, return an empty array but still return the JSON structure
-
-Return ONLY a valid JSON object with this exact structure:
-{{
-  "transactions": [
-    {{
-      "date": "2024-11-20",
-      "amount": 150.50,
-      "description": "Walmart Supercenter",
-      "category": "Comida"
-    }}
-  ]
-}}
-
-If no transactions are found, return: {{"transactions": []}}"""
-
-    # Build user prompt - make it very explicit
-    if isinstance(file_base64, list):
-        # Multi-page PDF
-        user_prompt = f"""Extract ALL transactions from this credit card statement for {card_name}.
-
-This document has {len(file_base64)} pages. You MUST look at ALL pages and extract transactions from EVERY page.
-
-The billing period for this statement is approximately: {period_description}
-Use this ONLY as context to infer the correct year if dates show only day/month. Do NOT use it to filter transactions.
-
-IMPORTANT INSTRUCTIONS:
-1. Look at ALL images/pages provided
-2. Extract EVERY transaction you see, regardless of date
-3. Each transaction should have: date (YYYY-MM-DD), amount (positive number), description, and category
-4. If dates show only day/month, use the billing period ({period_description}) to infer the correct year
-5. Ignore payments, credits, interest, and fees
-6. Return ALL transactions found across all pages
-
-Return a JSON object with this exact structure:
-{{
-  "transactions": [
-    {{
-      "date": "2024-11-20",
-      "amount": 150.50,
-      "description": "Walmart Supercenter",
-      "category": "Comida"
-    }}
-  ]
-}}
-
-If you find transactions, return them. If you find NO transactions at all, return {{"transactions": []}}."""
-    else:
-        # Single image
-        user_prompt = f"""Extract ALL transactions from this credit card statement for {card_name}.
-
-The billing period for this statement is approximately: {period_description}
-Use this ONLY as context to infer the correct year if dates show only day/month. Extract ALL transactions you see, regardless of date.
-
-Return a JSON object with this exact structure:
-{{
-  "transactions": [
-    {{
-      "date": "2024-11-20",
-      "amount": 150.50,
-      "description": "Walmart Supercenter",
-      "category": "Comida"
-    }}
-  ]
-}}"""
-
+        total_pages = 1
+        page_stats['visionPages'] = 1
+        with stage('base64'):
+            image_base64 = base64.b64encode(file_buffer).decode('utf-8')
+        page_stream = iter([(0, {
+            'kind': 'image',
+            'mime_type': mime_type_map.get(file_type.lower(), 'image/png'),
+            'base64': image_base64,
+        })])
+    
+    # Static for every request of this output format; all that varies goes in the user message
+    system_prompt = SYSTEM_PROMPTS[PROMPT_FORMAT]
+    
     try:
-        all_transactions = []
+        log.info('Processing %d page(s) with up to %d concurrent request(s)...', total_pages, VISION_MAX_CONCURRENCY)
         
-        # Process pages one by one if multiple pages, or single image
-        images_to_process = file_base64 if isinstance(file_base64, list) else [file_base64]
+        tier_stats = TierStats()
+        # One day/month order for the whole statement, fixed by the first page that shows it
+        date_parser = DateParser(billing_period)
         
-        print(f'Processing {len(images_to_process)} image(s)...')
+        def first_tier_model(kind: str) -> str:
+            """Model asked first for a page of this kind (the only one without ROUTING_ENABLED)"""
+            if ROUTING_ENABLED and (kind == 'text' or ROUTING_CHEAP_IMAGES):
+                return ROUTING_CHEAP_MODEL
+            return TEXT_LAYER_MODEL if kind == 'text' else VISION_MODEL
         
-        for page_idx, img_base64 in enumerate(images_to_process):
-            page_num = page_idx + 1
-            print(f'Processing page {page_num} of {len(images_to_process)}...')
-            
-            # Build content for this page
-            page_prompt = user_prompt
-            if len(images_to_process) > 1:
-                page_prompt = f"""Extract ALL transactions from page {page_num} of {len(images_to_process)} of this credit card statement for {card_name}.
-
-The billing period for this statement is approximately: {period_description}
-Use this ONLY as context to infer the correct year if dates show only day/month. Extract ALL transactions you see, regardless of date.
-
-Look carefully at this page and extract EVERY transaction you see. Return ALL transactions found on this page.
-
-Return a JSON object with this exact structure:
-{{
-  "transactions": [
-    {{
-      "date": "2024-11-20",
-      "amount": 150.50,
-      "description": "Walmart Supercenter",
-      "category": "Comida"
-    }}
-  ]
-}}"""
-            
-            content = [
-                {
-                    'type': 'text',
-                    'text': page_prompt
-                },
-                {
-                    'type': 'image_url',
-                    'image_url': {
-                        'url': f'data:{mime_type};base64,{img_base64}',
-                        'detail': 'high'  # Use high detail for better OCR accuracy
-                    }
-                }
-            ]
-            
-            messages = [
-                {
-                    'role': 'system',
-                    'content': system_prompt
-                },
-                {
-                    'role': 'user',
-                    'content': content
-                }
-            ]
-            
-            # Use gpt-4o for vision capabilities
-            model = 'gpt-4o'
-            
-            print(f'Calling OpenAI for page {page_num}...')
-            completion = openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.1,  # Low temperature for consistent extraction
-                response_format={'type': 'json_object'},
-            )
-            
-            response_text = completion.choices[0].message.content
-            if not response_text:
-                print(f'WARNING: No response from OpenAI for page {page_num}')
-                continue
+        def page_context(page_num: int) -> str:
+            return build_context(card_name, period_description, [page_num], total_pages)
+        
+        def page_context_and_model(page_num: int, page_payload: Dict[str, Any]) -> Tuple[str, str]:
+            return page_context(page_num), first_tier_model(page_payload['kind'])
+        
+        def page_cache_key(page_num: int, page_payload: Dict[str, Any], model: str) -> str:
+            # The single-page context, so the key does not depend on batching
+            page_data = page_payload.get('text') or page_payload.get('base64')
+            return make_cache_key(page_data, system_prompt, page_context(page_num), model, PROMPT_VERSION)
+        
+        def answering_models(page_payload: Dict[str, Any]) -> List[str]:
+            """Models that may have answered this page: its own first tier, a batch with images, an escalation"""
+            models = [first_tier_model(page_payload['kind'])]
+            if PAGE_BATCHING_ENABLED:
+                models.append(first_tier_model('image'))
+            if ROUTING_ENABLED:
+                models.append(VISION_MODEL)
+            return list(dict.fromkeys(models))
+        
+        def route_pages(
+            pending: List[Tuple[int, Dict[str, Any]]],
+            answered: Dict[int, List[Dict[str, Any]]],
+            failures: Dict[int, str],
+            answered_by: Dict[int, str]
+        ) -> None:
+            """Validate first-tier answers; pages that fail are asked again to VISION_MODEL on the page image"""
+            for page_idx, page_payload in pending:
+                page_num = page_idx + 1
+                if page_payload['kind'] == 'image' and first_tier_model('image') == VISION_MODEL:
+                    # Already the top tier
+                    tier_stats.record('vision', page_num in answered)
+                    continue
+                
+                tier = 'text' if page_payload['kind'] == 'text' else 'cheap'
+                if page_num in answered:
+                    reasons = validate_page(
+                        answered[page_num],
+                        billing_period,
+                        page_payload.get('text'),
+                        ROUTING_MIN_IN_PERIOD,
+                        ROUTING_MIN_ROW_COVERAGE
+                    )
+                else:
+                    reasons = [failures.get(page_num, 'no usable answer')]
+                tier_stats.record(tier, not reasons)
+                if not reasons:
+                    continue
+                
+                log.info('Escalating page %d to %s: %s', page_num, VISION_MODEL, '; '.join(reasons))
+                tier_stats.escalated(page_num, reasons)
+                try:
+                    if page_payload['kind'] == 'image':
+                        image_payload = page_payload
+                    else:
+                        with pdf_lock:
+                            image_payload = render_page(pdf_document[page_idx], RENDER_PROFILE)
+                    escalated = extract_page_transactions(
+                        image_payload,
+                        system_prompt,
+                        page_context(page_num),
+                        page_num,
+                        total_pages,
+                        VISION_MODEL
+                    )
+                except Exception as error:
+                    log.error('Escalation of page %d failed: %s', page_num, error)
+                    failures[page_num] = str(error)
+                    escalated = None
+                tier_stats.record('vision', escalated is not None)
+                # A failed escalation keeps the first-tier answer, if there was one
+                if escalated is not None:
+                    answered[page_num] = escalated
+                    answered_by[page_num] = VISION_MODEL
+                    failures.pop(page_num, None)
+        
+        def process_batch(batch: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, List[Dict[str, Any]]]]:
+            """(page_num, normalized transactions) for each page of the batch, in page order"""
+            results: Dict[int, List[Dict[str, Any]]] = {}
+            pending: List[Tuple[int, Dict[str, Any]]] = []
             
-            print(f'OpenAI response for page {page_num} length: {len(response_text)} characters')
-            print(f'OpenAI response preview: {response_text[:300]}...')
+            for page_idx, page_payload in batch:
+                page_num = page_idx + 1
+                if page_payload['kind'] == 'failed':
+                    # Could not be read or rendered: reported like a failed model call
+                    page_stats['failedPages'].append({'page': page_num, 'error': page_payload['error']})
+                    continue
+                
+                # Pages already answered in a previous (possibly failed) run skip the model.
+                # Answers are keyed on the model that gave them, so every model that
+                # may have answered this page is looked up.
+                if page_cache:
+                    cached_transactions = None
+                    for model in answering_models(page_payload):
+                        with stage('pageCache'):
+                            cached_transactions = page_cache.get(page_cache_key(page_num, page_payload, model))
+                        if cached_transactions is not None:
+                            break
+                    if cached_transactions is not None:
+                        log.info('Page cache hit for page %d: %d transactions', page_num, len(cached_transactions))
+                        results[page_num] = cached_transactions
+                        continue
+                pending.append((page_idx, page_payload))
             
-            # Parse JSON response
+            # A request that still fails after model_call_policy's retries only
+            # loses its own pages: they are reported, the statement goes on
+            failures: Dict[int, str] = {}
+            answered_by: Dict[int, str] = {}
             try:
-                parsed_response = json.loads(response_text)
-            except json.JSONDecodeError as parse_error:
-                print(f'JSON parse error for page {page_num}: {parse_error}')
-                print(f'Response text: {response_text}')
-                # Sometimes OpenAI returns JSON wrapped in markdown code blocks
-                import re
-                json_match = re.search(r'```json\s*([\s\S]*?)\s*```', response_text) or \
-                            re.search(r'```\s*([\s\S]*?)\s*```', response_text)
-                if json_match:
-                    parsed_response = json.loads(json_match.group(1))
+                if len(pending) == 1:
+                    page_idx, page_payload = pending[0]
+                    page_num = page_idx + 1
+                    context, model = page_context_and_model(page_num, page_payload)
+                    page_transactions = extract_page_transactions(
+                        page_payload,
+                        system_prompt,
+                        context,
+                        page_num,
+                        total_pages,
+                        model
+                    )
+                    answered = {page_num: page_transactions} if page_transactions is not None else {}
+                    answered_by = {page_num: model for page_num in answered}
+                elif pending:
+                    page_nums = [page_idx + 1 for page_idx, _ in pending]
+                    has_images = any(page_payload['kind'] == 'image' for _, page_payload in pending)
+                    model = first_tier_model('image' if has_images else 'text')
+                    answered = extract_batch_transactions(
+                        pending,
+                        system_prompt,
+                        build_context(card_name, period_description, page_nums, total_pages),
+                        total_pages,
+                        model
+                    ) or {}
+                    answered_by = {page_num: model for page_num in answered}
                 else:
-                    print(f'Skipping page {page_num} due to parse error')
-                    continue
+                    answered = {}
+            except Exception as error:
+                log.error('Model request failed for page(s) %s: %s', [page_idx + 1 for page_idx, _ in pending], error)
+                failures = {page_idx + 1: str(error) for page_idx, _ in pending}
+                answered = {}
             
-            # Extract transactions from this page
-            page_transactions = parsed_response.get('transactions', [])
-            print(f'Found {len(page_transactions)} transactions on page {page_num}')
+            if ROUTING_ENABLED:
+                route_pages(pending, answered, failures, answered_by)
             
-            if isinstance(page_transactions, list):
-                all_transactions.extend(page_transactions)
-            else:
-                print(f'WARNING: Page {page_num} transactions is not a list: {type(page_transactions)}')
+            for page_idx, _ in pending:
+                if page_idx + 1 not in answered:
+                    page_stats['failedPages'].append({
+                        'page': page_idx + 1,
+                        'error': failures.get(page_idx + 1, 'no usable answer'),
+                    })
+            
+            payloads = {page_idx + 1: page_payload for page_idx, page_payload in pending}
+            for page_num, page_transactions in answered.items():
+                results[page_num] = page_transactions
+                if page_cache:
+                    page_cache.set(page_cache_key(page_num, payloads[page_num], answered_by[page_num]), page_transactions)
+            
+            # Failed pages are not cached so the next run asks the model again.
+            # Pages are normalized here so on_page gets them as soon as they finish.
+            batch_results = []
+            for page_idx, _ in batch:
+                with stage('normalize'):
+                    page_transactions = normalize_transactions(results.get(page_idx + 1, []), billing_period, date_parser)
+                if on_page:
+                    on_page(page_idx + 1, page_transactions, total_pages)
+                batch_results.append((page_idx + 1, page_transactions))
+            return batch_results
+        
+        def requery_page(page_num: int) -> Optional[List[Dict[str, Any]]]:
+            """Ask VISION_MODEL again for one page, on its image, for reconciliation"""
+            with pdf_lock:
+                page_payload = render_page(pdf_document[page_num - 1], RENDER_PROFILE)
+            raw_transactions = extract_page_transactions(
+                page_payload,
+                system_prompt,
+                page_context(page_num),
+                page_num,
+                total_pages,
+                VISION_MODEL
+            )
+            if raw_transactions is None:
+                return None
+            return normalize_transactions(raw_transactions, billing_period, date_parser)
+        
+        if PAGE_BATCHING_ENABLED and total_pages > 1:
+            batches = pack_pages(page_stream, BATCH_MAX_INPUT_TOKENS, BATCH_MAX_OUTPUT_TOKENS, BATCH_MAX_PAGES)
+        else:
+            batches = ([item] for item in page_stream)
+        
+        # Requests are independent: the next page is rendered while earlier
+        # ones are in flight, and results are combined in page order
+        page_results: Dict[int, List[Dict[str, Any]]] = {}
+        for batch_results in run_bounded(process_batch, batches, VISION_MAX_CONCURRENCY):
+            for page_num, page_transactions in batch_results:
+                page_results[page_num] = page_transactions
+        
+        if metadata is not None:
+            metadata['pdfPageCount'] = total_pages
+            metadata['textLayerPages'] = page_stats['textLayerPages']
+            metadata['visionPages'] = page_stats['visionPages']
+            if page_stats['renderProfiles']:
+                metadata['renderProfiles'] = dict(page_stats['renderProfiles'])
+            metadata['skippedPages'] = page_stats['skippedPages']
+            if page_stats['failedPages']:
+                metadata['failedPages'] = sorted(page_stats['failedPages'], key=lambda failed: failed['page'])
+                metadata['partial'] = True
+            if ROUTING_ENABLED:
+                metadata['routing'] = tier_stats.summary()
+            if date_parser.summary():
+                metadata['dates'] = date_parser.summary()
+        
+        # Partial results only make sense if some page was answered
+        failed_pages = page_stats['failedPages']
+        if failed_pages and len(failed_pages) == total_pages - len(page_stats['skippedPages']):
+            raise ValueError(f"Every page failed: {failed_pages[0]['error']}")
+        
+        # Check the sum against the printed total; pages missing rows may be asked again
+        if RECONCILE_ENABLED and page_stats['pageTexts']:
+            with stage('reconcile'):
+                reconciliation = reconcile_pages(
+                    page_results,
+                    page_stats['pageTexts'],
+                    to_cents(RECONCILE_TOLERANCE),
+                    requery_page if pdf_document is not None else None,
+                    RECONCILE_MAX_REQUERY_PAGES
+                )
+            log.info('Reconciliation: %s', reconciliation)
+            if metadata is not None:
+                metadata['reconciliation'] = reconciliation
         
         # Use all transactions from all pages
-        transactions = all_transactions
-        print(f'Total transactions from all pages: {len(transactions)}')
+        transactions = [txn for page_num in sorted(page_results) for txn in page_results[page_num]]
+        log.info('Total transactions from all pages: %d', len(transactions))
         
         if len(transactions) == 0:
-            print('WARNING: No transactions found in any page')
-        
-        # Validate and normalize transactions
-        normalized_transactions = []
-        for idx, txn in enumerate(transactions):
-            print(f'Processing transaction {idx + 1}: {json.dumps(txn)}')
-            if not all(key in txn for key in ['date', 'amount', 'description']):
-                missing_keys = [key for key in ['date', 'amount', 'description'] if key not in txn]
-                print(f'Skipping transaction {idx + 1}: missing keys {missing_keys}')
-                continue
-            
-            try:
-                normalized_txn = {
-                    'date': normalize_date(txn['date']),
-                    'amount': abs(float(txn['amount'])),  # Ensure positive
-                    'description': normalize_description(txn['description']),
-                    'category': normalize_category(txn.get('category', 'Otros')),
-                }
-                
-                # Filter by billing period if provided
-                if billing_period and billing_period.get('start') and billing_period.get('end'):
-                    txn_date = normalized_txn['date']
-                    period_start = billing_period['start']
-                    period_end = billing_period['end']
-                    if txn_date >= period_start and txn_date <= period_end:
-                        print(f'Transaction {idx + 1} within period: {txn_date} in [{period_start}, {period_end}]')
-                        normalized_transactions.append(normalized_txn)
-                    else:
-                        print(f'Transaction {idx + 1} outside period: {txn_date} not in [{period_start}, {period_end}]')
-                else:
-                    normalized_transactions.append(normalized_txn)
-            except (ValueError, KeyError) as e:
-                print(f'Skipping invalid transaction {idx + 1}: {e}')
-                import traceback
-                traceback.print_exc()
-                continue
+            log.warning('No transactions found in any page')
         
-        print(f'Final normalized transactions count: {len(normalized_transactions)}')
-        return normalized_transactions
+        return transactions
         
     except Exception as error:
-        print(f'Error in LLM extraction: {str(error)}')
+        log.error('Error in LLM extraction: %s', error)
         raise ValueError(f'Failed to extract transactions: {str(error)}')
+    finally:
+        if pdf_document is not None:
+            pdf_document.close()
 
 
-def normalize_date(date_str: str) -> str:
-    """Normalize date to ISO format"""
-    try:
-        # Try parsing various date formats
-        date_formats = [
-            '%Y-%m-%d',
-            '%d/%m/%Y',
-            '%m/%d/%Y',
-            '%d-%m-%Y',
-            '%Y-%m-%d %H:%M:%S',
-        ]
-        
-        for fmt in date_formats:
-            try:
-                date_obj = datetime.strptime(date_str.strip(), fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        
-        # If no format matches, try parsing with dateutil (if available)
+def iter_pdf_pages(pdf_document: Any, page_stats: Dict[str, Any]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (page_index, payload) per PDF page, built only when the consumer asks for it
+    
+    Pages that triage classifies as having no transactions are not yielded.
+    A page that cannot be read or rendered is yielded as a {'kind': 'failed'}
+    payload, so it is reported in failedPages and the other pages go on.
+    page_stats is updated with counts of text-layer/vision pages, render
+    profiles and skipped pages.
+    """
+    for page_idx in range(len(pdf_document)):
         try:
-            from dateutil import parser
-            date_obj = parser.parse(date_str)
-            return date_obj.strftime('%Y-%m-%d')
-        except ImportError:
-            pass
-        
-        raise ValueError(f'Invalid date format: {date_str}')
+            page_payload = build_pdf_page(pdf_document, page_idx, page_stats)
+        except Exception as error:
+            log.error('Could not prepare page %d: %s', page_idx + 1, error)
+            page_payload = {'kind': 'failed', 'error': str(error)}
+        if page_payload is not None:
+            yield page_idx, page_payload
+
+
+def build_pdf_page(pdf_document: Any, page_idx: int, page_stats: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Payload for one PDF page (text layer or rendered image); None if triage skips it"""
+    page = pdf_document[page_idx]
+    page_num = page_idx + 1
+    
+    with stage('textLayer'):
+        words = get_page_words(page) if (TEXT_LAYER_ENABLED or TRIAGE_ENABLED) else []
+        page_text = words_to_text(words) if words else None
+    if page_text:
+        page_stats['pageTexts'][page_num] = page_text
+    
+    # A sparse text layer (a native footer or page number over a scan)
+    # says nothing about the page's rows: treat the page as scanned
+    has_text_layer = page_text is not None and len(words) >= TEXT_LAYER_MIN_WORDS
+    
+    analysis = None
+    if TRIAGE_ENABLED:
+        if has_text_layer:
+            with stage('triage'):
+                has_transactions, reason = classify_page_text(page_text)
+        else:
+            # Scanned page: blank pages are dropped without a model call
+            analysis = analyze_page(page)
+            if analysis[1] is None:
+                has_transactions, reason = False, 'blank page'
+            elif TRIAGE_MODEL_CHECK:
+                has_transactions, reason = page_has_transactions_by_model(page, page_num)
+            else:
+                has_transactions, reason = True, 'no text layer'
+        if not has_transactions:
+            log.info('Skipping page %d: %s', page_num, reason)
+            page_stats['skippedPages'].append({'page': page_num, 'reason': reason})
+            return None
+    
+    if TEXT_LAYER_ENABLED and has_text_layer:
+        page_stats['textLayerPages'] += 1
+        log.info('Using text layer for page %d (%d characters)', page_num, len(page_text))
+        return {'kind': 'text', 'text': page_text}
+    
+    # Scanned page: render as image with the configured profile
+    page_payload = render_page(page, RENDER_PROFILE, analysis)
+    page_stats['visionPages'] += 1
+    page_stats['renderProfiles'][page_payload['profile']] += 1
+    log.info('Converted page %d to image (%s, %dx%d, %d bytes)', page_num, page_payload['profile'],
+             page_payload['width'], page_payload['height'], page_payload['bytes'])
+    return page_payload
+
+
+def page_has_transactions_by_model(page: Any, page_num: int) -> Tuple[bool, str]:
+    """Ask a small model, with a low-detail thumbnail, whether a scanned page lists transactions"""
+    thumbnail = render_page(page, 'triage')
+    try:
+        completion = create_completion(
+            f'triage page {page_num}',
+            model=TRIAGE_MODEL,
+            messages=[{
+                'role': 'user',
+                'content': [
+                    {
+                        'type': 'text',
+                        'text': 'Is this credit card statement page a table or list of purchase transactions '
+                                '(rows with date and amount)? Answer with JSON: {"hasTransactions": true or false}'
+                    },
+                    image_content_part(thumbnail),
+                ]
+            }],
+            temperature=0,
+            response_format={'type': 'json_object'},
+        )
+        answer = json.loads(completion.choices[0].message.content or '{}')
     except Exception as e:
-        raise ValueError(f'Invalid date: {date_str} - {str(e)}')
-
-
-def normalize_description(desc: str) -> str:
-    """Normalize description"""
-    if not desc:
-        return ''
-    
-    normalized = ' '.join(desc.split())  # Normalize whitespace
-    return normalized[:100]  # Limit length
-
-
-def normalize_category(category: str) -> str:
-    """Normalize category to match app categories"""
-    category_map = {
-        'comida': 'Comida',
-        'food': 'Comida',
-        'restaurant': 'Comida',
-        'entretenimiento': 'Entretenimiento',
-        'entertainment': 'Entretenimiento',
-        'familia': 'Familia',
-        'family': 'Familia',
-        'transporte': 'Transporte',
-        'transport': 'Transporte',
-        'gasolina': 'Transporte',
-        'gas': 'Transporte',
-        'salud': 'Salud',
-        'health': 'Salud',
-        'farmacia': 'Salud',
-        'educación': 'Educación',
-        'education': 'Educación',
-        'ropa': 'Ropa',
-        'clothing': 'Ropa',
-        'servicios': 'Servicios',
-        'services': 'Servicios',
-        'vivienda': 'Vivienda',
-        'housing': 'Vivienda',
-        'renta': 'Vivienda',
-        'otros': 'Otros',
-        'other': 'Otros',
+        # Triage must never lose a page: on any error, extract it
+        log.warning('Triage call failed for page %d, keeping page: %s', page_num, e)
+        return True, 'triage model error'
+    
+    if answer.get('hasTransactions') is False:
+        return False, f'{TRIAGE_MODEL}: no transactions'
+    return True, f'{TRIAGE_MODEL}: has transactions'
+
+
+def normalize_transactions(
+    transactions: List[Dict[str, Any]],
+    billing_period: Optional[Dict[str, Any]],
+    date_parser: Optional[DateParser] = None
+) -> List[Dict[str, Any]]:
+    """
+    Validate and normalize raw transactions (from the model or a rule-based parser)
+    date_parser: the statement's, so all its pages use one day/month order
+    """
+    merchants = get_merchant_dictionary(MERCHANT_DICTIONARY_PATH) if MERCHANTS_ENABLED else None
+    columns, stats, errors = normalize_batch(transactions, billing_period, merchants, date_parser)
+    
+    # One line per batch, not per transaction
+    if errors:
+        log.warning('Skipped %d invalid transactions: %s', len(errors), '; '.join(errors[:5]))
+    if stats['missingKeys'] or stats['outsidePeriod']:
+        log.info('Skipped %d transactions missing keys and %d outside the billing period',
+                 stats['missingKeys'], stats['outsidePeriod'])
+    if stats['ambiguousDate']:
+        log.warning('Skipped %d transactions with ambiguous dd/mm or mm/dd dates', stats['ambiguousDate'])
+        count('ambiguousDates', stats['ambiguousDate'])
+    if stats['merchantHits']:
+        count('merchantHits', stats['merchantHits'])
+    normalized_transactions = columns.rows()
+    if log.enabled('debug'):
+        log.debug('Normalized transactions: %s', log.compact(normalized_transactions))
+    log.info('Final normalized transactions count: %d', len(normalized_transactions))
+    return normalized_transactions
+
+
+def build_page_content(page_payload: Dict[str, Any], context: str) -> Any:
+    """Message content for one page: plain text for text-layer pages, image + text otherwise; context last"""
+    if page_payload['kind'] == 'text':
+        return f"Page text (one line per row, table columns separated by |):\n{page_payload['text']}\n\n{context}"
+    return [
+        image_content_part(page_payload),
+        {
+            'type': 'text',
+            'text': context
+        }
+    ]
+
+
+def image_content_part(page_payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'image_url',
+        'image_url': {
+            'url': f"data:{page_payload['mime_type']};base64,{page_payload['base64']}",
+            'detail': page_payload.get('detail', 'high')  # High detail for better OCR accuracy
+        }
     }
+
+
+def create_completion(label: str, model: str, messages: List[Dict[str, Any]], **options: Any) -> Any:
+    """
+    chat.completions.create under model_call_policy (timeout, retries, hedging)
+    Every answered attempt is recorded in the current trace (latency, tokens, bytes sent).
+    """
+    client = get_openai_client()
+    request_bytes = messages_size(messages)
+    
+    def attempt() -> Any:
+        started = time.perf_counter()
+        with stage('model'):
+            completion = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=model_call_policy.timeout,
+                **options
+            )
+        record_model_call(
+            label,
+            model,
+            (time.perf_counter() - started) * 1000,
+            getattr(completion, 'usage', None),
+            request_bytes
+        )
+        return completion
+    
+    return model_call_policy.call(attempt, label, key=model)
+
+
+def messages_size(messages: List[Dict[str, Any]]) -> int:
+    """Approximate request size in bytes: prompt text plus base64 image data URLs"""
+    size = 0
+    for message in messages:
+        content = message['content']
+        if isinstance(content, str):
+            size += len(content)
+            continue
+        for part in content:
+            if part.get('type') == 'text':
+                size += len(part['text'])
+            elif part.get('type') == 'image_url':
+                size += len(part['image_url']['url'])
+    return size
+
+
+def request_transactions(
+    system_prompt: str,
+    content: Any,
+    model: str,
+    label: str
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Call OpenAI with one user message and parse the transactions list from the JSON answer
+    Returns: None if the model gave no usable answer
+    """
+    messages = [
+        {
+            'role': 'system',
+            'content': system_prompt
+        },
+        {
+            'role': 'user',
+            'content': content
+        }
+    ]
+
+    log.info('Calling OpenAI for %s...', label)
+    completion = create_completion(
+        label,
+        model=model,
+        messages=messages,
+        temperature=0.1,  # Low temperature for consistent extraction
+        response_format={'type': 'json_object'},
+    )
+
+    response_text = completion.choices[0].message.content
+    if not response_text:
+        log.warning('No response from OpenAI for %s', label)
+        return None
+
+    log.info('OpenAI response for %s length: %d characters', label, len(response_text))
+    log.debug('OpenAI response preview: %s', log.truncate(response_text, 300))
+
+    # Parse JSON response
+    try:
+        parsed_response = json.loads(response_text)
+    except json.JSONDecodeError as parse_error:
+        log.error('JSON parse error for %s: %s', label, parse_error)
+        log.debug('Response text: %s', log.truncate(response_text))
+        # Sometimes OpenAI returns JSON wrapped in markdown code blocks
+        import re
+        json_match = re.search(r'```json\s*([\s\S]*?)\s*```', response_text) or \
+                    re.search(r'```\s*([\s\S]*?)\s*```', response_text)
+        if json_match:
+            parsed_response = json.loads(json_match.group(1))
+        else:
+            log.warning('Skipping %s due to parse error', label)
+            return None
+
+    # Extract transactions from the response (either output format)
+    transactions = decode_transactions(parsed_response, PROMPT_FORMAT)
+    if transactions is None:
+        log.warning('%s transactions is not a list: %s', label, log.truncate(response_text, 200))
+        return None
+
+    log.info('Found %d transactions on %s', len(transactions), label)
+    return transactions
+
+
+def extract_page_transactions(
+    page_payload: Dict[str, Any],
+    system_prompt: str,
+    context: str,
+    page_num: int,
+    total_pages: int,
+    model: str
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Send one page (text or image payload) to OpenAI and return the raw transactions found on it
+    Returns: None if the model gave no usable answer for the page
+    """
+    log.info('Processing page %d of %d (%s)...', page_num, total_pages, page_payload['kind'])
+    content = build_page_content(page_payload, context)
+    return request_transactions(system_prompt, content, model, f'page {page_num}')
+
+
+def extract_batch_transactions(
+    batch: List[Tuple[int, Dict[str, Any]]],
+    system_prompt: str,
+    context: str,
+    total_pages: int,
+    model: str
+) -> Optional[Dict[int, List[Dict[str, Any]]]]:
+    """
+    Send several pages in one request and split the answer back by page
+    Returns: {page_num: transactions}, or None if the model gave no usable answer
+    """
+    page_nums = [page_idx + 1 for page_idx, _ in batch]
+    label = f'pages {", ".join(str(n) for n in page_nums)}'
+    log.info('Processing %s of %d in one request...', label, total_pages)
+    
+    content: List[Dict[str, Any]] = []
+    for page_num, (_, page_payload) in zip(page_nums, batch):
+        if page_payload['kind'] == 'text':
+            content.append({
+                'type': 'text',
+                'text': f"Page {page_num} text (one line per row, table columns separated by |):\n{page_payload['text']}"
+            })
+        else:
+            content.append({'type': 'text', 'text': f'Page {page_num}:'})
+            content.append(image_content_part(page_payload))
+    content.append({'type': 'text', 'text': context})
+    
+    transactions = request_transactions(system_prompt, content, model, label)
+    if transactions is None:
+        return None
+    return split_by_page(transactions, page_nums)
+
+
+def iter_locked(items: Iterator[Any], lock: threading.Lock) -> Iterator[Any]:
+    """Produce each item while holding lock (a generator's work runs inside next()), yield it unlocked"""
+    end = object()
+    while True:
+        with lock:
+            item = next(items, end)
+        if item is end:
+            return
+        yield item
+
+
+def run_bounded(func: Callable[[Any], Any], items: Iterable[Any], max_in_flight: int) -> List[Any]:
+    """
+    Apply func to every item with at most max_in_flight calls running at once
+    
+    Items are pulled from the iterable only once a slot is free, so a lazy
+    producer (e.g. iter_pdf_pages) never has more than max_in_flight items
+    alive at once.
+    Returns: results in the same order as items
+    """
+    if max_in_flight <= 1:
+        return [func(item) for item in items]
+    
+    results: Dict[int, Any] = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending: Dict[Future, int] = {}
+        iterator = enumerate(items)
+        while True:
+            # Wait for a slot before producing the next item
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Re-raises the worker exception, same as the sequential loop
+                    results[pending.pop(future)] = future.result()
+            next_item = next(iterator, None)
+            if next_item is None:
+                break
+            index, item = next_item
+            # Workers run in a copy of this context so they record into the same trace
+            pending[executor.submit(contextvars.copy_context().run, func, item)] = index
+        for future in as_completed(pending):
+            results[pending[future]] = future.result()
     
-    normalized = category.lower().strip()
-    return category_map.get(normalized, 'Otros')
\ No newline at end of file
+    return [results[index] for index in range(len(results))]
@@ -0,0 +1,3 @@
+"""
+Support modules for the statement processor Lambda (index.py)
+"""
@@ -0,0 +1,127 @@
+"""
+Token-budget packing of statement pages into multi-page model requests
+
+Short or sparse statements are cheaper and faster when several pages go
+in one chat.completions.create call. Pages are packed greedily, in order,
+until the estimated image/text input tokens or the estimated output
+tokens of the group would exceed the budget.
+"""
+
+import math
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+PageItem = Tuple[int, Dict[str, Any]]
+
+# OpenAI image token accounting for detail=high: fit in 2048x2048, scale
+# the short side to 768, then 170 tokens per 512 px tile plus 85 base
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+
+# Uploaded images without known dimensions: assume a 2x2 tile page
+DEFAULT_IMAGE_TOKENS = IMAGE_BASE_TOKENS + 4 * IMAGE_TILE_TOKENS
+
+# Roughly 4 characters per token for Latin text
+CHARS_PER_TOKEN = 4
+
+# Output: one transaction as JSON is about this many tokens
+TOKENS_PER_TRANSACTION = 40
+OUTPUT_OVERHEAD_TOKENS = 20
+
+# Expected transaction rows per rendered page, by render profile
+ROWS_PER_PROFILE = {
+    'sparse': 5,
+    'standard': 25,
+    'dense': 45,
+    'legacy': 30,
+}
+DEFAULT_IMAGE_ROWS = 30
+
+DATE_ROW_PATTERN = re.compile(r'^\s*\d{1,2}[-/ ](?:\d{1,2}|[A-Za-z]{3})', re.MULTILINE)
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = 'high') -> int:
+    """Input tokens the API charges for one image"""
+    if detail == 'low':
+        return IMAGE_BASE_TOKENS
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def estimate_input_tokens(payload: Dict[str, Any]) -> int:
+    """Estimated input tokens for a text or image page payload (0 for a page that failed)"""
+    if payload['kind'] == 'failed':
+        return 0
+    if payload['kind'] == 'text':
+        return len(payload['text']) // CHARS_PER_TOKEN + 1
+    if payload.get('width') and payload.get('height'):
+        return estimate_image_tokens(payload['width'], payload['height'], payload.get('detail', 'high'))
+    return DEFAULT_IMAGE_TOKENS
+
+
+def estimate_output_tokens(payload: Dict[str, Any]) -> int:
+    """Estimated output tokens from the expected number of transaction rows on the page"""
+    if payload['kind'] == 'failed':
+        return 0
+    if payload['kind'] == 'text':
+        rows = len(DATE_ROW_PATTERN.findall(payload['text']))
+    else:
+        rows = ROWS_PER_PROFILE.get(payload.get('profile', ''), DEFAULT_IMAGE_ROWS)
+    return OUTPUT_OVERHEAD_TOKENS + rows * TOKENS_PER_TRANSACTION
+
+
+def pack_pages(
+    page_items: Iterable[PageItem],
+    max_input_tokens: int,
+    max_output_tokens: int,
+    max_pages: int
+) -> Iterator[List[PageItem]]:
+    """
+    Group consecutive pages into batches under the token budgets
+
+    Lazy: only the batch being filled is held in memory. A page that is
+    over budget on its own is sent alone.
+    """
+    batch: List[PageItem] = []
+    input_tokens = 0
+    output_tokens = 0
+    for item in page_items:
+        page_input = estimate_input_tokens(item[1])
+        page_output = estimate_output_tokens(item[1])
+        if batch and (
+            len(batch) >= max_pages
+            or input_tokens + page_input > max_input_tokens
+            or output_tokens + page_output > max_output_tokens
+        ):
+            yield batch
+            batch, input_tokens, output_tokens = [], 0, 0
+        batch.append(item)
+        input_tokens += page_input
+        output_tokens += page_output
+    if batch:
+        yield batch
+
+
+def split_by_page(
+    transactions: List[Dict[str, Any]],
+    page_nums: List[int]
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Split a batch response back into per-page lists using each transaction's 'page' field
+    Transactions with a missing or unknown page go to the first page of the batch.
+    """
+    by_page: Dict[int, List[Dict[str, Any]]] = {page_num: [] for page_num in page_nums}
+    for txn in transactions:
+        try:
+            page_num = int(txn.get('page') if isinstance(txn, dict) else None)
+        except (TypeError, ValueError):
+            page_num = page_nums[0]
+        if page_num not in by_page:
+            page_num = page_nums[0]
+        by_page[page_num].append(txn)
+    return by_page
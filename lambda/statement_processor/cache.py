@@ -0,0 +1,175 @@
+"""
+Pluggable key/value caches for extraction results
+
+Values must be JSON serializable. Every backend swallows its own errors:
+a broken cache must never fail a statement, it only turns into a miss.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from statement_processor import log
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable SHA-256 key from bytes and JSON-serializable parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(part)
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        # Separator so ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class Cache:
+    """Base class: subclasses implement _get/_set, callers use get/set"""
+
+    name = 'base'
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            return self._get(key)
+        except Exception as e:
+            log.warning('%s cache read failed for %s: %s', self.name, key, e)
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            self._set(key, value)
+        except Exception as e:
+            log.warning('%s cache write failed for %s: %s', self.name, key, e)
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+    """In-process LRU cache, lives as long as the warm container"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def _set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskCache(Cache):
+    """One JSON file per key under a local directory (e.g. /tmp in Lambda)"""
+
+    name = 'disk'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _set(self, key: str, value: Any) -> None:
+        # Write to a temp file and rename so readers never see partial files
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+
+class S3Cache(Cache):
+    """One JSON object per key in an S3 bucket, shared by all containers"""
+
+    name = 's3'
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = ''):
+        # A client, or a zero-argument function returning one (boto3 is then
+        # only imported when the store is first used)
+        self._s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def s3_client(self) -> Any:
+        if callable(self._s3_client):
+            self._s3_client = self._s3_client()
+        return self._s3_client
+
+    def _get(self, key: str) -> Optional[Any]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f'{self.prefix}{key}.json')
+        except Exception as e:
+            # botocore raises ClientError with code NoSuchKey on a miss
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def _set(self, key: str, value: Any) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f'{self.prefix}{key}.json',
+            Body=json.dumps(value).encode('utf-8'),
+            ContentType='application/json',
+        )
+
+
+def create_cache(
+    backend: str,
+    max_entries: int = 128,
+    directory: Optional[str] = None,
+    s3_client: Any = None,
+    bucket: Optional[str] = None,
+    prefix: str = ''
+) -> Optional[Cache]:
+    """
+    Create a cache for the given backend name
+    Returns: None when the backend is 'none' or cannot be configured
+    """
+    backend = (backend or 'none').lower()
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryCache(max_entries)
+    if backend == 'disk':
+        if not directory:
+            log.warning('disk cache requested without a directory, caching disabled')
+            return None
+        return DiskCache(directory)
+    if backend == 's3':
+        if not s3_client or not bucket:
+            log.warning('s3 cache requested without boto3 or bucket, caching disabled')
+            return None
+        return S3Cache(s3_client, bucket, prefix)
+    log.warning('Unknown cache backend "%s", caching disabled', backend)
+    return None
@@ -0,0 +1,190 @@
+"""
+Date parsing with the statement's day/month convention detected once
+
+The prompts ask for ISO dates, but rule parsers, old prompts or a model
+copying the statement may return dd/mm/yyyy or mm/dd/yyyy. A DateParser
+lives for one statement:
+- detect() looks at a sample of numeric dates: a first number over 12
+  means day first, a second number over 12 means month first. The first
+  sample with evidence fixes the order for the rest of the statement.
+- parse() then has a single interpretation per string. Parsing is a
+  pure function of (string, order), memoized with an LRU shared by all
+  statements of the container (statements repeat the same few dates).
+  Dates that start with a 4-digit year (2024-11-5, 2024/11/05, 20241105)
+  are always year-month-day, whatever the order.
+- while the order is unknown, a date like 05/11/2024 (or 05.11.24) has
+  two readings, also when it only parses through dateutil. If exactly one
+  falls in the billing period it is used; otherwise the row is reported as
+  ambiguous (AmbiguousDateError), never guessed. normalize_batch hands such
+  rows to hold(), and summary() returns them with both readings.
+"""
+
+import re
+import threading
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from statement_processor import log
+from statement_processor.routing import period_check
+
+DAY_FIRST = 'dd/mm'
+MONTH_FIRST = 'mm/dd'
+
+# Year first is always year-month-day: 2024-11-5, 2024/11/05, 2024.11.05,
+# 20241105, optionally with a time. Checked before any day/month order.
+YEAR_FIRST_PATTERN = re.compile(
+    r'(?P<year>\d{4})(?:(?P<sep>[/.-])(?P<month>\d{1,2})(?P=sep)(?P<day>\d{1,2})|(?P<month8>\d{2})(?P<day8>\d{2}))'
+    r'(?:[ T].*)?'
+)
+
+# 5/11/2024, 05-11-2024, 05.11.2024, 05/11/24 (2-digit years are 20xx)
+NUMERIC_DATE_PATTERN = re.compile(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})')
+
+# Rows sampled by detect()
+DETECT_SAMPLE = 200
+
+# Ambiguous strings kept for the report
+MAX_REPORTED = 20
+
+# dateutil is optional: imported on the first date no pattern matches
+_dateutil_parser: Any = None
+
+
+class AmbiguousDateError(ValueError):
+    """The date reads as a valid date both day-first and month-first"""
+
+    def __init__(self, message: str, candidates: Tuple[date, ...] = ()):
+        super().__init__(message)
+        self.candidates = candidates
+
+
+def get_dateutil_parser() -> Any:
+    """dateutil.parser, or False if it is not installed"""
+    global _dateutil_parser
+    if _dateutil_parser is None:
+        try:
+            from dateutil import parser
+            _dateutil_parser = parser
+        except ImportError:
+            _dateutil_parser = False
+    return _dateutil_parser
+
+
+def make_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def date_candidates(value: str, order: Optional[str]) -> Tuple[date, ...]:
+    """
+    Every valid reading of value under order (None: order unknown)
+    Returns: one date, two (day-first, month-first) if ambiguous, none if invalid
+    """
+    # ISO, optionally with a time ('2024-11-05 10:00:00', '2024-11-05T10:00')
+    if len(value) >= 10 and value[4] == '-' and value[7] == '-' and (len(value) == 10 or value[10] in ' T'):
+        try:
+            parsed = make_date(int(value[:4]), int(value[5:7]), int(value[8:10]))
+        except ValueError:
+            parsed = None
+        return (parsed,) if parsed else ()
+
+    match = YEAR_FIRST_PATTERN.fullmatch(value)
+    if match:
+        parsed = make_date(int(match['year']), int(match['month'] or match['month8']), int(match['day'] or match['day8']))
+        return (parsed,) if parsed else ()
+
+    match = NUMERIC_DATE_PATTERN.fullmatch(value)
+    if match:
+        first, second, year = (int(part) for part in match.groups())
+        if year < 100:
+            year += 2000
+        day_first = make_date(year, second, first) if order != MONTH_FIRST else None
+        month_first = make_date(year, first, second) if order != DAY_FIRST else None
+        return tuple(dict.fromkeys(reading for reading in (day_first, month_first) if reading))
+
+    dateutil_parser = get_dateutil_parser()
+    if not dateutil_parser:
+        return ()
+    # With the order unknown both readings are candidates ('5 nov 2024' gives one)
+    readings = []
+    for dayfirst in ((order == DAY_FIRST,) if order else (True, False)):
+        try:
+            readings.append(dateutil_parser.parse(value, dayfirst=dayfirst).date())
+        except (ValueError, OverflowError):
+            pass
+    return tuple(dict.fromkeys(readings))
+
+
+class DateParser:
+    """Dates of one statement (shared by its pages, thread-safe)"""
+
+    def __init__(self, billing_period: Optional[Dict[str, Any]] = None):
+        self.order: Optional[str] = None
+        self.in_period = period_check(billing_period)
+        self.ambiguous_count = 0
+        self.ambiguous: List[str] = []
+        self.held: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def detect(self, values: List[Any]) -> Optional[str]:
+        """Fix the order from a sample of date strings, if they show it"""
+        if self.order is not None:
+            return self.order
+        day_first = month_first = False
+        for value in values[:DETECT_SAMPLE]:
+            match = NUMERIC_DATE_PATTERN.fullmatch(str(value).strip())
+            if match:
+                day_first = day_first or int(match.group(1)) > 12
+                month_first = month_first or int(match.group(2)) > 12
+        if day_first and month_first:
+            log.warning('Dates mix day-first and month-first; not fixing an order')
+            return None
+        if day_first or month_first:
+            with self._lock:
+                if self.order is None:
+                    self.order = DAY_FIRST if day_first else MONTH_FIRST
+                    log.info('Statement dates are %s', self.order)
+        return self.order
+
+    def parse(self, value: Any) -> str:
+        """
+        ISO date
+        Raises: AmbiguousDateError if it cannot be told, ValueError if invalid
+        """
+        text = str(value).strip()
+        candidates = date_candidates(text, self.order)
+        if len(candidates) == 1:
+            return candidates[0].isoformat()
+        if not candidates:
+            raise ValueError(f'Invalid date: {value}')
+        if self.in_period:
+            inside = [candidate for candidate in candidates if self.in_period(candidate)]
+            if len(inside) == 1:
+                return inside[0].isoformat()
+        with self._lock:
+            self.ambiguous_count += 1
+            if len(self.ambiguous) < MAX_REPORTED and text not in self.ambiguous:
+                self.ambiguous.append(text)
+        raise AmbiguousDateError(f'Ambiguous date (dd/mm or mm/dd): {value}', candidates)
+
+    def hold(self, transaction: Dict[str, Any], candidates: Tuple[date, ...]) -> None:
+        """Keep a row left out for its ambiguous date, with its possible ISO dates"""
+        with self._lock:
+            self.held.append({**transaction, 'dateCandidates': [candidate.isoformat() for candidate in candidates]})
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Detected order and ambiguous dates, for metadata; None if nothing to say"""
+        if self.order is None and not self.ambiguous_count:
+            return None
+        with self._lock:
+            result: Dict[str, Any] = {'order': self.order}
+            if self.ambiguous_count:
+                result['ambiguousRows'] = self.ambiguous_count
+                result['ambiguousDates'] = list(self.ambiguous)
+            if self.held:
+                result['ambiguousTransactions'] = list(self.held)
+            return result
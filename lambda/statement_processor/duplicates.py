@@ -0,0 +1,152 @@
+"""
+Batched duplicate detection against the user's transaction history
+
+Same rules as checkDuplicate in the app (src/hooks/useStatementProcessor.ts):
+a transaction is a duplicate of a history entry whose amount is within
+0.01, whose date is within 1 day and whose description is similar (equal
+once normalized, one containing the other with at least 70% of its
+length, or at least 80% Levenshtein similarity). The client sends only
+the history of the statement's card.
+
+Instead of scanning the whole history per transaction, history entries are
+indexed by (day, amount in cents); a transaction only looks at the 3x3
+neighbouring keys, so a batch costs about O(batch + history). Descriptions
+are compared only for those candidates, cheapest test first: the token set
+(same words in any order), then containment, then Levenshtein.
+
+The history digest is compact: [date, amountCents, description] per entry
+(objects with date/amount/description are accepted too).
+"""
+
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+AMOUNT_TOLERANCE_CENTS = 1
+DATE_TOLERANCE_DAYS = 1
+CONTAINMENT_MIN_RATIO = 0.7
+LEVENSHTEIN_MIN_SIMILARITY = 0.8
+
+# As the app's normalizeDescription: JavaScript's \w is ASCII only
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]', re.ASCII)
+SPACE_PATTERN = re.compile(r'\s+')
+
+HistoryEntry = Tuple[date, int, str, str]  # (day, cents, description, normalized)
+
+
+def normalize_description(description: str) -> str:
+    return SPACE_PATTERN.sub(' ', PUNCTUATION_PATTERN.sub('', str(description).lower())).strip()
+
+
+def parse_day(value: Any) -> Optional[date]:
+    try:
+        return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def levenshtein(first: str, second: str) -> int:
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(
+                previous[j - 1] + (first_char != second_char),
+                previous[j] + 1,
+                current[j - 1] + 1,
+            ))
+        previous = current
+    return previous[-1]
+
+
+def descriptions_similar(first: str, second: str) -> bool:
+    """Both already normalized"""
+    if first == second or set(first.split()) == set(second.split()):
+        return True
+    longer, shorter = (first, second) if len(first) > len(second) else (second, first)
+    if shorter in longer:
+        return len(shorter) / len(longer) >= CONTAINMENT_MIN_RATIO
+    # The distance is at least the length difference: skip hopeless pairs
+    if 1 - (len(longer) - len(shorter)) / len(longer) < LEVENSHTEIN_MIN_SIMILARITY:
+        return False
+    return 1 - levenshtein(first, second) / len(longer) >= LEVENSHTEIN_MIN_SIMILARITY
+
+
+def parse_history_entry(entry: Any) -> Optional[Tuple[date, int, str]]:
+    """(day, cents, description) from [date, amountCents, description] or an object"""
+    try:
+        if isinstance(entry, dict):
+            day, cents, description = entry.get('date'), round(float(entry['amount']) * 100), entry.get('description', '')
+        else:
+            day, cents, description = entry[0], int(entry[1]), entry[2]
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    day = parse_day(day)
+    return (day, cents, str(description or '')) if day else None
+
+
+class DuplicateIndex:
+    """History entries by (day ordinal, amount in cents)"""
+
+    def __init__(self, history: List[Any]):
+        self.entries: Dict[Tuple[int, int], List[Tuple[int, HistoryEntry]]] = defaultdict(list)
+        for position, raw_entry in enumerate(history):
+            parsed = parse_history_entry(raw_entry)
+            if parsed is None:
+                continue
+            day, cents, description = parsed
+            self.entries[(day.toordinal(), cents)].append(
+                (position, (day, cents, description, normalize_description(description)))
+            )
+
+    def candidates(self, day: date, cents: int) -> List[Tuple[int, HistoryEntry]]:
+        """Entries within the date and amount tolerances, in history order"""
+        ordinal = day.toordinal()
+        found = []
+        for day_offset in range(-DATE_TOLERANCE_DAYS, DATE_TOLERANCE_DAYS + 1):
+            for cents_offset in range(-AMOUNT_TOLERANCE_CENTS, AMOUNT_TOLERANCE_CENTS + 1):
+                found.extend(self.entries.get((ordinal + day_offset, cents + cents_offset), ()))
+        return sorted(found, key=lambda candidate: candidate[0])
+
+    def find(self, transaction: Dict[str, Any]) -> Optional[Tuple[int, HistoryEntry]]:
+        """First similar history entry (position, entry), or None"""
+        day = parse_day(transaction.get('date'))
+        try:
+            cents = round(float(transaction.get('amount')) * 100)
+        except (TypeError, ValueError):
+            return None
+        if day is None:
+            return None
+        candidates = self.candidates(day, cents)
+        if not candidates:
+            return None
+        normalized = normalize_description(transaction.get('description', ''))
+        for position, entry in candidates:
+            if descriptions_similar(normalized, entry[3]):
+                return position, entry
+        return None
+
+
+def check_duplicates(transactions: List[Dict[str, Any]], history: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Duplicate flag per transaction, in order
+    Returns: [{isDuplicate, historyIndex?, reason?}]; historyIndex is the
+    matching entry's position in history
+    """
+    index = DuplicateIndex(history)
+    results = []
+    for transaction in transactions:
+        match = index.find(transaction) if isinstance(transaction, dict) else None
+        if match is None:
+            results.append({'isDuplicate': False})
+            continue
+        position, (day, _, description, _) = match
+        results.append({
+            'isDuplicate': True,
+            'historyIndex': position,
+            'reason': f"Duplicate found: {description} on {day.strftime('%b %d, %Y')}",
+        })
+    return results
@@ -0,0 +1,259 @@
+"""
+Job records and pluggable job stores for asynchronous extraction
+
+A submitted statement becomes a job record (a JSON-serializable dict) that
+the background worker updates as pages finish, so a client polling the job
+sees transactions page by page before the whole statement is done. Unlike
+the caches, store errors are raised: losing job state must fail loudly.
+
+Backends: 'file' (one JSON file per job) and 'sqlite' for local runs and
+tests, 's3' for production, where the worker runs in another container.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from statement_processor import log
+
+
+def new_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """A queued job record for a request (statement parameters and file reference)"""
+    now = time.time()
+    return {
+        'jobId': uuid.uuid4().hex,
+        'status': 'queued',
+        'createdAt': now,
+        'updatedAt': now,
+        'request': request,
+        'totalPages': None,
+        # Page numbers in the order they finished; clients read it with a cursor
+        'completedPages': [],
+        'pages': {},
+        'transactions': None,
+        'metadata': {},
+        'error': None,
+    }
+
+
+def job_view(job: Dict[str, Any], cursor: int = 0) -> Dict[str, Any]:
+    """
+    Client-facing view of a job
+    cursor: number of completed pages the client already has; only pages
+            completed after it are returned, with the next cursor
+    """
+    cursor = max(0, cursor)
+    completed = job['completedPages']
+    view = {
+        'jobId': job['jobId'],
+        'status': job['status'],
+        'totalPages': job['totalPages'],
+        'pagesCompleted': len(completed),
+        'pages': [
+            {'page': page_num, 'transactions': job['pages'][str(page_num)]}
+            for page_num in completed[cursor:]
+        ],
+        'cursor': len(completed),
+    }
+    if job['status'] == 'succeeded':
+        view['transactions'] = job['transactions']
+        view['metadata'] = job['metadata']
+    if job['status'] == 'failed':
+        view['error'] = job['error']
+    return view
+
+
+class JobStore:
+    """Base class: subclasses implement get/put of whole job records"""
+
+    name = 'base'
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class FileJobStore(JobStore):
+    """One JSON file per job under a local directory"""
+
+    name = 'file'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        # Job ids are uuid4 hex; anything else never maps to a file
+        if not job_id.isalnum():
+            raise ValueError(f'Invalid job id: {job_id}')
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, job: Dict[str, Any]) -> None:
+        # Write to a temp file and rename so pollers never see partial files
+        path = self._path(job['jobId'])
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs as JSON rows in a SQLite database file"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated_at REAL)'
+            )
+
+    def _connect(self) -> Any:
+        # Imported here: only local runs and tests use this store
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as connection:
+            row = connection.execute('SELECT record FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, job: Dict[str, Any]) -> None:
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO jobs (job_id, record, updated_at) VALUES (?, ?, ?)',
+                (job['jobId'], json.dumps(job), job['updatedAt'])
+            )
+
+
+class S3JobStore(JobStore):
+    """One JSON object per job in an S3 bucket, shared by the API and worker invocations"""
+
+    name = 's3'
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = ''):
+        # A client, or a zero-argument function returning one (boto3 is then
+        # only imported when the store is first used)
+        self._s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def s3_client(self) -> Any:
+        if callable(self._s3_client):
+            self._s3_client = self._s3_client()
+        return self._s3_client
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=f'{self.prefix}{job_id}.json')
+        except Exception as e:
+            # botocore raises ClientError with code NoSuchKey for unknown jobs
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.loads(response['Body'].read())
+
+    def put(self, job: Dict[str, Any]) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f'{self.prefix}{job["jobId"]}.json',
+            Body=json.dumps(job).encode('utf-8'),
+            ContentType='application/json',
+        )
+
+
+class JobProgress:
+    """
+    Records a running job's pages in its store as they finish
+
+    page_done may be called from several worker threads; every update
+    writes the whole record under a lock so the stored copy is never
+    older than one already written.
+    """
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]):
+        self.store = store
+        self.job = job
+        self._lock = threading.Lock()
+
+    def _save(self) -> None:
+        self.job['updatedAt'] = time.time()
+        self.store.put(self.job)
+
+    def start(self) -> None:
+        with self._lock:
+            self.job['status'] = 'running'
+            self._save()
+
+    def page_done(self, page_num: int, transactions: List[Dict[str, Any]], total_pages: int) -> None:
+        with self._lock:
+            self.job['totalPages'] = total_pages
+            if str(page_num) not in self.job['pages']:
+                self.job['completedPages'].append(page_num)
+            self.job['pages'][str(page_num)] = transactions
+            self._save()
+
+    def succeed(self, transactions: List[Dict[str, Any]], metadata: Dict[str, Any]) -> None:
+        with self._lock:
+            self.job['status'] = 'succeeded'
+            self.job['transactions'] = transactions
+            self.job['metadata'] = metadata
+            if self.job['totalPages'] is None:
+                self.job['totalPages'] = metadata.get('pdfPageCount')
+            self._save()
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self.job['status'] = 'failed'
+            self.job['error'] = error
+            self._save()
+
+
+def create_job_store(
+    backend: str,
+    directory: Optional[str] = None,
+    sqlite_path: Optional[str] = None,
+    s3_client: Any = None,
+    bucket: Optional[str] = None,
+    prefix: str = ''
+) -> Optional[JobStore]:
+    """
+    Create a job store for the given backend name
+    Returns: None when the backend is 'none' or cannot be configured
+    """
+    backend = (backend or 'none').lower()
+    if backend == 'none':
+        return None
+    if backend == 'file':
+        if not directory:
+            log.warning('file job store requested without a directory, jobs disabled')
+            return None
+        return FileJobStore(directory)
+    if backend == 'sqlite':
+        if not sqlite_path:
+            log.warning('sqlite job store requested without a path, jobs disabled')
+            return None
+        return SQLiteJobStore(sqlite_path)
+    if backend == 's3':
+        if not s3_client or not bucket:
+            log.warning('s3 job store requested without boto3 or bucket, jobs disabled')
+            return None
+        return S3JobStore(s3_client, bucket, prefix)
+    log.warning('Unknown job store backend "%s", jobs disabled', backend)
+    return None
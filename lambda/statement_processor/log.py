@@ -0,0 +1,160 @@
+"""
+Leveled, size-bounded logging for the Lambda
+
+Logs go to stdout (CloudWatch) like the plain print() calls they replace,
+but with a level threshold, a quiet mode, per-request debug sampling and
+truncation of large values, so a request never writes its multi-megabyte
+base64 body to the log.
+
+LOG_LEVEL: debug, info (default), warning, error or quiet (nothing at all)
+LOG_SAMPLE_RATE: fraction of requests logged at debug level whatever
+                 LOG_LEVEL says (default: 0), to keep some detailed traces
+LOG_MAX_FIELD_CHARS: longer strings are cut in logged values (default: 200)
+
+Messages use %-style arguments, formatted only when the level is enabled.
+Metric records (EMF lines) are written at every level except quiet.
+"""
+
+import contextvars
+import json
+import os
+import random
+from typing import Any, Dict, Optional
+
+LEVELS = {
+    'debug': 10,
+    'info': 20,
+    'warning': 30,
+    'error': 40,
+    'quiet': 100,
+}
+
+PREFIXES = {
+    10: 'DEBUG: ',
+    20: '',
+    30: 'WARNING: ',
+    40: 'ERROR: ',
+}
+
+# Headers that must never reach the logs
+REDACTED_HEADERS = {'x-api-key', 'authorization', 'cookie'}
+
+_level = LEVELS['info']
+_sample_rate = 0.0
+_max_field_chars = 200
+
+# Level override for the current request (sampled requests log at debug)
+_request_level: 'contextvars.ContextVar[Optional[int]]' = contextvars.ContextVar('log_request_level', default=None)
+
+
+def configure(
+    level: Optional[str] = None,
+    sample_rate: Optional[float] = None,
+    max_field_chars: Optional[int] = None
+) -> None:
+    """Set the logging options (read from the environment at import)"""
+    global _level, _sample_rate, _max_field_chars
+    if level is not None:
+        if level.lower() not in LEVELS:
+            print(f'WARNING: Unknown LOG_LEVEL "{level}", using info')
+            level = 'info'
+        _level = LEVELS[level.lower()]
+    if sample_rate is not None:
+        _sample_rate = min(1.0, max(0.0, sample_rate))
+    if max_field_chars is not None:
+        _max_field_chars = max(16, max_field_chars)
+
+
+def begin_request() -> None:
+    """Decide whether this request is sampled for debug logging; call at the start of the handler"""
+    sampled = _sample_rate > 0 and _level < LEVELS['quiet'] and random.random() < _sample_rate
+    _request_level.set(LEVELS['debug'] if sampled else None)
+
+
+def enabled(level: str) -> bool:
+    threshold = _request_level.get()
+    if threshold is None:
+        threshold = _level
+    return LEVELS[level] >= threshold
+
+
+def truncate(value: Any, max_chars: Optional[int] = None) -> Any:
+    """Copy of value with long strings cut to max_chars (nested dicts and lists included)"""
+    max_chars = max_chars or _max_field_chars
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return f'{value[:max_chars]}... ({len(value)} chars)'
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, dict):
+        return {key: truncate(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) > max_chars:
+            return [truncate(item, max_chars) for item in value[:max_chars]] + [f'... ({len(value)} items)']
+        return [truncate(item, max_chars) for item in value]
+    return value
+
+
+def compact(value: Any) -> str:
+    """Truncated one-line JSON of a value, for log messages"""
+    return json.dumps(truncate(value), default=str, ensure_ascii=False)
+
+
+def summarize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Event without secrets and with the body (and any other large field) truncated"""
+    summary = dict(event)
+    headers = summary.get('headers')
+    if isinstance(headers, dict):
+        summary['headers'] = {
+            key: '***' if key.lower() in REDACTED_HEADERS else value
+            for key, value in headers.items()
+        }
+    return truncate(summary)
+
+
+def _log(level: int, message: str, args: tuple) -> None:
+    threshold = _request_level.get()
+    if level < (_level if threshold is None else threshold):
+        return
+    if args:
+        message = message % args
+    print(f'{PREFIXES[level]}{message}')
+
+
+def debug(message: str, *args: Any) -> None:
+    _log(10, message, args)
+
+
+def info(message: str, *args: Any) -> None:
+    _log(20, message, args)
+
+
+def warning(message: str, *args: Any) -> None:
+    _log(30, message, args)
+
+
+def error(message: str, *args: Any) -> None:
+    _log(40, message, args)
+
+
+def exception(message: str, *args: Any) -> None:
+    """Error with the current traceback (only formatted when errors are logged)"""
+    if not enabled('error'):
+        return
+    import traceback
+    _log(40, message, args)
+    traceback.print_exc()
+
+
+def metric(record: Dict[str, Any]) -> None:
+    """Emit a metrics record (an EMF JSON line) at any level except quiet"""
+    if _level < LEVELS['quiet']:
+        print(json.dumps(record, default=str))
+
+
+configure(
+    level=os.environ.get('LOG_LEVEL', 'info'),
+    sample_rate=float(os.environ.get('LOG_SAMPLE_RATE', '0')),
+    max_field_chars=int(os.environ.get('LOG_MAX_FIELD_CHARS', '200')),
+)
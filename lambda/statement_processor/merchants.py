@@ -0,0 +1,217 @@
+"""
+Merchant dictionary: canonical name and category per merchant, learned from past extractions
+
+Statement descriptions of the same merchant vary in store numbers,
+references and punctuation ("OXXO SUC 1234 CENTRO", "OXXO SUC 5678").
+merchant_key reduces them to a stable key (accents, digits, punctuation,
+legal suffixes and payment-aggregator prefixes such as "MERCADO PAGO *"
+removed, first words kept). The dictionary maps that key to the name and
+category seen most often in past extractions, so known merchants are
+categorized the same way every time without asking the model
+(rule-based parsers return 'Otros' for all).
+
+The short key can still be shared by different merchants ("REST LA CASA
+DE TOÑO", "REST LA CASA VIEJA"), so a match only renames the description
+when all its words (full_merchant_key) are those of the canonical name;
+otherwise the description is kept and only a missing category is filled.
+
+On disk it is a gzipped TSV, one merchant per line:
+    key<TAB>canonical name<TAB>category<TAB>times seen
+Build it with build_merchant_dictionary.py from saved results; the
+handler loads it once per container, on the first statement.
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from statement_processor import log
+
+HEADER = '# merchant dictionary v1'
+
+# Words of the description kept in the key (after dropping noise)
+KEY_WORDS = 2
+
+# Legal suffixes, country and web noise that do not identify the merchant
+NOISE_WORDS = frozenset({
+    'sa', 'de', 'cv', 'sapi', 'rl', 'sc', 'mx', 'mex', 'mexico', 'www', 'com', 'net',
+    'el', 'la', 'los', 'las', 'y', 'the', 'inc', 'llc',
+})
+
+# Payment processors that prefix the real merchant ("MERCADO PAGO *UBER",
+# "PAYPAL *STEAMGAMES"): never part of the key
+AGGREGATOR_PREFIXES = (
+    ('mercado', 'pago'), ('mercadopago',), ('paypal',), ('pp',), ('clip',), ('conekta',),
+    ('openpay',), ('stripe',), ('payu',), ('dlocal',), ('srpago',), ('sr', 'pago'),
+    ('netpay',), ('sumup',), ('sq',),
+)
+
+WORD_SPLIT_PATTERN = re.compile(r'[^a-z0-9]+')
+
+
+class Merchant(NamedTuple):
+    name: str
+    category: str
+    count: int
+
+
+def merchant_words(description: str) -> List[str]:
+    """Identifying words of a description, without the aggregator prefix"""
+    text = unicodedata.normalize('NFKD', str(description).lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    words = [
+        word for word in WORD_SPLIT_PATTERN.split(text)
+        # Words with digits are store numbers and references
+        if len(word) > 1 and word not in NOISE_WORDS and not any(char.isdigit() for char in word)
+    ]
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in AGGREGATOR_PREFIXES:
+            if tuple(words[:len(prefix)]) == prefix:
+                words = words[len(prefix):]
+                stripped = True
+                break
+    return words
+
+
+def merchant_key(description: str) -> str:
+    """Stable key for a description; '' when nothing identifying is left"""
+    return ' '.join(merchant_words(description)[:KEY_WORDS])
+
+
+def full_merchant_key(description: str) -> str:
+    """All identifying words: equal only for the same merchant, not just the same key"""
+    return ' '.join(merchant_words(description))
+
+
+class MerchantDictionary:
+    """Read-only mapping merchant_key -> Merchant"""
+
+    def __init__(self, merchants: Optional[Dict[str, Merchant]] = None):
+        self.merchants = merchants or {}
+        self.full_keys = {merchant.name: full_merchant_key(merchant.name) for merchant in self.merchants.values()}
+
+    def __len__(self) -> int:
+        return len(self.merchants)
+
+    def lookup(self, description: str) -> Optional[Merchant]:
+        key = merchant_key(description)
+        return self.merchants.get(key) if key else None
+
+    def is_canonical(self, description: str, merchant: Merchant) -> bool:
+        """Whether description names merchant itself, not just another one with the same key"""
+        return self.full_keys.get(merchant.name) == full_merchant_key(description)
+
+    @classmethod
+    def load(cls, path: str) -> 'MerchantDictionary':
+        merchants = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 4:
+                    continue
+                key, name, category, seen = fields
+                merchants[key] = Merchant(name, category, int(seen))
+        return cls(merchants)
+
+    def save(self, path: str) -> None:
+        # Sorted so rebuilding from the same results gives the same bytes
+        with gzip.GzipFile(path, 'wb', mtime=0) as raw:
+            raw.write(f'{HEADER}\n'.encode('utf-8'))
+            for key in sorted(self.merchants):
+                merchant = self.merchants[key]
+                raw.write(f'{key}\t{merchant.name}\t{merchant.category}\t{merchant.count}\n'.encode('utf-8'))
+
+
+def display_name(description: str) -> str:
+    """Description without store numbers and references, on one line (no tabs)"""
+    words = str(description).split()
+    kept = [word for word in words if not any(char.isdigit() for char in word)]
+    return ' '.join(kept or words)
+
+
+def learn_merchants(
+    transactions: Iterable[Dict[str, Any]],
+    min_count: int = 2,
+    min_share: float = 0.6,
+    unknown_category: str = 'Otros'
+) -> MerchantDictionary:
+    """
+    Dictionary from normalized transactions (description and category)
+
+    A merchant is kept when it was seen at least min_count times and one
+    category (other than unknown_category) has at least min_share of them.
+    Its canonical name is the most frequent description, without numbers.
+    """
+    names: Dict[str, Counter] = defaultdict(Counter)
+    categories: Dict[str, Counter] = defaultdict(Counter)
+    for txn in transactions:
+        if not isinstance(txn, dict) or not txn.get('description'):
+            continue
+        key = merchant_key(txn['description'])
+        if not key:
+            continue
+        names[key][display_name(txn['description'])] += 1
+        categories[key][' '.join(str(txn.get('category') or unknown_category).split())] += 1
+
+    merchants = {}
+    for key, category_counts in categories.items():
+        seen = sum(category_counts.values())
+        category, votes = category_counts.most_common(1)[0]
+        if seen < min_count or category == unknown_category or votes < min_share * seen:
+            continue
+        merchants[key] = Merchant(names[key].most_common(1)[0][0], category, seen)
+    return MerchantDictionary(merchants)
+
+
+def iter_result_transactions(value: Any) -> Iterable[Dict[str, Any]]:
+    """Transactions in a saved result: a list, {"transactions": [...]}, or a handler response"""
+    if isinstance(value, list):
+        yield from (txn for txn in value if isinstance(txn, dict))
+    elif isinstance(value, dict):
+        if isinstance(value.get('body'), str):
+            try:
+                value = json.loads(value['body'])
+            except json.JSONDecodeError:
+                return
+        yield from iter_result_transactions(value.get('transactions'))
+
+
+_loaded: Dict[str, MerchantDictionary] = {}
+_load_lock = threading.Lock()
+
+
+def get_merchant_dictionary(path: str) -> Optional[MerchantDictionary]:
+    """Dictionary at path, loaded once per process; None if there is none"""
+    if not path:
+        return None
+    if path not in _loaded:
+        with _load_lock:
+            if path not in _loaded:
+                try:
+                    _loaded[path] = MerchantDictionary.load(path)
+                    log.info('Loaded %d merchants from %s', len(_loaded[path]), path)
+                except FileNotFoundError:
+                    _loaded[path] = MerchantDictionary()
+                except Exception as e:
+                    log.warning('Could not load merchant dictionary %s: %s', path, e)
+                    _loaded[path] = MerchantDictionary()
+    dictionary = _loaded[path]
+    return dictionary if len(dictionary) else None
+
+
+def dictionary_version(path: str) -> Optional[List[Any]]:
+    """Size and mtime of the dictionary file, for cache keys (None without one)"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return [stat.st_size, int(stat.st_mtime)]
@@ -0,0 +1,155 @@
+"""
+Normalization of raw transactions (model or rule-parser output) as a columnar batch
+
+A page's transactions are validated in one pass into TransactionColumns
+(one list per field, amounts in an array of doubles) and only turned into
+dicts once, for the response. Dates go through the statement's
+DateParser (order detected once, memoized parsing), and the billing-period
+filter is a string comparison on the ISO dates in the same pass.
+"""
+
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from statement_processor.dates import AmbiguousDateError, DateParser
+
+REQUIRED_KEYS = ('date', 'amount', 'description')
+
+# Category names the model may answer, mapped to the app's categories
+CATEGORY_MAP = {
+    'comida': 'Comida',
+    'food': 'Comida',
+    'restaurant': 'Comida',
+    'entretenimiento': 'Entretenimiento',
+    'entertainment': 'Entretenimiento',
+    'familia': 'Familia',
+    'family': 'Familia',
+    'transporte': 'Transporte',
+    'transport': 'Transporte',
+    'gasolina': 'Transporte',
+    'gas': 'Transporte',
+    'salud': 'Salud',
+    'health': 'Salud',
+    'farmacia': 'Salud',
+    'educación': 'Educación',
+    'education': 'Educación',
+    'ropa': 'Ropa',
+    'clothing': 'Ropa',
+    'servicios': 'Servicios',
+    'services': 'Servicios',
+    'vivienda': 'Vivienda',
+    'housing': 'Vivienda',
+    'renta': 'Vivienda',
+    'otros': 'Otros',
+    'other': 'Otros',
+}
+
+def normalize_description(desc: Any) -> str:
+    """Normalize description"""
+    if not desc:
+        return ''
+    normalized = ' '.join(str(desc).split())  # Normalize whitespace
+    return normalized[:100]  # Limit length
+
+
+def normalize_category(category: Any) -> str:
+    """Normalize category to match app categories"""
+    return CATEGORY_MAP.get(str(category).lower().strip(), 'Otros')
+
+
+class TransactionColumns:
+    """Normalized transactions, one column per field"""
+
+    __slots__ = ('dates', 'amounts', 'descriptions', 'categories')
+
+    def __init__(self):
+        self.dates: List[str] = []
+        self.amounts = array('d')
+        self.descriptions: List[str] = []
+        self.categories: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def append(self, txn_date: str, amount: float, description: str, category: str) -> None:
+        self.dates.append(txn_date)
+        self.amounts.append(amount)
+        self.descriptions.append(description)
+        self.categories.append(category)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [
+            {'date': txn_date, 'amount': amount, 'description': description, 'category': category}
+            for txn_date, amount, description, category
+            in zip(self.dates, self.amounts, self.descriptions, self.categories)
+        ]
+
+
+def normalize_batch(
+    transactions: List[Any],
+    billing_period: Optional[Dict[str, Any]],
+    merchants: Any = None,
+    date_parser: Optional[DateParser] = None
+) -> Tuple[TransactionColumns, Counter, List[str]]:
+    """
+    Validate and normalize raw transactions in one pass
+    date_parser: the statement's parser, shared by its pages (default: one for this batch)
+    Returns: (columns, counts of dropped rows and merchant hits, one message per invalid row)
+    """
+    columns = TransactionColumns()
+    stats: Counter = Counter()
+    errors: List[str] = []
+    period_start = period_end = None
+    if billing_period and billing_period.get('start') and billing_period.get('end'):
+        period_start, period_end = billing_period['start'], billing_period['end']
+    dates = date_parser or DateParser(billing_period)
+    if dates.order is None:
+        dates.detect([txn['date'] for txn in transactions if isinstance(txn, dict) and 'date' in txn])
+    categories: Dict[str, str] = {}
+
+    for idx, txn in enumerate(transactions):
+        if not isinstance(txn, dict) or not all(key in txn for key in REQUIRED_KEYS):
+            stats['missingKeys'] += 1
+            continue
+        try:
+            txn_date = dates.parse(txn['date'])
+            amount = abs(float(txn['amount']))  # Ensure positive
+        except AmbiguousDateError as e:
+            # Left out of the transactions but returned in metadata.dates
+            stats['ambiguousDate'] += 1
+            try:
+                amount = abs(float(txn['amount']))
+            except (ValueError, TypeError):
+                amount = txn['amount']
+            dates.hold({
+                'date': str(txn['date']).strip(),
+                'amount': amount,
+                'description': normalize_description(txn['description']),
+                'category': normalize_category(txn.get('category', 'Otros')),
+            }, e.candidates)
+            continue
+        except (ValueError, TypeError) as e:
+            stats['invalid'] += 1
+            errors.append(f'transaction {idx + 1}: {e}')
+            continue
+        if period_start is not None and not (period_start <= txn_date <= period_end):
+            stats['outsidePeriod'] += 1
+            continue
+
+        description = normalize_description(txn['description'])
+        raw_category = str(txn.get('category', 'Otros'))
+        category = categories.get(raw_category)
+        if category is None:
+            category = categories[raw_category] = normalize_category(raw_category)
+        if merchants:
+            merchant = merchants.lookup(description)
+            if merchant and merchants.is_canonical(description, merchant):
+                description, category = merchant.name, merchant.category
+                stats['merchantHits'] += 1
+            elif merchant and category == 'Otros':
+                # Same key, maybe another merchant: keep the description
+                category = merchant.category
+                stats['merchantHits'] += 1
+        columns.append(txn_date, amount, description, category)
+    return columns, stats, errors
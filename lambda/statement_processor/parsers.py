@@ -0,0 +1,254 @@
+"""
+Deterministic parsers for known statement layouts
+
+Each parser recognizes an issuer by fingerprints in the text layer of the
+first pages and pulls transaction rows out with layout rules, without any
+model call. Fingerprints pair the issuer's name with the column headers
+of its transaction table, since the name alone appears on any document
+that mentions the bank. Rows come out as raw dicts (date, amount,
+description, category) that go through the same normalization as model
+output. Unknown layouts return no parser and the caller falls back to the LLM.
+
+Layout rules cannot categorize: every row is 'Otros' unless the merchant
+dictionary (statement_processor.merchants) knows the merchant, whereas the
+model assigns a category to each row.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Pattern, Sequence
+
+from statement_processor import log
+
+SPANISH_MONTHS = {
+    'ene': 1, 'enero': 1,
+    'feb': 2, 'febrero': 2,
+    'mar': 3, 'marzo': 3,
+    'abr': 4, 'abril': 4,
+    'may': 5, 'mayo': 5,
+    'jun': 6, 'junio': 6,
+    'jul': 7, 'julio': 7,
+    'ago': 8, 'agosto': 8,
+    'sep': 9, 'sept': 9, 'septiembre': 9,
+    'oct': 10, 'octubre': 10,
+    'nov': 11, 'noviembre': 11,
+    'dic': 12, 'diciembre': 12,
+}
+
+# Rows that are never purchases (payments, credits, interest, fees, taxes)
+DEFAULT_SKIP_PATTERNS = [
+    r'\bSU PAGO\b',
+    r'\bPAGO\b.*\bGRACIAS\b',
+    r'\bPAGO RECIBIDO\b',
+    r'\bABONO\b',
+    r'\bBONIFICACION\b',
+    r'\bINTERES(ES)?\b',
+    r'\bCOMISION\b',
+    r'\bIVA\b',
+    r'\bSALDO ANTERIOR\b',
+]
+
+AMOUNT_PATTERN = r'-?\$?\s?\d{1,3}(?:,\d{3})*\.\d{2}(?:\s?(?:-|CR))?'
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Parse '$1,234.56' style amounts
+    Returns: None for credits ('-' or 'CR' markers), which are not purchases
+    """
+    cleaned = text.strip().upper()
+    if cleaned.startswith('-') or cleaned.endswith('-') or cleaned.endswith('CR'):
+        return None
+    cleaned = cleaned.replace('$', '').replace(',', '').replace(' ', '')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def month_number(text: str) -> Optional[int]:
+    """Month number from digits or a Spanish month name/abbreviation"""
+    text = text.strip().lower().rstrip('.')
+    if text.isdigit():
+        month = int(text)
+        return month if 1 <= month <= 12 else None
+    return SPANISH_MONTHS.get(text)
+
+
+def infer_year(month: int, billing_period: Optional[Dict[str, Any]]) -> int:
+    """Year for a day/month-only date, using the end of the billing period as anchor"""
+    end_year = None
+    end_month = None
+    if billing_period:
+        if billing_period.get('end'):
+            try:
+                end_date = datetime.strptime(billing_period['end'], '%Y-%m-%d')
+                end_year, end_month = end_date.year, end_date.month
+            except ValueError:
+                pass
+        if end_year is None and billing_period.get('endYear'):
+            end_year = int(billing_period['endYear'])
+            end_month = month_number(str(billing_period.get('endMonth', ''))) or 12
+    if end_year is None:
+        today = datetime.now()
+        end_year, end_month = today.year, today.month
+    # A December purchase on a January statement belongs to the previous year
+    return end_year - 1 if month > end_month else end_year
+
+
+class StatementParser:
+    """Base class for rule-based parsers; subclasses set name and implement matches/parse"""
+
+    name = 'base'
+
+    def matches(self, pages_text: Sequence[str]) -> bool:
+        raise NotImplementedError
+
+    def parse(
+        self,
+        pages_text: Sequence[str],
+        billing_period: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def count_rows(self, page_text: str) -> int:
+        """Rows of the page the layout recognizes, purchases or not (for coverage checks)"""
+        raise NotImplementedError
+
+
+class LayoutRuleParser(StatementParser):
+    """
+    Parser driven by regular expressions over text-layer rows
+
+    fingerprints: patterns that must ALL appear in the first pages
+                  (the issuer and the table's header row)
+    row_pattern: pattern with named groups day, month, (optional) year,
+                 description and amount, matched against each row
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fingerprints: Sequence[str],
+        row_pattern: str,
+        skip_patterns: Sequence[str] = DEFAULT_SKIP_PATTERNS,
+        fingerprint_pages: int = 2
+    ):
+        self.name = name
+        self.fingerprints: List[Pattern[str]] = [re.compile(p, re.IGNORECASE) for p in fingerprints]
+        self.row_pattern: Pattern[str] = re.compile(row_pattern, re.IGNORECASE)
+        self.skip_patterns: List[Pattern[str]] = [re.compile(p, re.IGNORECASE) for p in skip_patterns]
+        self.fingerprint_pages = fingerprint_pages
+
+    def matches(self, pages_text: Sequence[str]) -> bool:
+        header_text = '\n'.join(pages_text[:self.fingerprint_pages])
+        return all(pattern.search(header_text) for pattern in self.fingerprints)
+
+    def count_rows(self, page_text: str) -> int:
+        return sum(1 for line in page_text.splitlines() if self.row_pattern.search(line))
+
+    def parse(
+        self,
+        pages_text: Sequence[str],
+        billing_period: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        transactions = []
+        for page_idx, page_text in enumerate(pages_text):
+            for line in page_text.splitlines():
+                match = self.row_pattern.search(line)
+                if not match:
+                    continue
+                description = match.group('description').replace('|', ' ').strip()
+                if any(pattern.search(description) for pattern in self.skip_patterns):
+                    continue
+                amount = parse_amount(match.group('amount'))
+                month = month_number(match.group('month'))
+                if amount is None or month is None:
+                    continue
+                day = int(match.group('day'))
+                year_text = match.groupdict().get('year')
+                if year_text:
+                    year = int(year_text)
+                    year = year + 2000 if year < 100 else year
+                else:
+                    year = infer_year(month, billing_period)
+                transactions.append({
+                    'date': f'{year:04d}-{month:02d}-{day:02d}',
+                    'amount': amount,
+                    'description': description,
+                    'category': 'Otros',
+                    'page': page_idx + 1,
+                })
+        return transactions
+
+
+_registry: List[StatementParser] = []
+
+
+def register_parser(parser: StatementParser) -> StatementParser:
+    """Add a parser to the registry (checked in registration order)"""
+    _registry.append(parser)
+    return parser
+
+
+def get_registered_parsers() -> List[StatementParser]:
+    return list(_registry)
+
+
+def find_parser(pages_text: Sequence[str]) -> Optional[StatementParser]:
+    """First registered parser whose fingerprints match, or None for unknown layouts"""
+    for parser in _registry:
+        try:
+            if parser.matches(pages_text):
+                return parser
+        except Exception as e:
+            log.warning('Parser %s failed while matching: %s', parser.name, e)
+    return None
+
+
+# Known issuer layouts. Rows come from text_layer.extract_page_text, where
+# table columns are separated by ' | '; header patterns match within one row.
+
+# BBVA México: "15-nov-2024 | 16-nov-2024 | OXXO CENTRO | $123.45"
+# (operation date, charge date, description, amount)
+register_parser(LayoutRuleParser(
+    name='bbva_mx',
+    fingerprints=[
+        r'\bBBVA\b',
+        r'FECHA DE (?:LA )?OPERACI[OÓ]N[^\n]*FECHA DE CARGO[^\n]*\bIMPORTE\b',
+    ],
+    row_pattern=(
+        r'^(?P<day>\d{1,2})[-/](?P<month>[A-Za-z]{3}|\d{1,2})[-/](?P<year>\d{2,4})'
+        r'(?:\s*\|\s*\d{1,2}[-/](?:[A-Za-z]{3}|\d{1,2})[-/]\d{2,4})?'
+        r'\s*\|\s*(?P<description>.+?)\s*\|\s*'
+        r'(?P<amount>' + AMOUNT_PATTERN + r')\s*$'
+    ),
+))
+
+# Citibanamex: "15 nov | OXXO CENTRO | 123.45" (no year on rows)
+register_parser(LayoutRuleParser(
+    name='citibanamex',
+    fingerprints=[
+        r'\b(?:CITIBANAMEX|BANAMEX)\b',
+        r'\bFECHA\b[^\n]*\bDESCRIPCI[OÓ]N\b[^\n]*\b(?:IMPORTE|MONTO)\b',
+    ],
+    row_pattern=(
+        r'^(?P<day>\d{1,2})[\s-](?P<month>[A-Za-z]{3,10})\.?'
+        r'\s*\|\s*(?P<description>.+?)\s*\|\s*'
+        r'(?P<amount>' + AMOUNT_PATTERN + r')\s*$'
+    ),
+))
+
+# Santander México: "15/11/2024 | OXXO CENTRO | $123.45"
+register_parser(LayoutRuleParser(
+    name='santander_mx',
+    fingerprints=[
+        r'\bSANTANDER\b',
+        r'\bFECHA\b[^\n]*\bCONCEPTO\b[^\n]*\b(?:IMPORTE|CARGOS?)\b',
+    ],
+    row_pattern=(
+        r'^(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{2,4})'
+        r'\s*\|\s*(?P<description>.+?)\s*\|\s*'
+        r'(?P<amount>' + AMOUNT_PATTERN + r')\s*$'
+    ),
+))
@@ -0,0 +1,137 @@
+"""
+Prompts for transaction extraction
+
+The system prompt is static: byte-identical for every request of a given
+output format, whatever the statement, page or model. Everything that
+varies (card name, billing period, page numbers, then the page itself)
+goes in the user message, with the short context line at its end, so the
+instructions are written once instead of per page, batch and image prompt.
+
+OpenAI only caches prompt prefixes of PROMPT_CACHE_MIN_TOKENS or more. The
+system prompt is about half that, so it is not cached today (cachedTokens
+stays 0), and padding it to qualify would cost about what caching saves.
+prompt_token_counts reports whether each version is cache-eligible.
+
+Output formats:
+- json: {"transactions": [{"date", "amount", "description", "category"}]}
+- compact: {"rows": [[date, amount, description, category(, page)]]}, no
+  repeated keys, so fewer output tokens per transaction. Still a JSON
+  object, so response_format=json_object keeps working (CSV rows would
+  need their own escaping for descriptions with commas).
+decode_transactions turns either answer into the same list of dicts.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+# Bump a format's version whenever its prompt changes, so cached results
+# from old prompts are not reused
+PROMPT_VERSIONS = {
+    'json': '2026-10-v3',
+    'compact': '2026-10-c1',
+}
+
+# Shortest prefix OpenAI's prompt caching applies to
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+CATEGORIES = 'Comida, Entretenimiento, Familia, Transporte, Salud, Educación, Ropa, Servicios, Vivienda, Otros'
+
+# Fields of a compact row, in order (page only when several pages are sent)
+COMPACT_FIELDS = ('date', 'amount', 'description', 'category', 'page')
+
+INSTRUCTIONS = f"""You are a financial data extraction assistant. Your task is to extract credit card transactions from a statement document.
+
+CRITICAL: You MUST extract ALL transactions visible in the pages given. Do NOT filter by date - extract EVERYTHING you see.
+
+Each request gives one or more pages of a statement, as images or as text extracted from the PDF (one line per visual row, table columns separated by |). The last line of the request gives the context: the card, the approximate billing period and which pages of how many are given. Use the billing period ONLY to infer the correct year when dates show only day/month. Do NOT use it to filter transactions.
+
+For each transaction, extract:
+- date: The date when the transaction occurred (YYYY-MM-DD format). If only day/month is shown, infer the year from the billing period.
+- amount: The transaction amount as a positive number (expenses are positive)
+- description: A clear, concise description of the merchant/store/service. Normalize names (e.g., "WALMART" -> "Walmart")
+- category: One of: {CATEGORIES}
+
+Important rules:
+1. Extract ALL transactions visible in the pages given, regardless of date
+2. Ignore: payments made to the card, credits, interest charges, fees, and balance transfers
+3. For installment purchases, extract each monthly payment as a separate transaction if shown
+4. Look carefully at tables, lists, and any formatted sections
+5. Return dates in ISO format (YYYY-MM-DD)
+6. If you cannot find any transactions, return an empty array but still return the JSON structure"""
+
+OUTPUT_FORMATS = {
+    'json': """Return ONLY a valid JSON object with this exact structure:
+{"transactions": [{"date": "2024-11-20", "amount": 150.50, "description": "Walmart Supercenter", "category": "Comida"}]}
+When several pages are given, each transaction MUST also include "page": the number of the page it appears on.
+If no transactions are found, return: {"transactions": []}""",
+    'compact': """Return ONLY a valid JSON object with one array per transaction, values in this order: date, amount, description, category:
+{"rows": [["2024-11-20", 150.5, "Walmart Supercenter", "Comida"]]}
+When several pages are given, add the page number the transaction appears on as a fifth value.
+No other keys. If no transactions are found, return: {"rows": []}""",
+}
+
+SYSTEM_PROMPTS = {fmt: f'{INSTRUCTIONS}\n\n{output}' for fmt, output in OUTPUT_FORMATS.items()}
+
+
+def build_context(card_name: str, period_description: str, page_nums: List[int], total_pages: int) -> str:
+    """The variable part of a request, sent after the page(s)"""
+    if len(page_nums) == 1:
+        pages = f'page {page_nums[0]} of {total_pages}'
+    else:
+        pages = f'pages {", ".join(str(n) for n in page_nums)} of {total_pages}'
+    return f'Context: card {card_name}; billing period approximately {period_description}; {pages}.'
+
+
+def decode_transactions(parsed_response: Any, output_format: str) -> Optional[List[Any]]:
+    """Transactions (dicts) from a parsed answer in either format; None if it has none"""
+    if not isinstance(parsed_response, dict):
+        return None
+    if output_format == 'compact' and 'rows' in parsed_response:
+        rows = parsed_response['rows']
+        if not isinstance(rows, list):
+            return None
+        return [dict(zip(COMPACT_FIELDS, row)) if isinstance(row, list) else row for row in rows]
+    # The long format is also accepted in compact mode (a model may ignore the schema)
+    transactions = parsed_response.get('transactions', [])
+    return transactions if isinstance(transactions, list) else None
+
+
+def encode_transactions(transactions: List[Dict[str, Any]], output_format: str) -> str:
+    """An answer in output_format, as the model would write it (benchmarks, token estimates)"""
+    if output_format == 'compact':
+        rows = [
+            [txn.get(field) for field in COMPACT_FIELDS[:4]] + ([txn['page']] if 'page' in txn else [])
+            for txn in transactions
+        ]
+        return json.dumps({'rows': rows}, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps({'transactions': transactions}, ensure_ascii=False)
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens with tiktoken (o200k_base, the gpt-4o encoding) if installed, else ~4 characters per token"""
+    try:
+        import tiktoken
+    except ImportError:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding('o200k_base').encode(text))
+
+
+def prompt_token_counts(sample_transactions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Tokens per prompt version: static system prefix (and whether it is long
+    enough to be cached), context line, and the answer for
+    sample_transactions (per transaction)
+    """
+    context = build_context('BBVA Azul', 'noviembre 2024 a diciembre 2024', [3], 12)
+    counts = {}
+    for output_format, version in PROMPT_VERSIONS.items():
+        answer_tokens = estimate_tokens(encode_transactions(sample_transactions, output_format))
+        system_tokens = estimate_tokens(SYSTEM_PROMPTS[output_format])
+        counts[version] = {
+            'format': output_format,
+            'systemTokens': system_tokens,
+            'cacheEligible': system_tokens >= PROMPT_CACHE_MIN_TOKENS,
+            'contextTokens': estimate_tokens(context),
+            'outputTokensPerTransaction': round(answer_tokens / max(1, len(sample_transactions)), 1),
+        }
+    return counts
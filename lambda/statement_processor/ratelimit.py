@@ -0,0 +1,161 @@
+"""
+Per-client rate limiters
+
+Every backend answers check(client_id) with (allowed, remaining), where
+remaining is how many more requests the client can make right now.
+
+- memory: token bucket per client in this process. O(1) per check; idle
+  clients are evicted as new requests come in, so the table stays bounded
+  in a warm container hit by many distinct IPs.
+- dynamodb: fixed-window counter in a DynamoDB table, shared by every
+  concurrent Lambda instance. Works against DynamoDB Local (or any
+  DynamoDB-compatible endpoint) for local runs.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from statement_processor import log
+
+
+class RateLimiter:
+    """Base class: subclasses implement check"""
+
+    name = 'base'
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+
+    def check(self, client_id: str) -> Tuple[bool, int]:
+        raise NotImplementedError
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Token bucket per client: capacity `limit`, refilled at limit/window per second
+
+    Clients are kept in last-seen order; a client idle for a whole window
+    has a full bucket again, so it is dropped and recreated on its next
+    request. max_keys caps the table even within one window.
+    """
+
+    name = 'memory'
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000, clock: Callable[[], float] = time.monotonic):
+        super().__init__(limit, window)
+        self.max_keys = max(1, max_keys)
+        self.rate = limit / window
+        self.clock = clock
+        # client_id -> [tokens, last_refill]
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, now: float) -> None:
+        # Oldest entries first; stop at the first one still inside the window
+        while self._buckets:
+            last_refill = next(iter(self._buckets.values()))[1]
+            if now - last_refill < self.window and len(self._buckets) < self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+    def check(self, client_id: str) -> Tuple[bool, int]:
+        now = self.clock()
+        with self._lock:
+            self._evict_idle(now)
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = [float(self.limit), now]
+                self._buckets[client_id] = bucket
+            else:
+                bucket[0] = min(float(self.limit), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(client_id)
+
+            if bucket[0] < 1:
+                return False, 0
+            bucket[0] -= 1
+            return True, int(math.floor(bucket[0]))
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class DynamoDBRateLimiter(RateLimiter):
+    """
+    Fixed-window counter shared across instances
+
+    One item per client and window ('<client>#<window start>'), incremented
+    with a conditional update so the limit holds under concurrency. Items
+    carry an expiresAt attribute for DynamoDB TTL cleanup. Table schema:
+    partition key 'pk' (string).
+
+    If DynamoDB itself fails the request is allowed (with a warning): an
+    outage of the limiter must not take the API down.
+    """
+
+    name = 'dynamodb'
+
+    def __init__(self, dynamodb_client: Any, table: str, limit: int, window: float, clock: Callable[[], float] = time.time):
+        super().__init__(limit, window)
+        # A client, or a zero-argument function returning one (created on first check)
+        self._dynamodb_client = dynamodb_client
+        self.table = table
+        self.clock = clock
+
+    @property
+    def dynamodb_client(self) -> Any:
+        if callable(self._dynamodb_client):
+            self._dynamodb_client = self._dynamodb_client()
+        return self._dynamodb_client
+
+    def check(self, client_id: str) -> Tuple[bool, int]:
+        window_start = int(self.clock() // self.window * self.window)
+        try:
+            response = self.dynamodb_client.update_item(
+                TableName=self.table,
+                Key={'pk': {'S': f'{client_id}#{window_start}'}},
+                UpdateExpression='ADD #count :one SET #expires = :expires',
+                ConditionExpression='attribute_not_exists(#count) OR #count < :limit',
+                ExpressionAttributeNames={'#count': 'requestCount', '#expires': 'expiresAt'},
+                ExpressionAttributeValues={
+                    ':one': {'N': '1'},
+                    ':limit': {'N': str(self.limit)},
+                    ':expires': {'N': str(int(window_start + 2 * self.window))},
+                },
+                ReturnValues='UPDATED_NEW',
+            )
+        except Exception as e:
+            # botocore raises ClientError with this code when the limit is reached
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code == 'ConditionalCheckFailedException':
+                return False, 0
+            log.warning('dynamodb rate limit check failed for %s, allowing request: %s', client_id, e)
+            return True, self.limit - 1
+        count = int(response['Attributes']['requestCount']['N'])
+        return True, max(0, self.limit - count)
+
+
+def create_rate_limiter(
+    backend: str,
+    limit: int,
+    window: float,
+    max_keys: int = 10000,
+    dynamodb_client: Any = None,
+    table: Optional[str] = None
+) -> RateLimiter:
+    """
+    Create a rate limiter for the given backend name
+    Falls back to the memory limiter when the shared backend cannot be configured.
+    """
+    backend = (backend or 'memory').lower()
+    if backend == 'dynamodb':
+        if dynamodb_client and table:
+            return DynamoDBRateLimiter(dynamodb_client, table, limit, window)
+        log.warning('dynamodb rate limiter requested without boto3 or table, using memory')
+    elif backend != 'memory':
+        log.warning('Unknown rate limit backend "%s", using memory', backend)
+    return MemoryRateLimiter(limit, window, max_keys)
@@ -0,0 +1,170 @@
+"""
+Reconcile extracted transactions with the statement's printed period total
+
+Statements print the total of charges for the period ("Total de cargos",
+"Compras y cargos del periodo"...). It is read from the text layer, then
+compared with the sum of the extracted amounts in integer cents, so the
+comparison is exact.
+
+The printed total may include interest or fees that are not extracted as
+purchases, so mismatches are routine and are reported, never "fixed" by
+inventing rows. Re-queries are opt-in (max_requery) and limited to text
+pages that print more purchase rows than were extracted from them; a
+scanned page cannot show that it missed a row, so it is never re-queried.
+"""
+
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from statement_processor import log
+from statement_processor.parsers import DEFAULT_SKIP_PATTERNS
+from statement_processor.routing import AMOUNT_PATTERN, parse_amount
+from statement_processor.triage import DATE_PATTERN
+from statement_processor.tracing import count
+
+TOTAL_LABEL_PATTERN = re.compile(
+    r'total\s+(?:de\s+)?(?:cargos|compras|consumos)'
+    r'|(?:compras|cargos)\s+(?:y\s+(?:cargos|disposiciones)\s+)?del\s+per[ií]odo',
+    re.IGNORECASE
+)
+
+# Payments, credits, interest and fees: printed with a date but never extracted
+SKIP_ROW_PATTERN = re.compile('|'.join(DEFAULT_SKIP_PATTERNS), re.IGNORECASE)
+
+PageRequery = Callable[[int], Optional[List[Dict[str, Any]]]]
+
+
+def to_cents(amount: Any) -> int:
+    return int(round(float(amount) * 100))
+
+
+def sum_cents(transactions: List[Dict[str, Any]]) -> int:
+    """Exact sum of the amounts in cents (no float accumulation error)"""
+    return sum(to_cents(txn['amount']) for txn in transactions)
+
+
+def find_printed_total(page_texts: Dict[int, str]) -> Optional[Tuple[int, int]]:
+    """
+    First 'total of charges' line with an amount, in page order
+    Returns: (total_cents, page_num), or None if no page prints one
+    """
+    for page_num in sorted(page_texts):
+        for line in page_texts[page_num].splitlines():
+            label = TOTAL_LABEL_PATTERN.search(line)
+            if not label:
+                continue
+            # The amount follows the label (other columns may come before it)
+            amounts = [parse_amount(match.group()) for match in AMOUNT_PATTERN.finditer(line, label.end())]
+            amounts = [amount for amount in amounts if amount is not None]
+            if amounts:
+                return to_cents(amounts[0]), page_num
+    return None
+
+
+def purchase_rows(page_text: str) -> List[List[float]]:
+    """Amounts of each date/amount row that is not a payment, credit, interest or fee"""
+    rows = []
+    for line in page_text.splitlines():
+        if not DATE_PATTERN.search(line) or SKIP_ROW_PATTERN.search(line) or TOTAL_LABEL_PATTERN.search(line):
+            continue
+        amounts = [parse_amount(match.group()) for match in AMOUNT_PATTERN.finditer(line)]
+        amounts = [amount for amount in amounts if amount is not None]
+        if amounts:
+            rows.append(amounts)
+    return rows
+
+
+def purchase_row_amounts(page_text: str) -> List[float]:
+    """Amounts on date/amount rows that are not payments, credits, interest or fees"""
+    return [amount for amounts in purchase_rows(page_text) for amount in amounts]
+
+
+def missing_row_amounts(page_text: str, transactions: List[Dict[str, Any]]) -> int:
+    """Amounts on the page's purchase rows that no extracted transaction has (in cents)"""
+    printed = Counter(to_cents(amount) for amount in purchase_row_amounts(page_text))
+    printed.subtract(Counter(to_cents(txn['amount']) for txn in transactions))
+    return sum(cents for cents in printed.values() if cents > 0)
+
+
+def suspect_pages(
+    page_results: Dict[int, List[Dict[str, Any]]],
+    page_texts: Dict[int, str],
+    max_pages: int
+) -> List[int]:
+    """
+    Text pages with more purchase rows printed than extracted, most missing
+    amount first, at most max_pages
+    """
+    missing = {
+        page_num: missing_row_amounts(page_texts[page_num], transactions)
+        for page_num, transactions in page_results.items()
+        if page_num in page_texts and len(purchase_rows(page_texts[page_num])) > len(transactions)
+    }
+    suspects = sorted(missing, key=lambda page_num: -missing[page_num])
+    return suspects[:max_pages]
+
+
+def reconcile_pages(
+    page_results: Dict[int, List[Dict[str, Any]]],
+    page_texts: Dict[int, str],
+    tolerance_cents: int = 0,
+    requery: Optional[PageRequery] = None,
+    max_requery: int = 0
+) -> Dict[str, Any]:
+    """
+    Compare extracted totals with the printed total; with max_requery, re-ask
+    suspect pages once on a mismatch
+
+    page_results (page_num -> normalized transactions) is updated in place
+    when a re-queried page brings the total closer to the printed one.
+    Returns: the reconciliation report for metadata
+    """
+    printed = find_printed_total(page_texts)
+    if printed is None:
+        count('reconcileUnavailable')
+        return {'status': 'unavailable'}
+    printed_cents, total_page = printed
+
+    def report(status: str) -> Dict[str, Any]:
+        extracted_cents = sum(sum_cents(transactions) for transactions in page_results.values())
+        return {
+            'status': status,
+            'printedTotal': printed_cents / 100,
+            'extractedTotal': extracted_cents / 100,
+            'difference': (printed_cents - extracted_cents) / 100,
+            'totalPage': total_page,
+        }
+
+    def gap() -> int:
+        return abs(printed_cents - sum(sum_cents(transactions) for transactions in page_results.values()))
+
+    if gap() <= tolerance_cents:
+        count('reconcileMatched')
+        return report('matched')
+
+    requeried = []
+    if requery and max_requery > 0:
+        for page_num in suspect_pages(page_results, page_texts, max_requery):
+            before = gap()
+            try:
+                transactions = requery(page_num)
+            except Exception as e:
+                log.warning('Re-query of page %d for reconciliation failed: %s', page_num, e)
+                continue
+            requeried.append(page_num)
+            if transactions is None:
+                continue
+            previous = page_results[page_num]
+            page_results[page_num] = transactions
+            if gap() >= before:
+                page_results[page_num] = previous
+            if gap() <= tolerance_cents:
+                break
+
+    matched = gap() <= tolerance_cents
+    count('reconcileMatched' if matched else 'reconcileMismatch')
+    result = report('matched' if matched else 'mismatch')
+    if requeried:
+        result['requeriedPages'] = requeried
+    return result
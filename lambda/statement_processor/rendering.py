@@ -0,0 +1,212 @@
+"""
+Render profiles for sending scanned pages to the Vision API
+
+The API fits high-detail images into 2048x2048 and then scales the short
+side down to 768 px, so rendering a letter page at 300 DPI (2550x3300)
+mostly pays for pixels that get thrown away. A profile sets a pixel
+budget, color mode, encoding and whether blank margins are cropped; the
+'auto' profile picks one per page from its ink density.
+"""
+
+import base64
+import io
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from statement_processor.tracing import stage
+
+RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Previous behavior: 300 DPI color PNG, no cropping
+    'legacy': {
+        'max_pixels': None,
+        'grayscale': False,
+        'format': 'png',
+        'quality': None,
+        'autocrop': False,
+        'detail': 'high',
+    },
+    # Small fonts and full tables: keep a bit more than the API's 768 px short side
+    'dense': {
+        'max_pixels': 1400 * 1812,
+        'grayscale': True,
+        'format': 'jpeg',
+        'quality': 85,
+        'autocrop': True,
+        'detail': 'high',
+    },
+    # Typical statement page: matches what the API keeps after downscaling
+    'standard': {
+        'max_pixels': 1024 * 1325,
+        'grayscale': True,
+        'format': 'jpeg',
+        'quality': 75,
+        'autocrop': True,
+        'detail': 'high',
+    },
+    # Low-detail thumbnail used to triage scanned pages (85 input tokens)
+    'triage': {
+        'max_pixels': 512 * 662,
+        'grayscale': True,
+        'format': 'jpeg',
+        'quality': 60,
+        'autocrop': True,
+        'detail': 'low',
+    },
+    # Mostly empty pages (covers, short summaries)
+    'sparse': {
+        'max_pixels': 768 * 994,
+        'grayscale': True,
+        'format': 'jpeg',
+        'quality': 70,
+        'autocrop': True,
+        'detail': 'high',
+    },
+}
+
+# Never render above the old 300 DPI
+MAX_ZOOM = 300 / 72
+
+# Thumbnail used to measure ink density and find margins
+THUMBNAIL_ZOOM = 36 / 72
+
+# Gray levels below this count as ink
+INK_THRESHOLD = 160
+
+# Ink ratio (dark pixels / all pixels) thresholds for the 'auto' profile
+DENSE_INK_RATIO = 0.03
+SPARSE_INK_RATIO = 0.006
+
+# Padding kept around the cropped content, in points
+CROP_MARGIN = 12
+
+_LIGHT_BYTES = bytes(range(INK_THRESHOLD, 256))
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+
+def _count_ink(data: bytes) -> int:
+    """Number of dark bytes, counted in C by deleting the light ones"""
+    return len(data.translate(None, _LIGHT_BYTES))
+
+
+def analyze_page(page: Any) -> Tuple[float, Optional[Any]]:
+    """
+    Measure a page from a low-resolution grayscale thumbnail
+    Returns: (ink_ratio, content_rect) where content_rect is None for blank pages
+    """
+    import fitz
+
+    with stage('analyze'):
+        return _analyze_page(page, fitz)
+
+
+def _analyze_page(page: Any, fitz: Any) -> Tuple[float, Optional[Any]]:
+    thumb = page.get_pixmap(matrix=fitz.Matrix(THUMBNAIL_ZOOM, THUMBNAIL_ZOOM), colorspace=fitz.csGRAY, alpha=False)
+    width, height, stride = thumb.width, thumb.height, thumb.stride
+    samples = thumb.samples
+    if not width or not height:
+        return 0.0, None
+
+    rows = [samples[y * stride:y * stride + width] for y in range(height)]
+    ink_rows = [y for y, row in enumerate(rows) if _count_ink(row)]
+    if not ink_rows:
+        return 0.0, None
+
+    ink_total = sum(_count_ink(row) for row in rows)
+    # Columns: stack the inked rows and slice every column out
+    inked = b''.join(rows[y] for y in ink_rows)
+    ink_cols = [x for x in range(width) if _count_ink(inked[x::width])]
+
+    scale = 1 / THUMBNAIL_ZOOM
+    content_rect = fitz.Rect(
+        ink_cols[0] * scale - CROP_MARGIN,
+        ink_rows[0] * scale - CROP_MARGIN,
+        (ink_cols[-1] + 1) * scale + CROP_MARGIN,
+        (ink_rows[-1] + 1) * scale + CROP_MARGIN,
+    ) & page.rect
+    return ink_total / (width * height), content_rect
+
+
+def select_profile_name(ink_ratio: float) -> str:
+    """Pick a profile for the 'auto' mode from a page's ink density"""
+    if ink_ratio >= DENSE_INK_RATIO:
+        return 'dense'
+    if ink_ratio >= SPARSE_INK_RATIO:
+        return 'standard'
+    return 'sparse'
+
+
+def encode_pixmap(pix: Any, image_format: str, quality: Optional[int]) -> Tuple[bytes, str]:
+    """
+    Encode a pixmap with the requested format
+    Returns: (image_bytes, format_used); WebP falls back to JPEG without Pillow
+    """
+    if image_format == 'webp':
+        try:
+            from PIL import Image
+            mode = 'L' if pix.n == 1 else 'RGB'
+            image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+            buffer = io.BytesIO()
+            image.save(buffer, format='WEBP', quality=quality or 75)
+            return buffer.getvalue(), 'webp'
+        except ImportError:
+            image_format = 'jpeg'
+    if image_format == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=quality or 75), 'jpeg'
+    return pix.tobytes('png'), 'png'
+
+
+def render_page(
+    page: Any,
+    profile_name: str = 'auto',
+    analysis: Optional[Tuple[float, Optional[Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Render a PDF page with a profile and return an image page payload
+    analysis: result of analyze_page for this page, if already computed
+    """
+    import fitz
+
+    ink_ratio, content_rect = analysis if analysis is not None else (None, None)
+    if profile_name == 'auto':
+        if ink_ratio is None:
+            ink_ratio, content_rect = analyze_page(page)
+        profile_name = select_profile_name(ink_ratio)
+    profile = RENDER_PROFILES[profile_name]
+
+    clip = page.rect
+    if profile['autocrop']:
+        if ink_ratio is None:
+            ink_ratio, content_rect = analyze_page(page)
+        if content_rect is not None and not content_rect.is_empty:
+            clip = content_rect
+
+    zoom = MAX_ZOOM
+    if profile['max_pixels']:
+        zoom = min(MAX_ZOOM, math.sqrt(profile['max_pixels'] / max(clip.width * clip.height, 1)))
+
+    with stage('render'):
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom),
+            clip=clip,
+            colorspace=fitz.csGRAY if profile['grayscale'] else fitz.csRGB,
+            alpha=False,
+        )
+    with stage('encode'):
+        img_data, image_format = encode_pixmap(pix, profile['format'], profile['quality'])
+    with stage('base64'):
+        image_base64 = base64.b64encode(img_data).decode('utf-8')
+    return {
+        'kind': 'image',
+        'mime_type': MIME_TYPES[image_format],
+        'base64': image_base64,
+        'detail': profile['detail'],
+        'profile': profile_name,
+        'width': pix.width,
+        'height': pix.height,
+        'bytes': len(img_data),
+    }
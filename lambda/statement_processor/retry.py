@@ -0,0 +1,183 @@
+"""
+Call policy for model requests: retries with backoff, and hedging
+
+Each model call goes through CallPolicy.call:
+- errors worth retrying (429, 408/409, 5xx, timeouts and connection
+  errors) are retried up to max_attempts times with exponential backoff
+  and full jitter, honouring a Retry-After header when the API sends one
+- with hedging on, a call still running after the p95 latency of recent
+  calls to the same model gets a duplicate request, and whichever answer
+  arrives first is used. The other request is not cancelled (the HTTP call
+  cannot be), so hedging trades some extra tokens for tail latency.
+
+The per-attempt timeout is enforced by the HTTP client (passed to it as
+`timeout`); its own retries should be off so attempts are not multiplied.
+"""
+
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from statement_processor import log
+from statement_processor.tracing import count
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection errors"""
+    status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai.APITimeoutError subclasses APIConnectionError; neither has a status code
+    return any(cls.__name__ == 'APIConnectionError' for cls in type(error).__mro__)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the error response's Retry-After header, if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, per key (model)"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=size))
+        self._lock = threading.Lock()
+
+    def add(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: str, fraction: float, min_samples: int) -> Optional[float]:
+        """Nearest-rank percentile, or None with fewer than min_samples samples"""
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[max(0, math.ceil(fraction * len(samples)) - 1)]
+
+
+class CallPolicy:
+    """
+    Retry and hedging policy shared by all model calls of the process
+
+    timeout: seconds per attempt (for the HTTP client)
+    hedge_after: fixed hedging delay in seconds; None uses the p95 of the
+                 last calls once hedge_min_samples are known
+    """
+
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_enabled: bool = False,
+        hedge_after: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        max_workers: int = 16,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None
+    ):
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.latencies = LatencyWindow()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full jitter: uniform in [0, base * 2^(attempt-1)], capped; Retry-After wins if larger"""
+        delay = self.rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.backoff_max))
+        return delay
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        return self.latencies.percentile(key, 0.95, self.hedge_min_samples)
+
+    def call(self, func: Callable[[], T], label: str = 'model call', key: str = '') -> T:
+        """
+        Run func (one request; must be safe to run twice at once when hedging)
+        Raises: the last error once attempts run out or the error is not retryable
+        """
+        attempt = 1
+        while True:
+            try:
+                return self._hedged(func, label, key)
+            except Exception as error:
+                if attempt >= self.max_attempts or not is_retryable(error):
+                    raise
+                delay = self.backoff_delay(attempt, error)
+                log.warning('%s failed (%s), retry %d/%d in %.2fs', label, error, attempt, self.max_attempts - 1, delay)
+                count('modelRetries')
+                self.sleep(delay)
+                attempt += 1
+
+    def _timed(self, func: Callable[[], T], key: str) -> T:
+        started = time.perf_counter()
+        result = func()
+        self.latencies.add(key, time.perf_counter() - started)
+        return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hedge')
+        return self._executor
+
+    def _hedged(self, func: Callable[[], T], label: str, key: str) -> T:
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return self._timed(func, key)
+
+        # Both requests run in the pool (in a copy of this context, so they
+        # record into the caller's trace) and the caller takes the first answer
+        executor = self._get_executor()
+        primary = executor.submit(contextvars.copy_context().run, self._timed, func, key)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        log.info('%s slower than %.2fs, sending a hedged request', label, delay)
+        count('modelHedges')
+        hedge = executor.submit(contextvars.copy_context().run, self._timed, func, key)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    count('modelHedgeWins')
+                return future.result()
+        raise error
@@ -0,0 +1,178 @@
+"""
+Tiered model routing: validate a cheap model's answer before trusting it
+
+Pages go first to a cheaper, faster model (on the text layer when there is
+one). Its answer is checked with heuristics that need no model call:
+- amounts parse as positive numbers
+- dates parse and fall inside the billing period
+- totals reconcile with the page text (text-layer pages): every extracted
+  amount is printed on the page, their sum does not exceed the amounts on
+  the page's date/amount rows, and most of those rows were extracted
+Pages that fail any check are escalated to the vision model. TierStats
+counts pages and accepted answers per tier so thresholds can be tuned.
+"""
+
+import calendar
+import math
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from statement_processor.parsers import month_number
+from statement_processor.tracing import count
+from statement_processor.triage import DATE_PATTERN
+
+# Days a transaction date may fall outside explicit start/end dates
+# (purchases posted after they were made)
+PERIOD_SLACK_DAYS = 7
+
+# Like triage's amount pattern, but also whole amounts without thousands separators
+AMOUNT_PATTERN = re.compile(r'\$?\s?\d[\d,]*\.\d{2}\b')
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Positive finite amount from a number or a '$1,234.56' string, else None"""
+    if isinstance(value, str):
+        value = value.replace('$', '').replace(',', '').strip()
+    try:
+        amount = abs(float(value))
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """ISO date as the prompts ask for (dd/mm/yyyy tolerated), else None"""
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(str(value).strip()[:10], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def period_check(billing_period: Optional[Dict[str, Any]]) -> Optional[Callable[[date], bool]]:
+    """
+    Predicate telling whether a date belongs to the billing period
+    Returns: None when the period does not say enough to check dates
+    """
+    if not billing_period:
+        return None
+    start = parse_date(billing_period.get('start', ''))
+    end = parse_date(billing_period.get('end', ''))
+    if start and end:
+        slack = timedelta(days=PERIOD_SLACK_DAYS)
+        return lambda day: start - slack <= day <= end + slack
+
+    start_month = month_number(str(billing_period.get('startMonth', '')))
+    end_month = month_number(str(billing_period.get('endMonth', '')))
+    if not start_month or not end_month:
+        return None
+    if billing_period.get('startYear') and billing_period.get('endYear'):
+        first = date(int(billing_period['startYear']), start_month, 1)
+        end_year = int(billing_period['endYear'])
+        last = date(end_year, end_month, calendar.monthrange(end_year, end_month)[1])
+        return lambda day: first <= day <= last
+    # Months only: any year, wrapping around December
+    months = {start_month}
+    month = start_month
+    while month != end_month:
+        month = month % 12 + 1
+        months.add(month)
+    return lambda day: day.month in months
+
+
+def printed_row_amounts(page_text: str) -> List[float]:
+    """Amounts on the page's date/amount rows (the shape of a transaction line)"""
+    amounts = []
+    for line in page_text.splitlines():
+        if not DATE_PATTERN.search(line):
+            continue
+        for match in AMOUNT_PATTERN.finditer(line):
+            amount = parse_amount(match.group())
+            if amount is not None:
+                amounts.append(amount)
+    return amounts
+
+
+def validate_page(
+    transactions: List[Dict[str, Any]],
+    billing_period: Optional[Dict[str, Any]],
+    page_text: Optional[str] = None,
+    min_in_period: float = 0.8,
+    min_row_coverage: float = 0.5
+) -> List[str]:
+    """
+    Check one page's raw transactions (as the model returned them)
+    Returns: reasons the answer looks wrong; empty if it passes
+    """
+    reasons = []
+    printed = printed_row_amounts(page_text) if page_text else []
+    if not transactions:
+        if printed:
+            reasons.append(f'no transactions but {len(printed)} date/amount rows')
+        elif page_text is None:
+            reasons.append('no transactions')
+        return reasons
+
+    rows = [txn if isinstance(txn, dict) else {} for txn in transactions]
+    amounts = [parse_amount(txn.get('amount')) for txn in rows]
+    unparsed = sum(1 for amount in amounts if amount is None)
+    if unparsed:
+        reasons.append(f'{unparsed} amounts do not parse')
+
+    dates = [parse_date(txn.get('date')) for txn in rows]
+    bad_dates = sum(1 for day in dates if day is None)
+    if bad_dates:
+        reasons.append(f'{bad_dates} dates do not parse')
+    in_period = period_check(billing_period)
+    if in_period:
+        inside = sum(1 for day in dates if day is not None and in_period(day))
+        if inside < min_in_period * len(transactions):
+            reasons.append(f'{len(transactions) - inside} of {len(transactions)} dates outside the billing period')
+
+    if page_text is not None:
+        parsed = [amount for amount in amounts if amount is not None]
+        printed_cents = {round(amount * 100) for amount in printed}
+        ungrounded = sum(1 for amount in parsed if round(amount * 100) not in printed_cents)
+        if ungrounded:
+            reasons.append(f'{ungrounded} amounts not printed on the page')
+        if math.fsum(parsed) > math.fsum(printed) + 0.01:
+            reasons.append('extracted total exceeds the page rows')
+        if printed and len(transactions) < min_row_coverage * len(printed):
+            reasons.append(f'{len(transactions)} transactions for {len(printed)} date/amount rows')
+    return reasons
+
+
+class TierStats:
+    """Pages and accepted answers per tier for one statement (also counted in the trace)"""
+
+    def __init__(self):
+        self.tiers: Dict[str, Dict[str, int]] = {}
+        self.escalations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, accepted: bool) -> None:
+        with self._lock:
+            stats = self.tiers.setdefault(tier, {'pages': 0, 'accepted': 0})
+            stats['pages'] += 1
+            stats['accepted'] += int(accepted)
+        count(f'{tier}TierPages')
+        if accepted:
+            count(f'{tier}TierAccepted')
+
+    def escalated(self, page_num: int, reasons: List[str]) -> None:
+        with self._lock:
+            self.escalations.append({'page': page_num, 'reasons': reasons})
+        count('escalatedPages')
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'tiers': {
+                    tier: {**stats, 'hitRate': round(stats['accepted'] / stats['pages'], 3)}
+                    for tier, stats in self.tiers.items()
+                },
+                'escalatedPages': sorted(self.escalations, key=lambda escalation: escalation['page']),
+            }
@@ -0,0 +1,75 @@
+"""
+Text-layer helpers for digitally generated PDFs
+
+Native bank statements carry a real text layer, so most pages can be sent
+to the model as compact text rows instead of a 300 DPI image.
+"""
+
+from typing import Any, List, Optional, Tuple
+
+# Words closer than this (in points) are part of the same cell
+COLUMN_GAP = 8.0
+
+# Rows whose vertical centers differ by less than this (in points) are merged
+ROW_TOLERANCE = 3.0
+
+# Fonts without a unicode map come out as U+FFFD; above this ratio the
+# text layer is unusable and the page must go through vision
+MAX_GARBLED_RATIO = 0.1
+
+Word = Tuple[float, float, float, float, str]
+
+
+def get_page_words(page: Any) -> List[Word]:
+    """Return (x0, y0, x1, y1, text) for every word in a PyMuPDF page"""
+    return [(w[0], w[1], w[2], w[3], w[4]) for w in page.get_text('words')]
+
+
+def words_to_rows(words: List[Word]) -> List[List[Word]]:
+    """Group words into visual rows (top to bottom), each row sorted left to right"""
+    rows: List[List[Word]] = []
+    row_centers: List[float] = []
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        center = (word[1] + word[3]) / 2
+        if rows and abs(center - row_centers[-1]) <= ROW_TOLERANCE:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+            row_centers.append(center)
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+    return rows
+
+
+def format_row(row: List[Word]) -> str:
+    """Join a row's words, separating table columns with ' | '"""
+    parts = [row[0][4]]
+    for previous, word in zip(row, row[1:]):
+        separator = ' | ' if word[0] - previous[2] > COLUMN_GAP else ' '
+        parts.append(separator)
+        parts.append(word[4])
+    return ''.join(parts)
+
+
+def extract_page_text(page: Any, min_words: int) -> Optional[str]:
+    """
+    Build a compact row-per-line text version of the page
+    Returns: None if the page has too little usable text (scanned page)
+    """
+    words = get_page_words(page)
+    if len(words) < min_words:
+        return None
+    return words_to_text(words)
+
+
+def words_to_text(words: List[Word]) -> Optional[str]:
+    """
+    Compact row-per-line text from page words
+    Returns: None if there are no words or the text layer is garbled
+    """
+    total_chars = sum(len(w[4]) for w in words)
+    garbled_chars = sum(w[4].count('\ufffd') for w in words)
+    if total_chars == 0 or garbled_chars / total_chars > MAX_GARBLED_RATIO:
+        return None
+
+    return '\n'.join(format_row(row) for row in words_to_rows(words))
@@ -0,0 +1,146 @@
+"""
+Per-request latency tracing
+
+A Trace collects stage timers (decode, PDF open, render, encode, base64,
+model call, normalization...), one entry per model call (latency, tokens
+from completion.usage, bytes sent) and counters. At the end of a request
+it becomes one CloudWatch Embedded Metric Format (EMF) JSON line, so the
+numbers show up as metrics without any agent, and optionally a summary in
+the response metadata.
+
+The current trace lives in a context variable: code anywhere in the
+pipeline calls stage()/record_model_call() without passing it around, and
+those calls are no-ops when no trace is active. Worker threads must run in
+a copy of the caller's context (contextvars.copy_context().run) to see it.
+Stage times are summed across threads, so with concurrent pages they can
+add up to more than the request's wall time.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_current: 'contextvars.ContextVar[Optional[Trace]]' = contextvars.ContextVar('statement_trace', default=None)
+
+
+class Trace:
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.model_calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_model_call(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.model_calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals for the response metadata"""
+        with self._lock:
+            calls = list(self.model_calls)
+            return {
+                'totalMs': round((time.perf_counter() - self.started) * 1000, 1),
+                'stagesMs': {name: round(ms, 1) for name, ms in self.stages.items()},
+                'modelCalls': calls,
+                'promptTokens': sum(call.get('promptTokens', 0) for call in calls),
+                'completionTokens': sum(call.get('completionTokens', 0) for call in calls),
+                'cachedTokens': sum(call.get('cachedTokens', 0) for call in calls),
+                'bytesSent': sum(call.get('bytesSent', 0) for call in calls),
+                **self.counters,
+            }
+
+    def emf_record(self, namespace: str, summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The trace as one CloudWatch Embedded Metric Format record"""
+        summary = summary or self.summary()
+        values: Dict[str, Any] = {'totalMs': summary['totalMs']}
+        units: Dict[str, str] = {'totalMs': 'Milliseconds'}
+        for name, ms in summary['stagesMs'].items():
+            values[f'{name}Ms'] = ms
+            units[f'{name}Ms'] = 'Milliseconds'
+        if summary['modelCalls']:
+            # EMF accepts a list of values: one latency sample per call
+            values['modelLatencyMs'] = [call['ms'] for call in summary['modelCalls']]
+            units['modelLatencyMs'] = 'Milliseconds'
+        for name in ('promptTokens', 'completionTokens', 'cachedTokens'):
+            values[name] = summary[name]
+            units[name] = 'Count'
+        values['bytesSent'] = summary['bytesSent']
+        units['bytesSent'] = 'Bytes'
+        for name, value in self.counters.items():
+            values[name] = value
+            units[name] = 'Count'
+
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [['Operation']],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()],
+                }],
+            },
+            'Operation': self.operation,
+            **values,
+            # Not a metric: per-call details for log queries
+            'modelCalls': summary['modelCalls'],
+        }
+
+
+def start_trace(operation: str) -> Trace:
+    """Start a trace and make it current in this context"""
+    trace = Trace(operation)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the current trace's stage `name`"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, (time.perf_counter() - started) * 1000)
+
+
+def count(name: str, value: int = 1) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, value)
+
+
+def record_model_call(label: str, model: str, elapsed_ms: float, usage: Any, bytes_sent: int) -> None:
+    """Add one model call; usage is completion.usage (may be None)"""
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.add_model_call({
+        'label': label,
+        'model': model,
+        'ms': round(elapsed_ms, 1),
+        'promptTokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completionTokens': getattr(usage, 'completion_tokens', 0) or 0,
+        # Prompt tokens served from the provider's prompt cache (shared prefix)
+        'cachedTokens': getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', 0) or 0,
+        'bytesSent': bytes_sent,
+    })
@@ -0,0 +1,61 @@
+"""
+Cheap page triage: skip statement pages that cannot contain transactions
+
+Cover pages, terms and conditions, rewards summaries and payment coupons
+are recognized from the text layer before any rendering or model call.
+A page is only skipped when a non-transaction section is recognized and
+no line carries an amount; any other page goes to the model, so a table
+whose date format the patterns below do not know is never dropped.
+"""
+
+import re
+from typing import Optional, Tuple
+
+# Spanish and English month abbreviations (full names match through [a-z]*)
+MONTHS = r'(?:ene|feb|mar|abr|may|jun|jul|ago|sep|sept|oct|nov|dic|jan|apr|aug|dec)'
+
+# 15/11, 15-11-2024, 2024-11-15, 15 nov, 15-nov-2024, 15NOV24, Jan 15, 2024
+DATE_PATTERN = re.compile(
+    r'\b(?:\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?'
+    r'|\d{4}-\d{2}-\d{2}'
+    r'|\d{1,2}[\s/-]?' + MONTHS + r'[a-z]*\.?(?:[\s/-]?\d{2,4})?'
+    r'|' + MONTHS + r'[a-z]*\.?\s\d{1,2}(?:,?\s\d{4})?)\b',
+    re.IGNORECASE
+)
+
+AMOUNT_PATTERN = re.compile(r'\$?\s?\d{1,3}(?:,\d{3})*\.\d{2}\b')
+
+# Sections that never list purchases
+NON_TRANSACTION_KEYWORDS = {
+    'terms': re.compile(r't[ée]rminos y condiciones|aviso de privacidad|cl[áa]usulas|glosario', re.IGNORECASE),
+    'coupon': re.compile(r'cup[óo]n de pago|tal[óo]n de pago|ficha de dep[óo]sito', re.IGNORECASE),
+    'rewards': re.compile(r'programa de (?:recompensas|puntos|lealtad)|puntos acumulados|recompensas', re.IGNORECASE),
+}
+
+
+def count_transaction_rows(page_text: str) -> int:
+    """Rows that have both a date and an amount, the shape of a transaction line"""
+    return sum(
+        1 for line in page_text.splitlines()
+        if DATE_PATTERN.search(line) and AMOUNT_PATTERN.search(line)
+    )
+
+
+def classify_page_text(page_text: Optional[str]) -> Tuple[bool, str]:
+    """
+    Decide from the text layer whether a page may contain transactions
+    Returns: (has_transactions, reason)
+    """
+    if not page_text:
+        return True, 'no text layer'
+
+    rows = count_transaction_rows(page_text)
+    if rows:
+        return True, f'{rows} date/amount rows'
+
+    matched = [name for name, pattern in NON_TRANSACTION_KEYWORDS.items() if pattern.search(page_text)]
+    if not matched:
+        return True, 'no known non-transaction section'
+    if AMOUNT_PATTERN.search(page_text):
+        return True, f'{", ".join(matched)} section with amounts'
+    return False, f'{", ".join(matched)} section without amounts'
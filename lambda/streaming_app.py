@@ -0,0 +1,110 @@
+"""
+Streaming HTTP entry point for the statement processor
+
+The Lambda Python runtime returns a response only when the handler ends,
+so the 'stream' mode of index.lambda_handler delivers its NDJSON lines all
+at once. This WSGI app sends each line as soon as its page finishes. Run
+it behind the AWS Lambda Web Adapter with AWS_LWA_INVOKE_MODE=response_stream
+(Function URL invoke mode RESPONSE_STREAM), or locally:
+
+    python streaming_app.py    # http://localhost:8080
+"""
+
+import json
+import os
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, Iterable, List
+from wsgiref.simple_server import WSGIServer, make_server
+
+import index
+from statement_processor import log
+
+# The largest file the handler accepts, base64 encoded, plus room for the other JSON fields
+MAX_BODY_SIZE = int(index.MAX_FILE_SIZE * 4 / 3) + 64 * 1024
+
+
+def wsgi_event(environ: Dict[str, Any]) -> Dict[str, Any]:
+    """Function URL style event (headers only) so index's auth and rate limit helpers apply"""
+    headers = {
+        key[5:].replace('_', '-').lower(): value
+        for key, value in environ.items()
+        if key.startswith('HTTP_')
+    }
+    if environ.get('REMOTE_ADDR') and 'x-forwarded-for' not in headers:
+        headers['x-forwarded-for'] = environ['REMOTE_ADDR']
+    return {'headers': headers}
+
+
+def send(start_response: Callable, response: Dict[str, Any]) -> List[bytes]:
+    """Send a Lambda-style response dict ({statusCode, headers, body}) through WSGI"""
+    status = HTTPStatus(response['statusCode'])
+    start_response(f'{status.value} {status.phrase}', list(response['headers'].items()))
+    return [response['body'].encode('utf-8')]
+
+
+def application(environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+    log.begin_request()
+    method = environ.get('REQUEST_METHOD', 'GET')
+    if method == 'OPTIONS':
+        return send(start_response, {'statusCode': 200, 'headers': index.get_cors_headers(), 'body': ''})
+    
+    event = wsgi_event(environ)
+    is_allowed, remaining = index.check_rate_limit(index.get_client_identifier(event))
+    if not is_allowed:
+        return send(start_response, index.build_response(429, {
+            'success': False,
+            'error': f'Rate limit exceeded. Maximum {index.MAX_REQUESTS_PER_MINUTE} requests per minute allowed.',
+        }, 0))
+    if not index.verify_api_key(event):
+        return send(start_response, index.build_response(401, {
+            'success': False,
+            'error': 'Unauthorized: Invalid or missing API key',
+        }, remaining))
+    if method != 'POST':
+        return send(start_response, index.build_response(405, {'success': False, 'error': 'Use POST'}, remaining))
+    
+    try:
+        content_length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = -1
+    if content_length > MAX_BODY_SIZE:
+        # Answered before reading: the body is never buffered
+        return send(start_response, index.file_too_large_response(int(content_length * 3 / 4), remaining))
+    
+    try:
+        if content_length < 0:
+            raise ValueError(f"invalid Content-Length {environ.get('CONTENT_LENGTH')!r}")
+        body = json.loads(environ['wsgi.input'].read(content_length) or b'{}')
+    except (ValueError, json.JSONDecodeError) as e:
+        return send(start_response, index.build_response(400, {
+            'success': False,
+            'error': f'Invalid JSON in request body: {str(e)}',
+        }, remaining))
+    
+    try:
+        file_buffer, file_type = index.load_statement_file(body)
+    except index.FileTooLargeError as error:
+        return send(start_response, index.file_too_large_response(error.file_size, remaining))
+    except Exception as error:
+        return send(start_response, index.build_response(500, {'success': False, 'error': str(error)}, remaining))
+    
+    headers = index.get_cors_headers()
+    headers.update({
+        'Content-Type': 'application/x-ndjson',
+        'Cache-Control': 'no-cache',
+        'X-RateLimit-Limit': str(index.MAX_REQUESTS_PER_MINUTE),
+        'X-RateLimit-Remaining': str(remaining),
+    })
+    start_response('200 OK', list(headers.items()))
+    return (line.encode('utf-8') for line in index.stream_statement(file_buffer, file_type, body))
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', '8080'))
+    log.info('Serving statement processor stream on port %d', port)
+    make_server('', port, application, server_class=ThreadingWSGIServer).serve_forever()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Pruebas de DateParser (orden día/mes, fechas con año primero, ambiguas)
+
+    python -m pytest test_dates.py
+"""
+
+import pytest
+
+from statement_processor.dates import DAY_FIRST, MONTH_FIRST, AmbiguousDateError, DateParser
+
+NOVEMBER = {'start': '2024-11-01', 'end': '2024-11-30'}
+
+
+@pytest.mark.parametrize('value', [
+    '2024-11-05', '2024-11-5', '2024/11/05', '2024.11.05', '20241105',
+    '2024-11-05 10:00:00', '2024-11-05T10:00',
+])
+@pytest.mark.parametrize('order', [None, DAY_FIRST, MONTH_FIRST])
+def test_year_first_is_always_year_month_day(value, order):
+    parser = DateParser()
+    parser.order = order
+    assert parser.parse(value) == '2024-11-05'
+
+
+def test_day_first_detected():
+    parser = DateParser()
+    assert parser.detect(['25/11/2024', '05/11/2024']) == DAY_FIRST
+    assert parser.parse('05/11/2024') == '2024-11-05'
+    assert parser.parse('05.11.24') == '2024-11-05'
+
+
+def test_month_first_detected():
+    parser = DateParser()
+    assert parser.detect(['11/25/2024', '11/05/2024']) == MONTH_FIRST
+    assert parser.parse('11/05/2024') == '2024-11-05'
+
+
+def test_ambiguous_date_resolved_by_billing_period():
+    parser = DateParser(NOVEMBER)
+    assert parser.detect(['05/11/2024']) is None
+    assert parser.parse('05/11/2024') == '2024-11-05'
+
+
+def test_ambiguous_date_is_reported_not_guessed():
+    parser = DateParser()
+    with pytest.raises(AmbiguousDateError) as raised:
+        parser.parse('05/11/2024')
+    assert sorted(d.isoformat() for d in raised.value.candidates) == ['2024-05-11', '2024-11-05']
+    assert parser.summary() == {'order': None, 'ambiguousRows': 1, 'ambiguousDates': ['05/11/2024']}
+
+
+def test_invalid_date():
+    with pytest.raises(ValueError):
+        DateParser().parse('2024-02-30')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la detección de duplicados por lote (mismas reglas que checkDuplicate en la app)
+
+    python -m pytest test_duplicates.py
+"""
+
+import pytest
+
+from statement_processor.duplicates import check_duplicates
+
+HISTORY = [
+    ['2024-11-03', 4500, 'OXXO CENTRO'],
+    ['2024-11-10', 19900, 'NETFLIX.COM'],
+    {'date': '2024-11-15', 'amount': 1250.5, 'description': 'Amazon MX Marketplace'},
+]
+
+
+def txn(date, amount, description):
+    return {'date': date, 'amount': amount, 'description': description}
+
+
+def test_exact_duplicates():
+    results = check_duplicates([
+        txn('2024-11-03', 45.00, 'OXXO CENTRO'),
+        txn('2024-11-15', 1250.50, 'Amazon MX Marketplace'),
+    ], HISTORY)
+    assert [result['historyIndex'] for result in results] == [0, 2]
+    assert results[0] == {'isDuplicate': True, 'historyIndex': 0,
+                          'reason': 'Duplicate found: OXXO CENTRO on Nov 03, 2024'}
+
+
+@pytest.mark.parametrize('transaction', [
+    txn('2024-11-04', 45.00, 'OXXO CENTRO'),                  # a day later
+    txn('2024-11-02T12:00:00', 45.01, 'OXXO CENTRO'),         # a day earlier, a cent more
+    txn('2024-11-03', 44.99, 'oxxo, centro'),                 # punctuation and case
+    txn('2024-11-03', 45.00, 'CENTRO OXXO'),                  # same words in another order
+    txn('2024-11-03', 45.00, 'OXXO CENTR0'),                  # Levenshtein
+])
+def test_near_duplicates(transaction):
+    assert check_duplicates([transaction], HISTORY)[0]['historyIndex'] == 0
+
+
+@pytest.mark.parametrize('transaction', [
+    txn('2024-11-05', 45.00, 'OXXO CENTRO'),                  # two days later
+    txn('2024-11-03', 45.02, 'OXXO CENTRO'),                  # two cents more
+    txn('2024-11-03', 45.00, 'OXXO'),                         # contained, but too short
+    txn('2024-11-03', 45.00, 'SEVEN ELEVEN'),
+    txn('not a date', 45.00, 'OXXO CENTRO'),
+    txn('2024-11-03', None, 'OXXO CENTRO'),
+])
+def test_not_duplicates(transaction):
+    assert check_duplicates([transaction], HISTORY) == [{'isDuplicate': False}]
+
+
+def test_repeats_within_a_batch():
+    # Repeated purchases in one statement are real (two coffees the same
+    # day): only the history decides, as in the app
+    coffee = txn('2024-11-20', 65.00, 'STARBUCKS REFORMA')
+    assert check_duplicates([coffee, dict(coffee)], HISTORY) == [{'isDuplicate': False}] * 2
+
+    # Each one is checked against the history on its own
+    results = check_duplicates([coffee, dict(coffee), txn('2024-11-03', 45.00, 'OXXO CENTRO')],
+                               HISTORY + [['2024-11-20', 6500, 'STARBUCKS REFORMA']])
+    assert [result.get('historyIndex') for result in results] == [3, 3, 0]
+
+
+def test_first_matching_history_entry_wins():
+    history = [['2024-11-02', 4500, 'OXXO CENTRO'], ['2024-11-03', 4500, 'OXXO CENTRO']]
+    assert check_duplicates([txn('2024-11-03', 45.00, 'OXXO CENTRO')], history)[0]['historyIndex'] == 0
+
+
+def test_malformed_history_entries_are_ignored():
+    history = [['2024-11-03'], {'date': '2024-11-03'}, ['bad date', 4500, 'OXXO CENTRO'], HISTORY[0]]
+    assert check_duplicates([txn('2024-11-03', 45.00, 'OXXO CENTRO')], history)[0]['historyIndex'] == 3
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Pruebas del diccionario de comercios (llaves, colisiones, renombrado)
+
+    python -m pytest test_merchants.py
+"""
+
+from statement_processor.merchants import Merchant, MerchantDictionary, learn_merchants, merchant_key
+from statement_processor.normalize import normalize_batch
+
+
+def normalize(dictionary, description, category='Otros'):
+    transaction = {'date': '2024-11-05', 'amount': 10, 'description': description, 'category': category}
+    columns, _, _ = normalize_batch([transaction], None, dictionary)
+    return columns.descriptions[0], columns.categories[0]
+
+
+def test_store_numbers_share_a_key():
+    assert merchant_key('OXXO SUC 1234 CENTRO') == merchant_key('Oxxo Suc 5678 Centro') == 'oxxo suc'
+
+
+def test_aggregator_prefix_is_not_a_key():
+    assert merchant_key('MERCADO PAGO *UBER') == 'uber'
+    assert merchant_key('MERCADO PAGO *STEAMGAMES') == 'steamgames'
+    assert merchant_key('PAYPAL *SPOTIFY P1234') == 'spotify'
+    assert merchant_key('MERCADO PAGO') == ''
+
+
+def test_colliding_key_keeps_the_description():
+    dictionary = MerchantDictionary({'rest casa': Merchant('REST LA CASA DE TOÑO', 'Comida', 5)})
+    assert merchant_key('REST LA CASA VIEJA') == merchant_key('REST LA CASA DE TOÑO')
+    # Another merchant with the same key: only the missing category is filled
+    assert normalize(dictionary, 'REST LA CASA VIEJA') == ('REST LA CASA VIEJA', 'Comida')
+    assert normalize(dictionary, 'REST LA CASA VIEJA', 'Entretenimiento') == ('REST LA CASA VIEJA', 'Entretenimiento')
+
+
+def test_full_key_match_is_renamed():
+    dictionary = MerchantDictionary({'oxxo suc': Merchant('OXXO SUC CENTRO', 'Comida', 9)})
+    assert normalize(dictionary, 'OXXO SUC 1234 CENTRO', 'Otros') == ('OXXO SUC CENTRO', 'Comida')
+
+
+def test_aggregated_merchants_are_learned_apart():
+    transactions = (
+        [{'description': 'MERCADO PAGO *UBER', 'category': 'Transporte'}] * 3
+        + [{'description': 'MERCADO PAGO *STEAMGAMES', 'category': 'Entretenimiento'}] * 3
+    )
+    dictionary = learn_merchants(transactions)
+    assert dictionary.lookup('MERCADO PAGO *UBER').category == 'Transporte'
+    assert dictionary.lookup('MERCADO PAGO *STEAMGAMES').category == 'Entretenimiento'
+    assert normalize(dictionary, 'MERCADO PAGO *UBER') == ('MERCADO PAGO *UBER', 'Transporte')
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché por página: las respuestas se guardan con el modelo que las dio
+
+    python -m pytest test_page_cache.py
+"""
+
+import fitz
+import pytest
+
+from test_triage import index, process  # sets up sys.path and env first
+
+from statement_processor.cache import MemoryCache  # noqa: E402
+from synthetic import make_statement_pdf  # noqa: E402
+
+
+def mixed_pdf():
+    """A text-layer page followed by a scanned one"""
+    document = fitz.open(stream=make_statement_pdf(pages=1, rows_per_page=5), filetype='pdf')
+    scanned = fitz.open(stream=make_statement_pdf(pages=1, rows_per_page=5, scanned=True), filetype='pdf')
+    document.insert_pdf(scanned)
+    data = document.tobytes()
+    document.close()
+    scanned.close()
+    return data
+
+
+@pytest.fixture
+def page_cache(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(index, 'page_cache', cache)
+    monkeypatch.setattr(index, 'PAGE_BATCHING_ENABLED', True)
+    return cache
+
+
+def test_batched_pages_are_cached_under_the_batch_model(page_cache, monkeypatch):
+    monkeypatch.setattr(index, 'TEXT_LAYER_MODEL', 'gpt-4o-mini')
+    pdf = mixed_pdf()
+    status, _, stub = process(pdf)
+    assert status == 200 and stub.calls == 1
+
+    # Both pages went in one request to VISION_MODEL
+    _, _, stub = process(pdf)
+    assert stub.calls == 0
+
+    # On its own the text page goes to TEXT_LAYER_MODEL, which never answered it
+    monkeypatch.setattr(index, 'PAGE_BATCHING_ENABLED', False)
+    _, _, stub = process(pdf)
+    assert stub.calls == 1
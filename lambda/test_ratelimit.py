@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los limitadores de peticiones (token bucket en memoria y ventana fija en DynamoDB)
+
+    python -m pytest test_ratelimit.py
+"""
+
+from statement_processor.ratelimit import (
+    DynamoDBRateLimiter,
+    MemoryRateLimiter,
+    create_rate_limiter,
+)
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_runs_out_and_refills():
+    clock = Clock()
+    limiter = MemoryRateLimiter(limit=3, window=60, clock=clock)
+    assert [limiter.check('a') for _ in range(4)] == [(True, 2), (True, 1), (True, 0), (False, 0)]
+
+    # limit/window tokens per second: one token every 20 s
+    clock.now += 19
+    assert limiter.check('a') == (False, 0)
+    clock.now += 1
+    assert limiter.check('a') == (True, 0)
+    assert limiter.check('b') == (True, 2)
+
+
+def test_refill_never_exceeds_the_limit():
+    clock = Clock()
+    limiter = MemoryRateLimiter(limit=3, window=60, clock=clock)
+    limiter.check('a')
+    clock.now += 59
+    assert limiter.check('a') == (True, 2)
+
+
+def test_idle_and_excess_clients_are_evicted():
+    clock = Clock()
+    limiter = MemoryRateLimiter(limit=3, window=60, max_keys=2, clock=clock)
+    limiter.check('a')
+    limiter.check('b')
+    limiter.check('c')
+    assert len(limiter) == 2
+    clock.now += 60
+    limiter.check('d')
+    assert len(limiter) == 1
+
+
+class ConditionalCheckFailed(Exception):
+    response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+
+
+class StubDynamoDB:
+    """update_item for the limiter's ADD/condition expression, on a dict"""
+
+    def __init__(self, error=None):
+        self.items = {}
+        self.error = error
+
+    def update_item(self, TableName, Key, ExpressionAttributeValues, **kwargs):
+        if self.error:
+            raise self.error
+        pk = Key['pk']['S']
+        count = self.items.get(pk, {}).get('requestCount', 0)
+        if count >= int(ExpressionAttributeValues[':limit']['N']):
+            raise ConditionalCheckFailed()
+        self.items[pk] = {
+            'requestCount': count + 1,
+            'expiresAt': int(ExpressionAttributeValues[':expires']['N']),
+        }
+        return {'Attributes': {'requestCount': {'N': str(count + 1)}}}
+
+
+def test_fixed_window_rolls_over():
+    clock = Clock(now=1019.0)
+    client = StubDynamoDB()
+    limiter = DynamoDBRateLimiter(client, 'rate-limits', limit=2, window=60, clock=clock)
+    assert [limiter.check('10.0.0.1') for _ in range(3)] == [(True, 1), (True, 0), (False, 0)]
+    assert limiter.check('10.0.0.2') == (True, 1)
+    assert client.items['10.0.0.1#960'] == {'requestCount': 2, 'expiresAt': 1080}
+
+    # A new window starts at 1020 with a fresh counter
+    clock.now = 1020.0
+    assert limiter.check('10.0.0.1') == (True, 1)
+    assert client.items['10.0.0.1#1020']['requestCount'] == 1
+
+
+def test_dynamodb_client_is_created_on_first_check():
+    created = []
+
+    def factory():
+        created.append(StubDynamoDB())
+        return created[-1]
+
+    limiter = DynamoDBRateLimiter(factory, 'rate-limits', limit=2, window=60, clock=Clock())
+    assert not created
+    limiter.check('a')
+    limiter.check('a')
+    assert len(created) == 1
+
+
+def test_dynamodb_outage_allows_the_request():
+    limiter = DynamoDBRateLimiter(StubDynamoDB(error=ConnectionError('endpoint down')), 'rate-limits',
+                                  limit=5, window=60, clock=Clock())
+    assert limiter.check('a') == (True, 4)
+
+
+def test_dynamodb_without_table_falls_back_to_memory():
+    assert create_rate_limiter('dynamodb', 5, 60, dynamodb_client=StubDynamoDB()).name == 'memory'
+    assert create_rate_limiter('dynamodb', 5, 60, dynamodb_client=StubDynamoDB(), table='t').name == 'dynamodb'
+    assert create_rate_limiter('redis', 5, 60).name == 'memory'
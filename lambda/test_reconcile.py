@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la conciliación con el total impreso del periodo
+
+    python -m pytest test_reconcile.py
+"""
+
+import pytest
+
+from statement_processor.reconcile import find_printed_total, reconcile_pages
+from statement_processor.tracing import start_trace
+
+
+@pytest.mark.parametrize('line, cents', [
+    ('TOTAL DE CARGOS DEL PERIODO  $12,345.67', 1234567),
+    ('Total compras 850.00', 85000),
+    ('Total de consumos $1,000.00', 100000),
+    ('Compras y cargos del periodo  $2,500.10', 250010),
+    ('Compras y disposiciones del período 99.90', 9990),
+    # Columns printed before the label are not the total
+    ('Saldo anterior 5,000.00   Total de cargos 1,234.56', 123456),
+    ('Saldo al corte $5,000.00', None),
+])
+def test_printed_total_labels(line, cents):
+    found = find_printed_total({1: f'ESTADO DE CUENTA\n{line}\n'})
+    assert (found and found[0]) == cents
+
+
+def test_first_total_with_an_amount_wins():
+    page_texts = {
+        2: 'TOTAL DE CARGOS 300.00',
+        1: 'Total de cargos (ver detalle)\nFECHA DESCRIPCION IMPORTE',
+    }
+    assert find_printed_total(page_texts) == (30000, 2)
+
+
+def page(rows):
+    """Page text and extracted transactions for (date, description, amount) rows"""
+    text = '\n'.join(f'{date} {description} ${amount:,.2f}' for date, description, amount in rows)
+    transactions = [{'date': date, 'description': description, 'amount': amount} for date, description, amount in rows]
+    return text, transactions
+
+
+PAGE_1 = [('01-nov-2024', 'OXXO CENTRO', 100.00), ('02-nov-2024', 'UBER TRIP', 50.25)]
+PAGE_2 = [('10-nov-2024', 'NETFLIX.COM', 199.00), ('11-nov-2024', 'CINEPOLIS', 80.00)]
+
+
+def statement(total):
+    text_1, transactions_1 = page(PAGE_1)
+    text_2, transactions_2 = page(PAGE_2)
+    page_texts = {1: f'TOTAL DE CARGOS ${total:,.2f}\n{text_1}', 2: text_2}
+    return {1: transactions_1, 2: transactions_2}, page_texts
+
+
+def test_matching_total():
+    start_trace('test')
+    page_results, page_texts = statement(429.25)
+    result = reconcile_pages(page_results, page_texts)
+    assert result == {'status': 'matched', 'printedTotal': 429.25, 'extractedTotal': 429.25,
+                      'difference': 0.0, 'totalPage': 1}
+
+
+@pytest.mark.parametrize('tolerance_cents, status', [(0, 'mismatch'), (1, 'matched'), (2, 'matched')])
+def test_tolerance(tolerance_cents, status):
+    start_trace('test')
+    page_results, page_texts = statement(429.26)
+    assert reconcile_pages(page_results, page_texts, tolerance_cents)['status'] == status
+
+
+def test_mismatch_is_report_only_by_default():
+    start_trace('test')
+    page_results, page_texts = statement(429.25)
+    del page_results[1][1]
+    requeried = []
+    result = reconcile_pages(page_results, page_texts, requery=requeried.append)
+    assert result['status'] == 'mismatch'
+    assert result['difference'] == 50.25
+    assert not requeried and 'requeriedPages' not in result
+
+
+def test_requery_only_pages_missing_rows():
+    start_trace('test')
+    page_results, page_texts = statement(429.25)
+    del page_results[1][1]
+    requeried = []
+
+    def requery(page_num):
+        requeried.append(page_num)
+        return page(PAGE_1)[1]
+
+    result = reconcile_pages(page_results, page_texts, requery=requery, max_requery=2)
+    assert requeried == [1]
+    assert result['status'] == 'matched' and result['requeriedPages'] == [1]
+    assert len(page_results[1]) == 2
+
+
+def test_requery_that_does_not_help_is_discarded():
+    start_trace('test')
+    page_results, page_texts = statement(429.25)
+    del page_results[1][1]
+    result = reconcile_pages(page_results, page_texts, requery=lambda page_num: [], max_requery=1)
+    assert result['status'] == 'mismatch' and result['requeriedPages'] == [1]
+    assert len(page_results[1]) == 1
+
+
+def test_payments_and_interest_are_not_missing_rows():
+    start_trace('test')
+    page_results, page_texts = statement(429.25)
+    page_texts[2] += '\n12-nov-2024 SU PAGO GRACIAS $500.00\n30-nov-2024 INTERESES $35.10'
+    requeried = []
+    result = reconcile_pages(page_results, page_texts, requery=requeried.append, max_requery=2)
+    assert result['status'] == 'matched' and not requeried
+
+
+def test_default_handler_reports_without_requerying():
+    from test_triage import process
+    from synthetic import make_statement_pdf
+
+    # The stub's canned amounts never add up to the printed total
+    status, body, stub = process(make_statement_pdf(pages=2, rows_per_page=5, print_total=True))
+    assert status == 200
+    assert body['metadata']['reconciliation']['status'] == 'mismatch'
+    assert stub.calls == 2
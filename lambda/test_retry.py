@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Pruebas de CallPolicy (reintentos, timeouts, hedging) y de páginas fallidas
+
+    python -m pytest test_retry.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from statement_processor.retry import CallPolicy
+from statement_processor.tracing import start_trace
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+
+
+def failing(*errors, result='ok'):
+    """func that raises each error in turn, then returns result"""
+    calls = []
+
+    def func():
+        calls.append(time.perf_counter())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return func, calls
+
+
+def policy(**kwargs):
+    delays = []
+    return CallPolicy(sleep=delays.append, **kwargs), delays
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    call_policy, delays = policy(max_attempts=3, backoff_base=0.5, backoff_max=8)
+    func, calls = failing(StatusError(429), StatusError(503))
+    assert call_policy.call(func) == 'ok'
+    assert len(calls) == 3
+    assert len(delays) == 2 and 0 <= delays[0] <= 0.5 and 0 <= delays[1] <= 1.0
+
+
+def test_timeouts_are_retried():
+    call_policy, _ = policy(max_attempts=2)
+    func, calls = failing(TimeoutError('attempt timed out'))
+    assert call_policy.call(func) == 'ok'
+    assert len(calls) == 2
+
+
+def test_attempts_run_out():
+    call_policy, delays = policy(max_attempts=2)
+    func, calls = failing(StatusError(500), StatusError(500), StatusError(500))
+    with pytest.raises(StatusError):
+        call_policy.call(func)
+    assert len(calls) == 2 and len(delays) == 1
+
+
+def test_client_errors_are_not_retried():
+    call_policy, delays = policy(max_attempts=3)
+    func, calls = failing(StatusError(400))
+    with pytest.raises(StatusError):
+        call_policy.call(func)
+    assert len(calls) == 1 and not delays
+
+
+def hedged_func(first_latency, second_latency):
+    """The first request takes first_latency, the hedged one second_latency"""
+    lock = threading.Lock()
+    started = []
+
+    def func():
+        with lock:
+            started.append(len(started))
+            number = started[-1]
+        time.sleep(first_latency if number == 0 else second_latency)
+        return 'primary' if number == 0 else 'hedge'
+    return func, started
+
+
+def test_hedge_wins_when_the_primary_is_slow():
+    trace = start_trace('test')
+    call_policy, _ = policy(hedge_enabled=True, hedge_after=0.05)
+    func, started = hedged_func(0.5, 0.01)
+    assert call_policy.call(func, key='model') == 'hedge'
+    assert len(started) == 2
+    assert trace.counters == {'modelHedges': 1, 'modelHedgeWins': 1}
+
+
+def test_primary_wins_over_a_slower_hedge():
+    trace = start_trace('test')
+    call_policy, _ = policy(hedge_enabled=True, hedge_after=0.05)
+    func, started = hedged_func(0.15, 0.5)
+    assert call_policy.call(func, key='model') == 'primary'
+    assert len(started) == 2
+    assert trace.counters == {'modelHedges': 1}
+
+
+def test_no_hedge_for_fast_calls():
+    call_policy, _ = policy(hedge_enabled=True, hedge_after=0.5)
+    func, started = hedged_func(0.01, 0.01)
+    assert call_policy.call(func, key='model') == 'primary'
+    assert len(started) == 1
+
+
+def test_page_that_fails_to_render_is_reported_not_fatal(monkeypatch):
+    import test_triage
+    from synthetic import make_statement_pdf
+
+    index = test_triage.index
+    original = index.render_page
+
+    def render_page(page, *args, **kwargs):
+        if page.number == 1:
+            raise RuntimeError('corrupt page image')
+        return original(page, *args, **kwargs)
+
+    monkeypatch.setattr(index, 'render_page', render_page)
+    status, body, stub = test_triage.process(make_statement_pdf(pages=3, rows_per_page=5, scanned=True))
+    assert status == 200
+    assert stub.calls == 2
+    assert body['metadata']['failedPages'] == [{'page': 2, 'error': 'corrupt page image'}]
+    assert body['metadata']['partial'] is True
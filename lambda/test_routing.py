@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Pruebas del enrutamiento por niveles (modelo barato primero, escalamiento a VISION_MODEL)
+
+    python -m pytest test_routing.py
+"""
+
+import json
+import re
+
+from test_triage import index, process  # sets up sys.path and env first
+
+from mock_model import StubAPIError, StubOpenAI  # noqa: E402
+from statement_processor.routing import validate_page  # noqa: E402
+from synthetic import make_rows, make_statement_pdf  # noqa: E402
+
+NOVEMBER = {'start': '2024-11-01', 'end': '2024-11-30'}
+PAGES = 3
+ROWS_PER_PAGE = 5
+ROWS = make_rows(PAGES * ROWS_PER_PAGE)
+
+
+def page_answer(page_num, amount_offset=0.0):
+    """The page's synthetic rows as the model would return them"""
+    return [
+        {'date': f'2024-11-{date[:2]}', 'amount': round(amount + amount_offset, 2), 'description': description,
+         'category': 'Otros'}
+        for date, description, amount in ROWS[(page_num - 1) * ROWS_PER_PAGE:page_num * ROWS_PER_PAGE]
+    ]
+
+
+def page_text(page_num):
+    return '\n'.join(
+        f'{date} | {description} | ${amount:,.2f}'
+        for date, description, amount in ROWS[(page_num - 1) * ROWS_PER_PAGE:page_num * ROWS_PER_PAGE]
+    )
+
+
+def test_correct_answer_passes():
+    assert validate_page(page_answer(1), NOVEMBER, page_text(1)) == []
+
+
+def test_amounts_not_on_the_page_fail():
+    reasons = validate_page(page_answer(1, amount_offset=1.0), NOVEMBER, page_text(1))
+    assert any('not printed on the page' in reason for reason in reasons)
+
+
+def test_dates_outside_the_period_fail():
+    answer = [dict(txn, date='2024-08-15') for txn in page_answer(1)]
+    assert any('outside the billing period' in reason for reason in validate_page(answer, NOVEMBER, page_text(1)))
+
+
+def test_empty_answer_for_a_page_with_rows_fails():
+    assert validate_page([], NOVEMBER, page_text(1)) == [f'no transactions but {ROWS_PER_PAGE} date/amount rows']
+
+
+class TieredStub(StubOpenAI):
+    """Cheap model: page 1 right, page 2 wrong amounts, page 3 an error; vision model: right"""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.models = []
+
+    def complete(self, request):
+        page_num = int(re.search(r'page (\d+) of', json.dumps(request['messages'])).group(1))
+        self.models.append((request['model'], page_num))
+        if request['model'] == index.ROUTING_CHEAP_MODEL:
+            if page_num == 3:
+                raise StubAPIError(400)
+            self.response = {'transactions': page_answer(page_num, amount_offset=1.0 if page_num == 2 else 0.0)}
+        else:
+            self.response = {'transactions': page_answer(page_num)}
+        return super().complete(request)
+
+
+def test_failed_and_doubtful_pages_escalate(monkeypatch):
+    monkeypatch.setattr(index, 'ROUTING_ENABLED', True)
+    monkeypatch.setattr(index, 'VISION_MAX_CONCURRENCY', 1)
+    stub = TieredStub()
+    status, body, _ = process(make_statement_pdf(pages=PAGES, rows_per_page=ROWS_PER_PAGE), stub)
+
+    assert status == 200
+    assert stub.models == [
+        (index.ROUTING_CHEAP_MODEL, 1),
+        (index.ROUTING_CHEAP_MODEL, 2), (index.VISION_MODEL, 2),
+        (index.ROUTING_CHEAP_MODEL, 3), (index.VISION_MODEL, 3),
+    ]
+    # Page 1 stays on the cheap model's answer; pages 2 and 3 take the vision model's
+    expected = sorted(round(txn['amount'], 2) for page_num in (1, 2, 3) for txn in page_answer(page_num))
+    assert sorted(txn['amount'] for txn in body['transactions']) == expected
+
+    routing = body['metadata']['routing']
+    assert routing['tiers'] == {
+        'text': {'pages': 3, 'accepted': 1, 'hitRate': 0.333},
+        'vision': {'pages': 2, 'accepted': 2, 'hitRate': 1.0},
+    }
+    escalated = {escalation['page']: escalation['reasons'] for escalation in routing['escalatedPages']}
+    assert list(escalated) == [2, 3]
+    assert any('not printed on the page' in reason for reason in escalated[2])
+    assert escalated[3] == ['stub model error 400']
+    assert 'failedPages' not in body['metadata']
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Pruebas del punto de entrada WSGI (streaming_app)
+
+    python -m pytest test_streaming_app.py
+"""
+
+import io
+import json
+
+from test_triage import index  # noqa: F401  (sets up sys.path and env first)
+
+import streaming_app  # noqa: E402
+
+
+class Body(io.BytesIO):
+    """wsgi.input that records whether it was read"""
+
+    def __init__(self, data=b''):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return super().read(*args)
+
+
+def call(content_length, data=b''):
+    body = Body(data)
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'REMOTE_ADDR': '10.0.0.1',
+        'CONTENT_LENGTH': str(content_length),
+        'wsgi.input': body,
+    }
+    statuses = []
+    chunks = streaming_app.application(environ, lambda status, headers: statuses.append(status))
+    return statuses[0], json.loads(b''.join(chunks)), body
+
+
+def test_oversized_body_is_rejected_before_reading():
+    status, payload, body = call(streaming_app.MAX_BODY_SIZE + 1)
+    assert status == '413 Request Entity Too Large'
+    assert not payload['success'] and 'File too large' in payload['error']
+    assert body.reads == 0
+
+
+def test_invalid_content_length_is_a_bad_request():
+    status, _, body = call('abc')
+    assert status == '400 Bad Request'
+    assert body.reads == 0
+
+
+def test_body_within_the_limit_is_read():
+    data = json.dumps({'fileType': 'pdf'}).encode('utf-8')
+    status, _, body = call(len(data), data)
+    assert body.reads == 1
+    assert status != '413 Request Entity Too Large'
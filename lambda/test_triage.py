@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Pruebas offline del triage de páginas (sin red ni OPENAI_API_KEY)
+
+    python -m pytest test_triage.py
+
+Usan los PDFs sintéticos y el cliente falso de benchmarks/.
+"""
+
+import base64
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'benchmarks'))
+os.environ.setdefault('REQUIRE_AUTH', 'false')
+os.environ.setdefault('MAX_REQUESTS_PER_MINUTE', '1000000')
+os.environ.setdefault('LOG_LEVEL', 'warning')
+os.environ.setdefault('OPENAI_API_KEY', 'offline-test')
+
+import fitz  # noqa: E402
+import pytest  # noqa: E402
+
+import index  # noqa: E402
+from mock_model import StubOpenAI  # noqa: E402
+from statement_processor.triage import classify_page_text  # noqa: E402
+from synthetic import make_statement_pdf  # noqa: E402
+
+
+def process(pdf: bytes, stub=None):
+    stub = stub or StubOpenAI(latency=0, transactions_per_call=5)
+    index.openai_client = stub
+    event = {
+        'headers': {'x-forwarded-for': '10.0.0.1'},
+        'body': json.dumps({
+            'fileBase64': base64.b64encode(pdf).decode('ascii'),
+            'fileType': 'pdf',
+            'creditCardName': 'Test',
+            'billingPeriod': {'start': '2024-11-01', 'end': '2024-11-30'},
+        }),
+    }
+    response = index.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body']), stub
+
+
+def test_scanned_pages_are_sent_to_the_model():
+    status, body, stub = process(make_statement_pdf(pages=3, rows_per_page=5, scanned=True))
+    assert status == 200
+    assert stub.calls == 3
+    assert len(body['transactions']) == 15
+
+
+def test_scanned_page_with_native_footer_is_not_skipped():
+    # A 'Pagina N de M' text footer over a scan used to send the page to
+    # text triage, which skipped it as having no date/amount rows
+    pdf = make_statement_pdf(pages=3, rows_per_page=5, scanned=True, scanned_footer=True)
+    status, body, stub = process(pdf)
+    assert status == 200
+    assert stub.calls == 3
+    assert len(body['transactions']) == 15
+    assert not body['metadata'].get('skippedPages')
+
+
+def text_pdf(lines):
+    document = fitz.open()
+    page = document.new_page(width=612, height=792)
+    for row, line in enumerate(lines):
+        page.insert_text((50, 50 + row * 16), line, fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+@pytest.mark.parametrize('row', [
+    'Jan 15, 2024 | AMAZON MX | 123.45',
+    '15 JAN | UBER | 123.45',
+    '15NOV24 | OXXO | 45.00',
+    '15-nov-2024 | OXXO CENTRO | $45.00',
+    '2024-11-15 | OXXO CENTRO | 45.00',
+])
+def test_transaction_rows_are_recognized(row):
+    assert classify_page_text(f'MOVIMIENTOS\n{row}\n')[0]
+
+
+@pytest.mark.parametrize('text, keep', [
+    ('TERMINOS Y CONDICIONES\nEl titular se obliga a pagar', False),
+    ('PROGRAMA DE RECOMPENSAS\nPuntos acumulados 1,200', False),
+    ('TERMINOS Y CONDICIONES\nComision por apertura $350.00', True),
+    # No known section and no recognized date: the model decides
+    ('Movimientos del periodo\nCompra 15.11 OXXO 45.00', True),
+])
+def test_only_known_sections_without_amounts_are_skipped(text, keep):
+    assert classify_page_text(text)[0] is keep
+
+
+def test_text_page_with_english_dates_is_sent_to_the_model():
+    lines = ['BANK DEMO CREDIT CARD STATEMENT', 'Date | Description | Amount']
+    lines += [f'Nov {day}, 2024 | AMAZON MX MARKETPLACE ORDER {day} | {100 + day}.45' for day in range(1, 11)]
+    status, body, stub = process(text_pdf(lines))
+    assert status == 200
+    assert stub.calls == 1
+    assert not body['metadata'].get('skippedPages')
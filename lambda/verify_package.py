@@ -25,6 +25,7 @@ def verify_zip(zip_path):
         # Verificar estructura
         checks = {
             'index.py': False,
+            'statement_processor/': False,
             'openai/': False,
             'pydantic/': False,
             'pydantic_core/': False,
@@ -38,6 +39,13 @@ def verify_zip(zip_path):
         else:
             print("❌ index.py NOT found!")
         
+        # Verificar módulos propios de la función
+        if 'statement_processor/__init__.py' in files:
+            checks['statement_processor/'] = True
+            print("✓ statement_processor/ found")
+        else:
+            print("❌ statement_processor/ NOT found!")
+        
         # Verificar openai
         openai_files = [f for f in files if f.startswith('openai/')]
         if openai_files:
@@ -1,5 +1,12 @@
 import { useState } from 'react';
-import { processStatement, ExtractedTransaction, BillingPeriod, getLambdaEndpoint } from '../services/statementProcessor';
+import {
+  processStatement,
+  checkStatementDuplicates,
+  ExtractedTransaction,
+  BillingPeriod,
+  DuplicateHistoryEntry,
+  getLambdaEndpoint,
+} from '../services/statementProcessor';
 import { useTransactions } from './useTransactions';
 import { useCreditCards } from './useCreditCards';
 import { DEFAULT_CATEGORIES } from '../utils/categories';
@@ -146,15 +153,38 @@ export const useStatementProcessor = () => {
 
   /**
    * Check all extracted transactions for duplicates
+   * 
+   * The whole batch goes to the Lambda with a compact digest of the card's
+   * history; if that fails, each transaction is checked here.
    */
   const checkAllDuplicates = async (
-    transactions: ExtractedTransaction[],
+    extracted: ExtractedTransaction[],
     creditCardId: string
   ): Promise<Map<number, DuplicateCheckResult>> => {
     const results = new Map<number, DuplicateCheckResult>();
     
-    for (let i = 0; i < transactions.length; i++) {
-      const result = await checkDuplicate(transactions[i], creditCardId);
+    const cardHistory = transactions.filter(txn => txn.creditCardId === creditCardId);
+    const history: DuplicateHistoryEntry[] = cardHistory.map(txn => [
+      txn.date.slice(0, 10),
+      Math.round(txn.amount * 100),
+      txn.description,
+    ]);
+    try {
+      const flags = await checkStatementDuplicates(extracted, history, getLambdaEndpoint());
+      flags.forEach((flag, i) => {
+        results.set(i, {
+          isDuplicate: flag.isDuplicate,
+          existingTransaction: flag.historyIndex !== undefined ? cardHistory[flag.historyIndex] : undefined,
+          reason: flag.reason,
+        });
+      });
+      return results;
+    } catch (err) {
+      console.warn('[checkAllDuplicates] Server check failed, checking locally:', err);
+    }
+    
+    for (let i = 0; i < extracted.length; i++) {
+      const result = await checkDuplicate(extracted[i], creditCardId);
       results.set(i, result);
     }
 
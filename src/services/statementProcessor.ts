@@ -22,10 +22,85 @@ export interface StatementProcessingResult {
   metadata?: {
     totalExtracted: number;
     pdfPageCount?: number;
+    // Pages whose model request failed after retries; their transactions are missing
+    partial?: boolean;
+    failedPages?: { page: number; error: string }[];
+    // With tiered routing: accepted answers per model tier and escalated pages
+    routing?: {
+      tiers: Record<string, { pages: number; accepted: number; hitRate: number }>;
+      escalatedPages: { page: number; reasons: string[] }[];
+    };
+    // Sum of extracted amounts vs the total printed on the statement
+    reconciliation?: {
+      status: 'matched' | 'mismatch' | 'unavailable';
+      printedTotal?: number;
+      extractedTotal?: number;
+      difference?: number;
+      totalPage?: number;
+      requeriedPages?: number[];
+    };
+    // Day/month order detected for the statement; rows whose date reads both
+    // ways (and could not be told by the billing period) are left out and listed
+    dates?: {
+      order: 'dd/mm' | 'mm/dd' | null;
+      ambiguousRows?: number;
+      ambiguousDates?: string[];
+      // The rows left out, with both ISO readings of their date
+      ambiguousTransactions?: Array<{
+        date: string;
+        amount: number;
+        description: string;
+        category: string;
+        dateCandidates: string[];
+      }>;
+    };
   };
   error?: string;
 }
 
+export interface ProcessStatementOptions {
+  // Upload the file straight to S3 with a presigned POST instead of sending
+  // it as base64 in the request body (~33% less data, no 20 MB JSON body)
+  useS3Upload?: boolean;
+}
+
+export interface StatementPageResult {
+  page: number;
+  transactions: ExtractedTransaction[];
+}
+
+export interface StatementJobStatus {
+  success: boolean;
+  jobId: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  totalPages?: number | null;
+  pagesCompleted?: number;
+  pages?: StatementPageResult[]; // Pages completed since the cursor sent
+  cursor?: number;
+  transactions?: ExtractedTransaction[]; // Only when status is 'succeeded'
+  metadata?: StatementProcessingResult['metadata'];
+  error?: string;
+}
+
+export interface WaitForJobOptions {
+  intervalMs?: number; // Polls count against the Lambda rate limit (10/min by default)
+  timeoutMs?: number;
+  onPages?: (pages: StatementPageResult[], status: StatementJobStatus) => void;
+}
+
+export interface ProcessStatementStreamOptions extends ProcessStatementOptions {
+  // Called with each page's transactions as soon as the Lambda finishes it
+  onPage?: (page: StatementPageResult, totalPages: number) => void;
+}
+
+interface StatementUpload {
+  uploadUrl: string;
+  uploadFields: Record<string, string>;
+  s3Bucket: string;
+  s3Key: string;
+  expiresIn: number;
+}
+
 /**
  * Get API key from environment or secure storage
  * In production, consider using secure storage (e.g., Keychain/Keystore)
@@ -55,6 +130,7 @@ function getApiKey(): string {
  * @param cutDate - Cut date of the credit card (1-31)
  * @param billingPeriod - Billing period for the statement
  * @param lambdaEndpoint - URL of the Lambda function endpoint
+ * @param options - Upload options (e.g. direct S3 upload for File objects)
  */
 export async function processStatement(
   file: File | string,
@@ -62,95 +138,118 @@ export async function processStatement(
   creditCardName: string,
   cutDate: number,
   billingPeriod: BillingPeriod,
-  lambdaEndpoint: string
+  lambdaEndpoint: string,
+  options: ProcessStatementOptions = {}
 ): Promise<StatementProcessingResult> {
   try {
-    // Convert file to base64 and detect type
-    let fileBase64: string;
-    let fileType: string = 'pdf';
-    
-    if (typeof file === 'string') {
-      // Already base64
-      fileBase64 = file;
-      // Try to detect type from string (if it includes data URL)
-      if (file.includes('data:')) {
-        const match = file.match(/data:([^;]+)/);
-        if (match) {
-          const mimeType = match[1];
-          if (mimeType.includes('png')) fileType = 'png';
-          else if (mimeType.includes('jpeg') || mimeType.includes('jpg')) fileType = 'jpeg';
-          else if (mimeType.includes('pdf')) fileType = 'pdf';
-        }
-      }
-    } else {
-      // File object - convert to base64 and detect type
-      fileBase64 = await fileToBase64(file);
-      const fileName = file.name.toLowerCase();
-      if (fileName.endsWith('.png')) {
-        fileType = 'png';
-      } else if (fileName.endsWith('.jpg') || fileName.endsWith('.jpeg')) {
-        fileType = 'jpeg';
-      } else if (fileName.endsWith('.pdf')) {
-        fileType = 'pdf';
-      }
-    }
+    const fileFields = await prepareFileFields(file, lambdaEndpoint, options);
 
-    // Prepare request payload
-    const payload = {
-      fileBase64, // New field name
-      fileType,   // New field
-      pdfBase64: fileBase64, // Keep for backward compatibility
+    console.log('[processStatement] Sending request to Lambda:', {
       creditCardId,
       creditCardName,
       cutDate,
       billingPeriod,
-    };
+      fileType: fileFields.fileType,
+      s3Key: fileFields.s3Key,
+      fileSize: typeof file === 'string' ? file.length : file.size,
+    });
 
-    console.log('[processStatement] Sending request to Lambda:', {
+    return await postToLambda(lambdaEndpoint, {
+      ...fileFields,
       creditCardId,
       creditCardName,
       cutDate,
       billingPeriod,
-      fileType,
-      fileSize: fileBase64.length,
     });
+  } catch (error) {
+    console.error('[processStatement] Error:', error);
+    return {
+      success: false,
+      transactions: [],
+      error: error instanceof Error ? error.message : 'Unknown error processing statement',
+    };
+  }
+}
 
-    // Obtener API key
-    const apiKey = getApiKey();
-
-    // Call Lambda function con autenticación
+/**
+ * Process a statement receiving transactions page by page (NDJSON stream)
+ *
+ * Pages arrive in completion order through `onPage`; the returned result is
+ * the complete list in page order. Point `lambdaEndpoint` at the streaming
+ * Function URL (streaming_app.py) to get pages while the rest are processed;
+ * the regular endpoint answers the same format once all pages are done.
+ */
+export async function processStatementStream(
+  file: File | string,
+  creditCardId: string,
+  creditCardName: string,
+  cutDate: number,
+  billingPeriod: BillingPeriod,
+  lambdaEndpoint: string,
+  options: ProcessStatementStreamOptions = {}
+): Promise<StatementProcessingResult> {
+  try {
+    const fileFields = await prepareFileFields(file, lambdaEndpoint, options);
     const response = await fetch(lambdaEndpoint, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-Api-Key': apiKey, // Agregar header de autenticación
+        'X-Api-Key': getApiKey(),
       },
-      body: JSON.stringify(payload),
+      body: JSON.stringify({
+        ...fileFields,
+        stream: true,
+        creditCardId,
+        creditCardName,
+        cutDate,
+        billingPeriod,
+      }),
     });
 
     if (!response.ok) {
-      // Si es 401, el error es de autenticación
-      if (response.status === 401) {
-        const errorData = await response.json().catch(() => ({ error: 'Unauthorized' }));
-        throw new Error('Authentication failed: ' + (errorData.error || 'Invalid API key'));
-      }
-      
       const errorData = await response.json().catch(() => ({ error: 'Unknown error' }));
       throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
     }
 
-    const result = await response.json();
-    
-    // Handle Lambda response format (could be direct body or wrapped)
-    if (result.body) {
-      // Lambda returns body as string, parse it
-      const parsedBody = typeof result.body === 'string' ? JSON.parse(result.body) : result.body;
-      return parsedBody;
+    let result: StatementProcessingResult | null = null;
+    const handleLine = (line: string) => {
+      if (!line.trim()) {
+        return;
+      }
+      const message = JSON.parse(line);
+      if (message.type === 'page') {
+        options.onPage?.({ page: message.page, transactions: message.transactions }, message.totalPages);
+      } else if (message.type === 'done') {
+        result = { success: true, transactions: message.transactions, metadata: message.metadata };
+      } else if (message.type === 'error') {
+        result = { success: false, transactions: [], error: message.error };
+      }
+    };
+
+    const reader = response.body?.getReader?.();
+    if (reader) {
+      // Read lines as chunks arrive
+      const decoder = new TextDecoder();
+      let buffered = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) {
+          break;
+        }
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() || '';
+        lines.forEach(handleLine);
+      }
+      handleLine(buffered + decoder.decode());
+    } else {
+      // Runtimes without streaming fetch get the whole body at once
+      (await response.text()).split('\n').forEach(handleLine);
     }
 
-    return result;
+    return result || { success: false, transactions: [], error: 'Stream ended without a result' };
   } catch (error) {
-    console.error('[processStatement] Error:', error);
+    console.error('[processStatementStream] Error:', error);
     return {
       success: false,
       transactions: [],
@@ -159,6 +258,213 @@ export async function processStatement(
   }
 }
 
+/**
+ * Submit a statement as an asynchronous job; returns immediately with the job id
+ * Use for long statements that may exceed the synchronous request timeout.
+ */
+export async function submitStatementJob(
+  file: File | string,
+  creditCardId: string,
+  creditCardName: string,
+  cutDate: number,
+  billingPeriod: BillingPeriod,
+  lambdaEndpoint: string,
+  options: ProcessStatementOptions = {}
+): Promise<StatementJobStatus> {
+  const fileFields = await prepareFileFields(file, lambdaEndpoint, options);
+  return await postToLambda(lambdaEndpoint, {
+    action: 'submitJob',
+    ...fileFields,
+    creditCardId,
+    creditCardName,
+    cutDate,
+    billingPeriod,
+  });
+}
+
+/**
+ * Get a job's status and the pages completed after `cursor`
+ */
+export async function getStatementJob(
+  jobId: string,
+  lambdaEndpoint: string,
+  cursor: number = 0
+): Promise<StatementJobStatus> {
+  return await postToLambda(lambdaEndpoint, { action: 'getJob', jobId, cursor });
+}
+
+/**
+ * Compact history entry for duplicate detection: [date, amountCents, description]
+ */
+export type DuplicateHistoryEntry = [string, number, string];
+
+export interface DuplicateFlag {
+  isDuplicate: boolean;
+  historyIndex?: number; // Position of the matching entry in the history sent
+  reason?: string;
+}
+
+/**
+ * Check a batch of extracted transactions for duplicates against the card's history
+ * The Lambda indexes the history by (day, amount) instead of scanning it per transaction.
+ */
+export async function checkStatementDuplicates(
+  transactions: ExtractedTransaction[],
+  history: DuplicateHistoryEntry[],
+  lambdaEndpoint: string
+): Promise<DuplicateFlag[]> {
+  const result = await postToLambda(lambdaEndpoint, { action: 'checkDuplicates', transactions, history });
+  if (!result.success) {
+    throw new Error(result.error || 'Could not check duplicates');
+  }
+  return result.results;
+}
+
+/**
+ * Poll a job until it finishes, reporting pages as they complete
+ */
+export async function waitForStatementJob(
+  jobId: string,
+  lambdaEndpoint: string,
+  options: WaitForJobOptions = {}
+): Promise<StatementProcessingResult> {
+  const intervalMs = options.intervalMs ?? 6000;
+  const deadline = Date.now() + (options.timeoutMs ?? 15 * 60 * 1000);
+  let cursor = 0;
+
+  while (Date.now() < deadline) {
+    const job = await getStatementJob(jobId, lambdaEndpoint, cursor);
+    if (job.pages && job.pages.length > 0) {
+      options.onPages?.(job.pages, job);
+    }
+    cursor = job.cursor ?? cursor;
+
+    if (job.status === 'succeeded') {
+      return { success: true, transactions: job.transactions || [], metadata: job.metadata };
+    }
+    if (job.status === 'failed') {
+      return { success: false, transactions: [], error: job.error || 'Statement job failed' };
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+
+  return { success: false, transactions: [], error: `Statement job ${jobId} timed out` };
+}
+
+/**
+ * File fields of a request: an S3 reference (uploading first) or the base64 content
+ */
+async function prepareFileFields(
+  file: File | string,
+  lambdaEndpoint: string,
+  options: ProcessStatementOptions
+): Promise<{ fileType: string; fileBase64?: string; s3Bucket?: string; s3Key?: string }> {
+  if (options.useS3Upload && typeof file !== 'string') {
+    const fileType = getFileTypeFromName(file.name);
+    const upload = await requestStatementUpload(fileType, lambdaEndpoint);
+    await uploadFileToS3(file, upload);
+    return { fileType, s3Bucket: upload.s3Bucket, s3Key: upload.s3Key };
+  }
+
+  // Convert file to base64 and detect type
+  if (typeof file === 'string') {
+    // Already base64
+    let fileType = 'pdf';
+    // Try to detect type from string (if it includes data URL)
+    if (file.includes('data:')) {
+      const match = file.match(/data:([^;]+)/);
+      if (match) {
+        const mimeType = match[1];
+        if (mimeType.includes('png')) fileType = 'png';
+        else if (mimeType.includes('jpeg') || mimeType.includes('jpg')) fileType = 'jpeg';
+        else if (mimeType.includes('pdf')) fileType = 'pdf';
+      }
+    }
+    return { fileType, fileBase64: file };
+  }
+
+  // File object - convert to base64 and detect type
+  return { fileType: getFileTypeFromName(file.name), fileBase64: await fileToBase64(file) };
+}
+
+/**
+ * POST a JSON payload to the Lambda function and unwrap its response
+ */
+async function postToLambda(lambdaEndpoint: string, payload: Record<string, unknown>): Promise<any> {
+  // Obtener API key
+  const apiKey = getApiKey();
+
+  // Call Lambda function con autenticación
+  const response = await fetch(lambdaEndpoint, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Api-Key': apiKey, // Agregar header de autenticación
+    },
+    body: JSON.stringify(payload),
+  });
+
+  if (!response.ok) {
+    // Si es 401, el error es de autenticación
+    if (response.status === 401) {
+      const errorData = await response.json().catch(() => ({ error: 'Unauthorized' }));
+      throw new Error('Authentication failed: ' + (errorData.error || 'Invalid API key'));
+    }
+    
+    const errorData = await response.json().catch(() => ({ error: 'Unknown error' }));
+    throw new Error(errorData.error || `HTTP ${response.status}: ${response.statusText}`);
+  }
+
+  const result = await response.json();
+  
+  // Handle Lambda response format (could be direct body or wrapped)
+  if (result.body) {
+    // Lambda returns body as string, parse it
+    return typeof result.body === 'string' ? JSON.parse(result.body) : result.body;
+  }
+
+  return result;
+}
+
+/**
+ * Ask the Lambda for a presigned S3 POST to upload a statement file
+ */
+async function requestStatementUpload(fileType: string, lambdaEndpoint: string): Promise<StatementUpload> {
+  const result = await postToLambda(lambdaEndpoint, { action: 'createUpload', fileType });
+  if (!result.success) {
+    throw new Error(result.error || 'Could not create S3 upload');
+  }
+  return result;
+}
+
+/**
+ * Upload a file to S3 with the presigned POST fields (the file must be the last field)
+ */
+async function uploadFileToS3(file: File, upload: StatementUpload): Promise<void> {
+  const formData = new FormData();
+  Object.entries(upload.uploadFields).forEach(([key, value]) => formData.append(key, value));
+  formData.append('file', file);
+
+  const response = await fetch(upload.uploadUrl, { method: 'POST', body: formData });
+  if (!response.ok) {
+    throw new Error(`S3 upload failed: HTTP ${response.status}: ${response.statusText}`);
+  }
+}
+
+/**
+ * Detect file type from the file name (PDF by default)
+ */
+function getFileTypeFromName(name: string): string {
+  const fileName = name.toLowerCase();
+  if (fileName.endsWith('.png')) {
+    return 'png';
+  }
+  if (fileName.endsWith('.jpg') || fileName.endsWith('.jpeg')) {
+    return 'jpeg';
+  }
+  return 'pdf';
+}
+
 /**
  * Convert File to base64 string
  */